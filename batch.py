@@ -0,0 +1,467 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+
+from encoder import (DEFAULT_OPTIONS, ZDICT_SAMPLE_SIZE, RUNTIME_MODULE, EncodeError, make_options, make_rng,
+                     open_source, build_payload, encode_compiled, generate_decoder, output_chunks, output_footer,
+                     write_runtime, train_zdict, extract_imports, verify_output, file_digest,
+                     with_cipher_salt, atomic_open, temp_path)
+from journal import Journal, options_key, input_stat, default_journal_path
+from tracemap import write_build_map
+from bundle import write_assets
+from scheduler import MemoryScheduler, default_budget, reset_peak_memory, peak_memory, release_memory, MB
+
+TRANSPORTS = ('shm', 'file', 'pickle')
+
+DEDUP_MODES = ('link', 'copy', 'off')
+
+# Windows уничтожает именованную память вместе с последним хэндлом,
+# поэтому там по умолчанию используется временный файл рядом с результатом
+DEFAULT_TRANSPORT = 'file' if os.name == 'nt' else 'shm'
+
+def collect_jobs(inputs, output_dir=None, suffix='_encoded', existing=()):
+    jobs = []
+    skip_dir = os.path.abspath(output_dir) if output_dir else None
+    # Результаты прошлого запуска на месте и общий рантайм - не исходники
+    skip_names = (suffix + '.py', RUNTIME_MODULE + '.py')
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip_dir)
+                for name in sorted(files):
+                    if name.endswith('.py') and not name.endswith(skip_names):
+                        jobs.append((os.path.join(root, name), path))
+        else:
+            jobs.append((path, os.path.dirname(path)))
+
+    result = []
+    for input_path, base in jobs:
+        if output_dir:
+            # Дерево входного каталога повторяется в output_dir с прежними именами:
+            # пакеты остаются пакетами, а одноимённые модули из разных папок не смешиваются
+            output_path = os.path.join(output_dir, os.path.relpath(input_path, base or '.'))
+        else:
+            output_path = os.path.splitext(input_path)[0] + suffix + '.py'
+        result.append((input_path, output_path))
+    return check_outputs(result, existing)
+
+def check_outputs(jobs, existing=()):
+    # Столкновения выходов ищутся до кодирования: иначе один результат молча затёр бы другой
+    targets = {os.path.abspath(output_path): input_path for input_path, output_path in existing}
+    sources = {os.path.abspath(input_path) for input_path, _ in existing}
+    sources.update(os.path.abspath(input_path) for input_path, _ in jobs)
+    result = []
+    seen = set()
+    for input_path, output_path in jobs:
+        source, target = os.path.abspath(input_path), os.path.abspath(output_path)
+        if source in seen:
+            continue
+        seen.add(source)
+        if target in sources:
+            raise EncodeError("Batch Error", f"Output {output_path} would overwrite input {input_path}")
+        other = targets.get(target)
+        if other is not None and os.path.abspath(other) != source:
+            raise EncodeError("Batch Error", f"{input_path} and {other} would both be written to {output_path}")
+        targets[target] = input_path
+        result.append((input_path, output_path))
+    return result
+
+def _encode_to_chunks(input_path, options, zdict=None, symbols=None):
+    with open_source(input_path) as content:
+        encoded, code = encode_compiled(content, options, zdict, symbols)
+        rng = make_rng(options, content)
+        imports = extract_imports(content) if options['prefetch'] else ()
+        source_size = len(content)
+    footer = output_footer(options, imports)
+    return list(output_chunks(generate_decoder(options, rng), encoded, footer)), source_size, code
+
+def _encode_job(input_path, output_path, options, transport, zdict=None):
+    memory_base = reset_peak_memory()
+    try:
+        return _run_job(input_path, output_path, options, transport, zdict, memory_base)
+    finally:
+        release_memory(peak_memory(memory_base))
+
+def _run_job(input_path, output_path, options, transport, zdict, memory_base):
+    start = time.perf_counter()
+    symbols = {} if options['traceback_map'] else None
+    chunks, source_size, code = _encode_to_chunks(input_path, options, zdict, symbols)
+    size = sum(len(chunk) for chunk in chunks)
+    encode_time = time.perf_counter() - start
+    # Проверяется ровно то, что будет записано, ещё в рабочем процессе
+    if options['verify']:
+        verify_output(b''.join(chunks), options, code, zdict)
+    del code
+    stats = {
+        'input': input_path,
+        'output': output_path,
+        'source_size': source_size,
+        'output_size': size,
+        'encode_time': encode_time,
+        'verify_time': time.perf_counter() - start - encode_time,
+        'output_hash': _chunks_digest(chunks),
+        'peak_memory': peak_memory(memory_base),
+    }
+    if symbols:
+        stats['symbols'] = symbols
+
+    if transport == 'pickle':
+        return stats, b''.join(chunks)
+
+    if transport == 'shm':
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        offset = 0
+        for chunk in chunks:
+            shm.buf[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        shm.close()
+        return stats, shm.name
+
+    tmp_path = temp_path(output_path)
+    with open(tmp_path, 'wb') as f:
+        f.writelines(chunks)
+    return stats, tmp_path
+
+def _chunks_digest(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def _collect_result(stats, handle, transport):
+    output_path = stats['output']
+    if transport == 'pickle':
+        with atomic_open(output_path) as f:
+            f.write(handle)
+    elif transport == 'shm':
+        shm = shared_memory.SharedMemory(name=handle)
+        try:
+            with atomic_open(output_path) as f:
+                f.write(shm.buf[:stats['output_size']])
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        os.replace(handle, output_path)
+
+def _link_output(source_path, output_path, mode):
+    # rename поверх того же inode ничего не делает и оставил бы временный файл
+    if os.path.exists(output_path) and os.path.samefile(source_path, output_path):
+        return
+    tmp_path = temp_path(output_path)
+    try:
+        if mode == 'link':
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                # Другой диск или ФС без жёстких ссылок
+                shutil.copyfile(source_path, tmp_path)
+        else:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _safe_digest(input_path):
+    try:
+        return file_digest(input_path)
+    except OSError:
+        return None
+
+def group_duplicates(jobs, digests):
+    leaders = {}
+    unique = []
+    duplicates = {}
+    for input_path, output_path in jobs:
+        digest = digests.get(input_path)
+        leader = leaders.get(digest) if digest else None
+        if leader is None:
+            if digest:
+                leaders[digest] = input_path
+            unique.append((input_path, output_path))
+        else:
+            duplicates.setdefault(leader, []).append((input_path, output_path))
+    return unique, duplicates
+
+def _payload_sample(input_path, options):
+    try:
+        with open_source(input_path) as content:
+            return build_payload(content, options)[:ZDICT_SAMPLE_SIZE]
+    except EncodeError:
+        return b''
+
+def train_batch_zdict(jobs, options, workers=None, mp_context=None):
+    paths = [input_path for input_path, _ in jobs]
+    if workers == 0:
+        samples = [_payload_sample(path, options) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            samples = list(pool.map(_payload_sample, paths, [options] * len(paths)))
+    return train_zdict(samples)
+
+def encode_batch(jobs, options=None, workers=None, transport=DEFAULT_TRANSPORT, on_result=None, zdict=None,
+                 mp_context=None, journal=None, resume=False, dedup='link', memory_budget=None):
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport: {transport}")
+    if dedup not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {dedup}")
+    options = options or dict(DEFAULT_OPTIONS)
+    key = options_key(options)
+    options = with_cipher_salt(options)
+    done = {}
+    if journal is not None and resume:
+        journal.recover()
+        done = journal.completed(jobs, key)
+        if zdict is None:
+            zdict = journal.get_meta('zdict:' + key)
+    if options['use_zdict']:
+        if not (options['use_zlib'] and options['shared_runtime']):
+            raise ValueError("Shared zlib dictionary requires zlib and the shared runtime")
+        if zdict is None:
+            zdict = train_batch_zdict(jobs, options, workers, mp_context)
+        if journal is not None:
+            journal.set_meta('zdict:' + key, zdict)
+    if options['prefetch'] and not options['shared_runtime']:
+        raise ValueError("Import prefetch requires the shared runtime")
+
+    if transport == 'shm':
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+
+    for _, output_path in jobs:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    if options['shared_runtime'] and jobs:
+        write_runtime(os.path.commonpath([os.path.abspath(os.path.dirname(output_path))
+                                          for _, output_path in jobs]), zdict or b'')
+
+    results = []
+
+    def report(stats):
+        results.append(stats)
+        if on_result:
+            on_result(stats)
+
+    def finish(input_path, job_result, job_transport):
+        try:
+            stats, handle = job_result()
+            _collect_result(stats, handle, job_transport)
+            stats['ok'] = True
+        except EncodeError as e:
+            stats = {'input': input_path, 'ok': False, 'error': f"{e.title}: {e.message}"}
+        except Exception as e:
+            stats = {'input': input_path, 'ok': False, 'error': str(e)}
+        stats['input_hash'] = digests.get(input_path)
+        if journal is not None:
+            journal.finish(stats)
+            if stats.get('symbols'):
+                journal.set_meta('symbols:' + input_path, json.dumps(stats['symbols']))
+        report(stats)
+        for copy_input, copy_output in duplicates.pop(input_path, ()):
+            if stats['ok']:
+                try:
+                    _link_output(stats['output'], copy_output, dedup)
+                    copy_stats = {**stats, 'input': copy_input, 'output': copy_output, 'encode_time': 0.0,
+                                  'verify_time': 0.0, 'deduplicated_from': input_path}
+                except OSError as e:
+                    copy_stats = {'input': copy_input, 'ok': False, 'error': str(e)}
+            else:
+                copy_stats = {**stats, 'input': copy_input}
+            copy_stats['input_hash'] = digests.get(copy_input)
+            if journal is not None:
+                journal.finish(copy_stats)
+            report(copy_stats)
+        return stats
+
+    # Продолжение после сбоя: готовые файлы не перекодируются
+    for input_path, _ in jobs:
+        if input_path in done:
+            if options['traceback_map']:
+                symbols = journal.get_meta('symbols:' + input_path)
+                if symbols:
+                    done[input_path]['symbols'] = json.loads(symbols)
+            report(done[input_path])
+    jobs = [job for job in jobs if job[0] not in done]
+    if journal is not None:
+        journal.start(jobs, key, {input_path: _safe_stat(input_path) for input_path, _ in jobs})
+
+    # Одинаковые исходники кодируются один раз, остальным достаётся ссылка на результат
+    digests = {}
+    if journal is not None or dedup != 'off':
+        digests = {input_path: _safe_digest(input_path) for input_path, _ in jobs}
+    duplicates = {}
+    if dedup != 'off':
+        jobs, duplicates = group_duplicates(jobs, digests)
+
+    # workers=0: всё в текущем процессе, без пула
+    if workers == 0:
+        for input_path, output_path in jobs:
+            finish(input_path, lambda: _encode_job(input_path, output_path, options, 'pickle', zdict), 'pickle')
+        return results
+
+    # Задания допускаются в пул по оценке пиковой памяти: большие идут поодиночке, мелкие
+    # заполняют остаток бюджета. memory_budget=None - доля доступной памяти, 0 - без ограничения.
+    slots = workers or os.cpu_count() or 1
+    budget = default_budget() if memory_budget is None else (memory_budget or None)
+    # Вдвое больше заданий, чем процессов: освободившийся процесс не ждёт ответа родителя,
+    # а бюджет заранее учитывает и стоящие в очереди пула
+    scheduler = MemoryScheduler(options, budget, slots * 2)
+    outputs = dict(jobs)
+    scheduler.add((input_path, _safe_size(input_path)) for input_path, _ in jobs)
+    with ProcessPoolExecutor(max_workers=slots, mp_context=mp_context) as pool:
+        futures = {}
+        while scheduler.pending() or futures:
+            for input_path in scheduler.take():
+                futures[pool.submit(_encode_job, input_path, outputs[input_path], options, transport, zdict)] = input_path
+            completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in completed:
+                input_path = futures.pop(future)
+                scheduler.finish(input_path, finish(input_path, future.result, transport).get('peak_memory'))
+    return results
+
+def _safe_size(input_path):
+    try:
+        return os.path.getsize(input_path)
+    except OSError:
+        return 0
+
+def _safe_stat(input_path):
+    try:
+        return input_stat(input_path)
+    except OSError:
+        return None, None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Batch encoding of Python files')
+    parser.add_argument('inputs', nargs='+', help='Python files or directories')
+    parser.add_argument('-o', '--output-dir', help='Output directory (default: next to input)')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--transport', choices=TRANSPORTS, default=DEFAULT_TRANSPORT)
+    parser.add_argument('--journal', help='Record progress in this journal database '
+                                          '(with --resume the default is .se_journal.sqlite in the output root)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Record progress in a journal and skip files completed by a previous interrupted run')
+    parser.add_argument('--dedup', choices=DEDUP_MODES, default='link',
+                        help='Encode identical sources once and hard-link or copy the result')
+    parser.add_argument('--memory-budget', type=int, default=None,
+                        help='Memory for concurrent jobs in MB (default: 75%% of available memory, 0: no limit)')
+    parser.add_argument('--assets', action='store_true',
+                        help='Pack non-Python files from input directories into an encoded asset bundle')
+    add_option_arguments(parser)
+    return parser
+
+def add_option_arguments(parser):
+    for key, value in DEFAULT_OPTIONS.items():
+        flag = '--' + key.replace('_', '-')
+        if isinstance(value, bool):
+            parser.add_argument(flag, dest=key, action=argparse.BooleanOptionalAction, default=value)
+        else:
+            parser.add_argument(flag, dest=key, type=type(value), default=value)
+
+def options_from_args(args):
+    return make_options(**{key: getattr(args, key) for key in DEFAULT_OPTIONS if hasattr(args, key)})
+
+def write_traceback_map(results, options, jobs):
+    modules = [{**stats['symbols'], 'path': stats['input']} for stats in results
+               if stats['ok'] and stats.get('symbols')]
+    if not modules:
+        return None
+    root = os.path.commonpath([os.path.abspath(os.path.dirname(output_path) or '.') for _, output_path in jobs])
+    return write_build_map(root, modules, options_key(options))
+
+def pack_assets(args, options, jobs, zdict=None):
+    if jobs:
+        root = os.path.commonpath([os.path.abspath(os.path.dirname(output_path) or '.') for _, output_path in jobs])
+    else:
+        root = os.path.abspath(args.output_dir or os.path.commonpath([os.path.abspath(path) for path in args.inputs]))
+    stats = write_assets(args.inputs, root, options, output_dir=args.output_dir)
+    if stats is None:
+        print("No assets found")
+        return
+    # Доступ к ассетам живёт в общем рантайме, рядом с пакетом
+    write_runtime(root, zdict or b'')
+    print(f"Assets: {stats['count']} files, {stats['source_size']:,} -> {stats['output_size']:,} bytes "
+          f"in {stats['path']}")
+
+def print_result(stats):
+    if stats.get('skipped'):
+        print(f"⏭️ {stats['input']} -> {stats['output']} (up to date)")
+    elif stats.get('deduplicated_from'):
+        print(f"🔗 {stats['input']} -> {stats['output']} (same as {stats['deduplicated_from']})")
+    elif stats['ok']:
+        print(f"✅ {stats['input']} -> {stats['output']} "
+              f"({stats['source_size']:,} -> {stats['output_size']:,} bytes, {stats['encode_time']:.2f}s)")
+    else:
+        print(f"❌ {stats['input']}: {stats['error']}", file=sys.stderr)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = options_from_args(args)
+    try:
+        jobs = collect_jobs(args.inputs, args.output_dir)
+    except EncodeError as e:
+        print(f"❌ {e.title}: {e.message}", file=sys.stderr)
+        return 1
+    if not jobs:
+        print("No Python files found")
+        if args.assets:
+            pack_assets(args, options, jobs)
+        return 0
+    # Журнал нужен только для продолжения: разовый пакет не оставляет файлов в дереве пользователя
+    journal = Journal(args.journal or default_journal_path(jobs)) if args.resume or args.journal else None
+    try:
+        if journal is not None and not args.resume:
+            journal.reset()
+        # Соль пароля общая на пакет; продолжение берёт её из журнала, и ключ выводится один раз
+        salt_key = 'cipher_salt:' + options_key(options)
+        options = with_cipher_salt(options, journal.get_meta(salt_key) if args.resume else None)
+        if journal is not None and options['cipher_salt']:
+            journal.set_meta(salt_key, options['cipher_salt'])
+        zdict = journal.get_meta('zdict:' + options_key(options)) if args.resume else None
+        if options['use_zdict'] and zdict is None:
+            zdict = train_batch_zdict(jobs, options, args.workers)
+            print(f"Shared zlib dictionary: {len(zdict):,} bytes")
+        results = encode_batch(jobs, options, workers=args.workers, transport=args.transport,
+                               on_result=print_result, zdict=zdict, journal=journal, resume=args.resume,
+                               dedup=args.dedup,
+                               memory_budget=None if args.memory_budget is None else args.memory_budget * MB)
+    finally:
+        if journal is not None:
+            journal.close()
+    if options['traceback_map']:
+        map_path = write_traceback_map(results, options, jobs)
+        if map_path:
+            print(f"Traceback map: {map_path}")
+    if args.assets:
+        pack_assets(args, options, jobs, zdict)
+    failed = sum(1 for stats in results if not stats['ok'])
+    skipped = sum(1 for stats in results if stats.get('skipped'))
+    print(f"Encoded {len(results) - failed}/{len(results)} files" + (f" ({skipped} up to date)" if skipped else ""))
+    encoded = [stats for stats in results if stats['ok']]
+    copies = [stats for stats in encoded if 'deduplicated_from' in stats]
+    if copies:
+        unique = len({stats['deduplicated_from'] for stats in copies})
+        print(f"Deduplicated: {len(copies)} files share {unique} encoded sources "
+              f"({sum(stats['output_size'] for stats in copies):,} output bytes not re-encoded)")
+    peaks = [stats['peak_memory'] for stats in encoded if stats.get('peak_memory') is not None]
+    if peaks:
+        print(f"Peak job memory: {max(peaks) / MB:,.0f} MB")
+    if encoded:
+        source_total = sum(stats['source_size'] for stats in encoded)
+        output_total = sum(stats['output_size'] for stats in encoded)
+        print(f"Total: {source_total:,} -> {output_total:,} bytes")
+        if options['verify']:
+            encode_total = sum(stats['encode_time'] for stats in encoded)
+            verify_total = sum(stats['verify_time'] for stats in encoded)
+            print(f"Verified: {verify_total:.2f}s ({verify_total / (encode_total or 1e-9):.1%} of encode time)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,945 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from encoder import make_options, read_source, open_source, encode_source, generate_decoder, render_output, write_output
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+def make_large_source(path, size):
+    # Один большой bytes-литерал: compile() на нём быстрый, а полезная нагрузка растёт линейно
+    chunk = os.urandom(64 * 1024)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('DATA = (\n')
+        written = 0
+        offset = 0
+        while written < size:
+            if offset >= len(chunk):
+                chunk = os.urandom(64 * 1024)
+                offset = 0
+            line = '    ' + repr(chunk[offset:offset + 512]) + '\n'
+            f.write(line)
+            written += len(line)
+            offset += 512
+        f.write(')\nprint(len(DATA))\n')
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+def bench_transport(args):
+    from batch import encode_batch, TRANSPORTS
+
+    options = make_options(use_marshal=True, use_zlib=True, use_base64=True)
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            jobs = []
+            for i in range(args.files):
+                input_path = os.path.join(workdir, f'src_{size_mb}_{i}.py')
+                make_large_source(input_path, size_mb * MB)
+                jobs.append((input_path, os.path.join(workdir, 'out', f'src_{size_mb}_{i}_encoded.py')))
+            for transport in TRANSPORTS:
+                elapsed, results = timed(encode_batch, jobs, options, workers=args.workers, transport=transport)
+                out_size = sum(stats.get('output_size', 0) for stats in results)
+                rows.append((f'{size_mb} MB x{args.files}', transport, f'{elapsed:.2f}s',
+                             f'{out_size / MB / elapsed:.1f} MB/s'))
+            for input_path, _ in jobs:
+                os.remove(input_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('input', 'transport', 'wall', 'output throughput'), rows)
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / (MB if sys.platform == 'darwin' else 1024)
+
+def _legacy_io(input_path, output_path, options):
+    content = read_source(input_path)
+    encoded = encode_source(content, options)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(render_output(generate_decoder(options), encoded))
+
+def _mmap_io(input_path, output_path, options):
+    with open_source(input_path) as content:
+        encoded = encode_source(content, options)
+    write_output(output_path, generate_decoder(options), encoded)
+
+def _run_io(func, input_path, output_path, options):
+    elapsed, _ = timed(func, input_path, output_path, options)
+    return elapsed, _peak_rss_mb()
+
+def bench_io(args):
+    configs = {
+        'marshal+zlib+b85': make_options(use_marshal=True, use_zlib=True, use_base64=True),
+        'zlib+b85': make_options(use_marshal=False, use_zlib=True, use_base64=True),
+    }
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            input_path = os.path.join(workdir, f'src_{size_mb}.py')
+            make_large_source(input_path, size_mb * MB)
+            for config_name, options in configs.items():
+                for name, func in (('legacy', _legacy_io), ('mmap', _mmap_io)):
+                    output_path = os.path.join(workdir, f'out_{name}.py')
+                    # Каждый прогон в свежем процессе, чтобы ru_maxrss не копился
+                    with ProcessPoolExecutor(max_workers=1) as pool:
+                        elapsed, peak = pool.submit(_run_io, func, input_path, output_path, options).result()
+                    rows.append((f'{size_mb} MB', config_name, name, f'{elapsed:.2f}s',
+                                 'n/a' if peak is None else f'{peak:.0f} MB'))
+                    os.remove(output_path)
+            os.remove(input_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('input', 'stages', 'path', 'wall', 'peak RSS'), rows)
+
+def make_module_source(path, index):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'"""Generated module {index}."""\n')
+        f.write(f'KEYS = frozenset({{"alpha", "beta", "gamma", "m{index}"}})\n\n')
+        for i in range(20):
+            f.write(f'def func_{index}_{i}(value, **kwargs):\n')
+            f.write(f'    """Docstring {i}."""\n')
+            f.write(f'    return value in {{"x{i}", "y{i}"}} or kwargs.get("k{i}", {i})\n\n')
+
+def _read_outputs(jobs):
+    outputs = {}
+    for input_path, output_path in jobs:
+        with open(output_path, 'rb') as f:
+            outputs[os.path.basename(input_path)] = f.read()
+    return outputs
+
+def bench_determinism(args):
+    from batch import encode_batch
+
+    options = make_options(use_junk=True, junk_size=50, deterministic=True, seed_key='bench')
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        sources = []
+        for i in range(args.files):
+            input_path = os.path.join(workdir, f'mod_{i}.py')
+            make_module_source(input_path, i)
+            sources.append(input_path)
+
+        runs = {}
+        for name, workers, transport in (('serial', 0, 'pickle'),
+                                         ('parallel-shm', args.workers or 4, 'shm'),
+                                         ('parallel-file', args.workers or 4, 'file')):
+            jobs = [(path, os.path.join(workdir, name, os.path.basename(path))) for path in sources]
+            elapsed, _ = timed(encode_batch, jobs, options, workers=workers, transport=transport)
+            runs[name] = _read_outputs(jobs)
+            print(f'{name:<14} {elapsed:.2f}s')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    reference = runs['serial']
+    mismatched = [(name, module) for name, outputs in runs.items()
+                  for module, data in outputs.items() if data != reference[module]]
+    if mismatched:
+        for name, module in mismatched:
+            print(f'❌ {name}: {module} differs from serial run')
+        return 1
+    print(f'✅ {len(runs)} runs x {len(reference)} files are byte-identical')
+    return 0
+
+def bench_startup(args):
+    import subprocess
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mq.py')
+    env = dict(os.environ, SE_STARTUP_PROBE='1')
+    samples = []
+    for _ in range(args.repeats):
+        launched = time.time()
+        proc = subprocess.run([sys.executable, script], env=env, capture_output=True, text=True, timeout=60)
+        for line in proc.stdout.splitlines():
+            if line.startswith('first_paint='):
+                samples.append(float(line.split('=', 1)[1]) - launched)
+                break
+        else:
+            print(proc.stderr, file=sys.stderr)
+            return 1
+    samples.sort()
+    print_table(('runs', 'min', 'median', 'max'),
+                [(len(samples), f'{samples[0] * 1000:.0f} ms', f'{samples[len(samples) // 2] * 1000:.0f} ms',
+                  f'{samples[-1] * 1000:.0f} ms')])
+    return 0
+
+IMPORT_SCRIPT = '''
+import sys, time, importlib
+sys.path.insert(0, sys.argv[1])
+names = sys.argv[2:]
+start = time.perf_counter()
+for name in names:
+    importlib.import_module(name)
+print(time.perf_counter() - start)
+'''
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files if name.endswith('.py'))
+
+def bench_runtime(args):
+    import subprocess
+    from batch import encode_batch
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        sources = []
+        for i in range(args.files):
+            input_path = os.path.join(workdir, f'mod_{i}.py')
+            make_module_source(input_path, i)
+            sources.append(input_path)
+        names = [os.path.splitext(os.path.basename(path))[0] for path in sources]
+
+        for mode, shared in (('embedded', False), ('shared', True)):
+            target = os.path.join(workdir, mode)
+            jobs = [(path, os.path.join(target, os.path.basename(path))) for path in sources]
+            encode_batch(jobs, make_options(shared_runtime=shared), workers=args.workers)
+            timings = []
+            for _ in range(args.repeats):
+                # -B: без __pycache__, каждый запуск компилирует заглушки заново
+                proc = subprocess.run([sys.executable, '-B', '-c', IMPORT_SCRIPT, target, *names],
+                                      capture_output=True, text=True, check=True)
+                timings.append(float(proc.stdout))
+            rows.append((mode, f'{_dir_size(target):,}', f'{min(timings) * 1000:.1f} ms'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table((f'{args.files} modules', 'total size', 'import all'), rows)
+
+def stdlib_corpus(count, max_size=8 * 1024):
+    stdlib = os.path.dirname(os.__file__)
+    paths = []
+    for root, dirs, files in os.walk(stdlib):
+        dirs[:] = sorted(d for d in dirs if d not in ('site-packages', 'test', 'tests', 'idlelib'))
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if name.endswith('.py') and os.path.getsize(path) <= max_size:
+                paths.append(path)
+                if len(paths) == count:
+                    return paths
+    return paths
+
+def _load_runtime(directory):
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('_se_runtime_bench', os.path.join(directory, '_se_runtime.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _read_payloads(jobs):
+    import ast
+    payloads = []
+    for _, output_path in jobs:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('encoded = '):
+                    payloads.append(ast.literal_eval(line[len('encoded = '):]))
+                    break
+    return payloads
+
+def bench_zdict(args):
+    from batch import encode_batch
+
+    sources = stdlib_corpus(args.files)
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for mode, use_zdict in (('per-file', False), ('zdict', True)):
+            target = os.path.join(workdir, mode)
+            jobs = [(path, os.path.join(target, f'm{i}.py')) for i, path in enumerate(sources)]
+            options = make_options(shared_runtime=True, use_zdict=use_zdict)
+            encode_batch(jobs, options, workers=args.workers)
+            # Файлы, которые не компилируются текущей версией Python, пропускаются
+            jobs = [job for job in jobs if os.path.exists(job[1])]
+            runtime = _load_runtime(target)
+            payloads = _read_payloads(jobs)
+            chain = 'b85+zlibd+marshal' if use_zdict else 'b85+zlib+marshal'
+            best = None
+            for _ in range(args.repeats):
+                elapsed, _ = timed(lambda: [runtime.decode_v1(p, chain) for p in payloads])
+                best = elapsed if best is None else min(best, elapsed)
+            rows.append((mode, len(payloads), f'{_dir_size(target):,}', f'{sum(map(len, payloads)):,}',
+                         f'{best * 1000:.1f} ms'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('mode', 'files', 'total size', 'payload bytes', 'decode all'), rows)
+
+def make_app_tree(directory, count, fanout=4):
+    package = os.path.join(directory, 'app')
+    os.makedirs(package, exist_ok=True)
+    open(os.path.join(package, '__init__.py'), 'w').close()
+    for index in range(count):
+        children = [f'm_{child}' for child in range(index * fanout + 1, min(index * fanout + fanout, count - 1) + 1)]
+        with open(os.path.join(package, f'm_{index}.py'), 'w', encoding='utf-8') as f:
+            f.write('import hashlib\n')
+            if children:
+                f.write(f'from . import {", ".join(children)}\n')
+            # Работа без GIL, пока фоновый поток распаковывает соседние модули
+            f.write('DIGEST = hashlib.sha256(bytes(1 << 20)).hexdigest()\n\n')
+            for i in range(100):
+                f.write(f'def func_{index}_{i}(value, **kwargs):\n')
+                f.write(f'    return value in {{"x{i}", "y{i}"}} or kwargs.get("k{i}", {i})\n\n')
+    with open(os.path.join(directory, 'main.py'), 'w', encoding='utf-8') as f:
+        f.write('import app.m_0\n')
+    return [os.path.join(package, f'm_{index}.py') for index in range(count)] + [os.path.join(directory, 'main.py')]
+
+def bench_prefetch(args):
+    import subprocess
+    from batch import encode_batch
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        source_dir = os.path.join(workdir, 'src')
+        target = os.path.join(workdir, 'out')
+        sources = make_app_tree(source_dir, args.files)
+        jobs = [(path, os.path.join(target, os.path.relpath(path, source_dir))) for path in sources]
+        encode_batch(jobs, make_options(shared_runtime=True, prefetch=True), workers=args.workers)
+        open(os.path.join(target, 'app', '__init__.py'), 'w').close()
+        for mode, env in (('inline', {'SE_NO_PREFETCH': '1'}), ('prefetch', {})):
+            timings = []
+            for _ in range(args.repeats):
+                proc = subprocess.run([sys.executable, '-B', '-c', IMPORT_SCRIPT, target, 'main'],
+                                      capture_output=True, text=True, check=True, env={**os.environ, **env})
+                timings.append(float(proc.stdout))
+            timings.sort()
+            rows.append((mode, f'{timings[0] * 1000:.1f} ms', f'{timings[len(timings) // 2] * 1000:.1f} ms'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table((f'{args.files} modules', 'best', 'median'), rows)
+
+def bench_cipher(args):
+    import random
+    import hashlib
+    from encoder import CIPHER_SOURCE, encrypt_payload, cipher_material
+    from stages import CIPHER_SALT_SIZE, CIPHER_KDF_ITERATIONS
+
+    # Та же функция, что попадает в декодер и в рантайм
+    runtime = {'hashlib': hashlib, 'os': os, 'sys': sys}
+    exec(CIPHER_SOURCE, runtime)
+    decrypt = runtime['_decrypt']
+    options = make_options(use_cipher=True)
+
+    rows = []
+    worst = 0.0
+    for size in args.sizes:
+        data = random.Random(size).randbytes(size * MB)
+        material = cipher_material(options, data)
+        encrypt_time = decrypt_time = None
+        for _ in range(args.repeats):
+            elapsed, encrypted = timed(encrypt_payload, data, options, material)
+            encrypt_time = elapsed if encrypt_time is None else min(encrypt_time, elapsed)
+            elapsed, decrypted = timed(decrypt, encrypted)
+            decrypt_time = elapsed if decrypt_time is None else min(decrypt_time, elapsed)
+        if decrypted != data:
+            print(f"❌ Round trip mismatch at {size} MB", file=sys.stderr)
+            return 1
+        worst = max(worst, decrypt_time * 1000 / size)
+        rows.append((f'{size} MB', f'{size / encrypt_time:.0f} MB/s', f'{size / decrypt_time:.0f} MB/s',
+                     f'{decrypt_time * 1000 / size:.2f} ms'))
+    print_table(('payload', 'encrypt', 'decrypt', 'decrypt per MB'), rows)
+    print(f"Worst start-up cost: {worst:.2f} ms per MB of payload")
+    # С паролем к запуску добавляется вывод ключа: один раз на процесс, соль общая на пакет
+    kdf_time = min(timed(runtime['_cipher_key'], 'bench', os.urandom(CIPHER_SALT_SIZE), CIPHER_KDF_ITERATIONS)[0]
+                   for _ in range(args.repeats))
+    print(f"Passphrase key derivation: {kdf_time * 1000:.1f} ms per process "
+          f"(PBKDF2-HMAC-SHA256, {CIPHER_KDF_ITERATIONS:,} iterations)")
+
+def bench_dedup(args):
+    from batch import encode_batch
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        # Одно дерево и его вендорные копии: четыре пятых файлов повторяются
+        source_dir = os.path.join(workdir, 'src')
+        sources = make_app_tree(os.path.join(source_dir, 'vendor_0'), args.files)
+        for copy in range(1, 5):
+            shutil.copytree(os.path.join(source_dir, 'vendor_0'), os.path.join(source_dir, f'vendor_{copy}'))
+            sources += [path.replace('vendor_0', f'vendor_{copy}') for path in sources[:args.files + 1]]
+        options = make_options(deterministic=True)
+        for mode in ('off', 'copy', 'link'):
+            target = os.path.join(workdir, mode)
+            jobs = [(path, os.path.join(target, os.path.relpath(path, source_dir))) for path in sources]
+            for path in {os.path.dirname(output_path) for _, output_path in jobs}:
+                os.makedirs(path, exist_ok=True)
+            elapsed, results = timed(encode_batch, jobs, options, args.workers, dedup=mode)
+            inodes = {os.stat(output_path).st_ino: os.path.getsize(output_path) for _, output_path in jobs}
+            copies = sum(1 for stats in results if 'deduplicated_from' in stats)
+            rows.append((mode, f'{len(jobs)}', f'{copies}', f'{elapsed:.2f}s', f'{sum(inodes.values()) / MB:.1f} MB'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('dedup', 'files', 'reused', 'time', 'on disk'), rows)
+
+def _children_rss():
+    # Сумма RSS дочерних процессов (рабочих процессов пула), только Linux
+    total = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                if int(f.read().rsplit(')', 1)[1].split()[1]) != os.getpid():
+                    continue
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+        except (OSError, ValueError, IndexError, StopIteration):
+            continue
+    return total
+
+def bench_memory(args):
+    import threading
+    from batch import encode_batch
+    from scheduler import estimate_factor
+
+    if not os.path.isdir('/proc'):
+        print("Memory sampling needs /proc")
+        return 1
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        # Несколько больших сгенерированных модулей среди обычного дерева
+        source_dir = os.path.join(workdir, 'src')
+        sources = make_app_tree(source_dir, 200)
+        for size_mb in args.sizes:
+            for index in range(args.files):
+                path = os.path.join(source_dir, f'generated_{size_mb}_{index}.py')
+                make_large_source(path, size_mb * MB)
+                sources.append(path)
+        options = make_options()
+        workers = args.workers or os.cpu_count() or 1
+        largest = max(args.sizes) * MB * estimate_factor(options)
+        for label, budget in (('no limit', 0), ('2 large jobs', int(largest * 2)), ('1 large job', int(largest))):
+            target = os.path.join(workdir, 'out')
+            shutil.rmtree(target, ignore_errors=True)
+            jobs = [(path, os.path.join(target, os.path.relpath(path, source_dir))) for path in sources]
+            peak = 0
+            done = threading.Event()
+
+            def sample():
+                nonlocal peak
+                while not done.wait(0.02):
+                    peak = max(peak, _children_rss())
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            try:
+                elapsed, results = timed(encode_batch, jobs, options, workers, dedup='off', memory_budget=budget)
+            finally:
+                done.set()
+                sampler.join()
+            failed = sum(1 for stats in results if not stats['ok'])
+            rows.append((label, f'{budget / MB:,.0f} MB' if budget else '-', f'{len(jobs)}', f'{failed}',
+                         f'{elapsed:.2f}s', f'{peak / MB:,.0f} MB'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('budget', 'limit', 'files', 'failed', 'time', 'workers peak RSS'), rows)
+
+# Холодный старт: первый вызов распаковки и marshal.loads в новом интерпретаторе.
+# Разбор литерала нагрузки не входит в замер: он одинаков при любом числе сегментов.
+DECODE_SCRIPT = '''
+import sys, time, marshal
+source = open(sys.argv[1], encoding='utf-8').read()
+namespace = {}
+exec(compile(source, sys.argv[1], 'exec'), namespace)
+inflate = namespace.get('_inflate_segments') or namespace['zlib'].decompress
+start = time.perf_counter()
+data = inflate(namespace['encoded'])
+inflated = time.perf_counter()
+marshal.loads(data)
+print(inflated - start, time.perf_counter() - start)
+'''
+
+def make_code_source(path, size):
+    # Обычный код, а не bytes-литерал: marshal такого модуля хорошо сжимается
+    with open(path, 'w', encoding='utf-8') as f:
+        written = 0
+        index = 0
+        while written < size:
+            block = (f'def func_{index}(value, **kwargs):\n'
+                     f'    return value in {{"x{index}", "y{index}"}} or kwargs.get("k{index}", {index})\n\n')
+            f.write(block)
+            written += len(block)
+            index += 1
+
+def bench_segments(args):
+    import subprocess
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            input_path = os.path.join(workdir, f'src_{size_mb}.py')
+            make_code_source(input_path, size_mb * MB)
+            baseline = None
+            for segments in (0, 2, 4, 8, 16):
+                # Только zlib и marshal: base85 однопоточный и скрыл бы разницу
+                options = make_options(use_base64=False, zlib_segments=segments)
+                probe_path = os.path.join(workdir, 'probe.py')
+                with open_source(input_path) as content:
+                    encoded = encode_source(content, options)
+                with open(probe_path, 'w', encoding='utf-8') as f:
+                    f.write(render_output(generate_decoder(options), encoded, ''))
+                samples = sorted(tuple(map(float, subprocess.run([sys.executable, '-c', DECODE_SCRIPT, probe_path],
+                                                                 capture_output=True, text=True,
+                                                                 check=True).stdout.split()))
+                                 for _ in range(args.repeats))
+                inflate, total = samples[len(samples) // 2]
+                baseline = baseline or inflate
+                rows.append((f'{size_mb} MB', segments or 'single', f'{len(encoded) / MB:.2f} MB',
+                             f'{inflate * 1000:.1f} ms', f'{baseline / inflate:.2f}x', f'{total * 1000:.1f} ms'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"CPUs: {os.cpu_count()}")
+    print_table(('input', 'segments', 'payload', 'inflate', 'speedup', 'inflate + marshal.loads'), rows)
+
+def bench_junk(args):
+    import random
+    from encoder import junk_block, junk_bytes_block
+
+    rows = []
+    for size_mb in args.sizes:
+        target = size_mb * MB
+        elapsed, block = min((timed(junk_bytes_block, target, random.Random(seed)) for seed in range(args.repeats)),
+                             key=lambda item: item[0])
+        compile(block, '<junk>', 'exec')
+        rows.append((f'{size_mb} MB', 'templates', f'{len(block) / MB:.2f} MB',
+                     f'{elapsed * 1000:.1f} ms', f'{len(block) / MB / elapsed:.1f} MB/s'))
+        # Старый генератор задаётся числом инструкций: их подбирается столько же по среднему размеру
+        sample = junk_block(1000, random.Random(0))
+        statements = int(target / (len(sample) / 1000))
+        elapsed, block = timed(junk_block, statements, random.Random(0))
+        rows.append((f'{size_mb} MB', 'statements', f'{len(block) / MB:.2f} MB',
+                     f'{elapsed * 1000:.1f} ms', f'{len(block) / MB / elapsed:.1f} MB/s'))
+    print_table(('target', 'generator', 'junk', 'time', 'throughput'), rows)
+
+# Пик по VmHWM: ru_maxrss после fork и exec наследует пик родителя
+LAZY_SCRIPT = '''
+import sys, time
+def peak():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmHWM:'))
+source = open(sys.argv[1], encoding='utf-8').read()
+base = peak()
+start = time.perf_counter()
+namespace = {'__name__': 'probe'}
+exec(compile(source, sys.argv[1], 'exec'), namespace)
+loaded = time.perf_counter()
+namespace['lookup'](1)
+touched = time.perf_counter()
+print(loaded - start, touched - loaded, peak() - base)
+'''
+
+def make_constant_source(path, size, table_size=MB):
+    # Таблицы по table_size байт, программа обращается только к первой
+    with open(path, 'w', encoding='utf-8') as f:
+        written = 0
+        index = 0
+        while written < size:
+            f.write(f'TABLE_{index} = {{\n')
+            start = written
+            key = 0
+            while written - start < table_size:
+                line = f'    {key}: ("name-{index}-{key}", {key * 0.5}, {key % 7}),\n'
+                f.write(line)
+                written += len(line)
+                key += 1
+            f.write('}\n\n')
+            index += 1
+        f.write('def lookup(key):\n    return TABLE_0.get(key)\n\n')
+        # Глобальные таблицы ленивы только как часть объявленного API модуля
+        f.write(f"__all__ = {['lookup'] + [f'TABLE_{i}' for i in range(index)]!r}\n")
+
+def bench_lazy(args):
+    import subprocess
+
+    if not os.path.exists('/proc/self/status'):
+        print("/proc/self/status is not available")
+        return
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            input_path = os.path.join(workdir, f'src_{size_mb}.py')
+            make_constant_source(input_path, size_mb * MB)
+            for mode, options in (('inline', make_options()), ('lazy', make_options(lazy_constants=True))):
+                probe_path = os.path.join(workdir, 'probe.py')
+                with open_source(input_path) as content:
+                    encoded = encode_source(content, options)
+                with open(probe_path, 'w', encoding='utf-8') as f:
+                    f.write(render_output(generate_decoder(options), encoded))
+                samples = sorted(tuple(map(float, subprocess.run([sys.executable, '-c', LAZY_SCRIPT, probe_path],
+                                                                 capture_output=True, text=True,
+                                                                 check=True).stdout.split()))
+                                 for _ in range(args.repeats))
+                load, first, peak = samples[len(samples) // 2]
+                rows.append((f'{size_mb} MB', mode, f'{os.path.getsize(probe_path) / MB:.2f} MB',
+                             f'{load * 1000:.1f} ms', f'{first * 1000:.2f} ms', f'{peak / MB:.1f} MB'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('input', 'constants', 'output', 'start-up', 'first access', 'peak RSS'), rows)
+
+def bench_memo(args):
+    from memo import StageMemo, encode_memoized
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            input_path = os.path.join(workdir, f'src_{size_mb}.py')
+            make_code_source(input_path, size_mb * MB)
+            memo = StageMemo()
+            # Переключения флажков, как в интерфейсе: каждое следующее опирается на кэш предыдущих
+            for change, options in (('cold', make_options()),
+                                    ('use_base64 off', make_options(use_base64=False)),
+                                    ('use_base64 on', make_options()),
+                                    ('use_binascii on', make_options(use_binascii=True)),
+                                    ('use_compress on', make_options(use_compress=True)),
+                                    ('optimize_level 2', make_options(use_compress=True, optimize_level=2))):
+                report = {}
+                with open_source(input_path) as content:
+                    elapsed, _ = timed(encode_memoized, memo, content, options, report=report)
+                rows.append((f'{size_mb} MB', change, f"{report['cached']}/{report['steps']}",
+                             f'{elapsed * 1000:.1f} ms', f"{report['estimated_time'] * 1000:.1f} ms",
+                             f'{memo.size / MB:.1f} MB'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('input', 'change', 'cached', 'encode', 'cold estimate', 'memo'), rows)
+
+# Открытия файлов считает аудит-хук; в режиме bundle сюда входит и импорт рантайма
+ASSETS_SCRIPT = '''
+import os, sys, time
+mode, root = sys.argv[1], sys.argv[2]
+with open(sys.argv[3], encoding='utf-8') as f:
+    names = f.read().split()
+opens = []
+sys.addaudithook(lambda event, args: opens.append(args[0]) if event == 'open' else None)
+start = time.perf_counter()
+if mode == 'loose':
+    for name in names:
+        with open(os.path.join(root, name), 'rb') as f:
+            f.read()
+else:
+    sys.path.insert(0, root)
+    from _se_runtime import read_binary
+    for name in names:
+        read_binary(name)
+print(time.perf_counter() - start, len(opens))
+'''
+
+def bench_assets(args):
+    import json
+    import random
+    import subprocess
+    from bundle import collect_assets, write_bundle
+    from encoder import ASSET_BUNDLE, write_runtime
+
+    rng = random.Random(0)
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for count in (args.files * 50, args.files * 500):
+            source_dir = os.path.join(workdir, f'assets_{count}')
+            for index in range(count):
+                path = os.path.join(source_dir, f'group_{index % 20}', f'item_{index}.json')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump({'id': index, 'values': [rng.random() for _ in range(100)]}, f)
+            assets = collect_assets([source_dir])
+            names_path = os.path.join(workdir, 'names.txt')
+            with open(names_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(name for name, _ in assets))
+            layouts = [('loose', source_dir, sum(os.path.getsize(path) for _, path in assets))]
+            # base85 для бинарного пакета - только цена; zlib без него показывает чистую распаковку
+            for layout, options in (('bundle', make_options()), ('bundle, zlib', make_options(use_base64=False))):
+                build_dir = os.path.join(workdir, f'build_{count}_{len(layouts)}')
+                os.makedirs(build_dir)
+                stats = write_bundle(os.path.join(build_dir, ASSET_BUNDLE), assets, options)
+                write_runtime(build_dir)
+                layouts.append((layout, build_dir, stats['output_size']))
+            for layout, root, size in layouts:
+                mode = 'loose' if layout == 'loose' else 'bundle'
+                # Самый медленный запуск (холодный страничный кэш, компиляция рантайма) отбрасывается
+                samples = sorted(tuple(map(float, subprocess.run([sys.executable, '-c', ASSETS_SCRIPT, mode, root,
+                                                                  names_path], capture_output=True, text=True,
+                                                                 check=True).stdout.split()))
+                                 for _ in range(args.repeats + 1))[:args.repeats]
+                elapsed, opens = samples[len(samples) // 2]
+                rows.append((count, layout, int(opens), f'{size / MB:.2f} MB', f'{elapsed * 1000:.1f} ms'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('assets', 'layout', 'opens', 'size', 'read all'), rows)
+
+def bench_profile(args):
+    from encoder import PROFILE_ENV
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            input_path = os.path.join(workdir, f'src_{size_mb}.py')
+            make_large_source(input_path, size_mb * MB)
+            with open_source(input_path) as content:
+                encoded = encode_source(content, make_options())
+            os.remove(input_path)
+            timings = {}
+            for mode, hooks, env in (('no hooks', False, None), ('hooks, unset', True, None),
+                                     ('hooks, SE_PROFILE', True, os.devnull)):
+                if env is None:
+                    os.environ.pop(PROFILE_ENV, None)
+                else:
+                    os.environ[PROFILE_ENV] = env
+                # Переменная читается при выполнении декодера, как при импорте файла
+                namespace = {}
+                exec(generate_decoder(make_options(profile_hooks=hooks)), namespace)
+                timings[mode] = min(timed(namespace['decode'], encoded)[0] for _ in range(args.repeats))
+            os.environ.pop(PROFILE_ENV, None)
+            base = timings['no hooks']
+            for mode, elapsed in timings.items():
+                rows.append((f'{size_mb} MB', mode, f'{elapsed * 1000:.2f} ms', f'{(elapsed - base) * 1e6:+.0f} us'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('input', 'decoder', 'decode', 'overhead'), rows)
+
+def bench_tracemap(args):
+    import io
+    import random
+    from encoder import compile_source
+    from tracemap import SymbolMap, TracebackRewriter, filter_stream, write_build_map
+
+    options = make_options(traceback_map=True, strip_lines=True, use_rename=True)
+    modules = []
+    for path in stdlib_corpus(max(args.files, 50), max_size=64 * 1024):
+        symbols = {}
+        try:
+            compile_source(read_source(path), options, symbols)
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        modules.append({**symbols, 'path': path})
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        symbols = SymbolMap(write_build_map(workdir, modules))
+        rng = random.Random(0)
+        frames = [(bytes.fromhex(module['module']), rank) for module in modules
+                  for rank in range(1, len(module['lines']) + 1)]
+        probes = [rng.choice(frames) for _ in range(100000)]
+        elapsed, _ = timed(lambda: [symbols.line(module, rank) for module, rank in probes])
+        rows.append(('lookup', f'{len(frames):,} lines', f'{len(probes) / elapsed / 1e6:.2f} M/s', ''))
+
+        def traceback():
+            module, rank = rng.choice(frames)
+            return (b'Traceback (most recent call last):\n'
+                    b'  File "<se:' + module.hex().encode() + b'>", line ' + str(rank).encode() + b', in handler\n'
+                    b"UnboundLocalError: cannot access local variable '_v1' where it is not associated with a value\n")
+
+        plain = b'2024-05-01 12:00:00,000 INFO worker.pool request handled in 12 ms status=200 path=/api/items\n'
+        for size_mb in args.sizes:
+            for rate in (0, 0.001, 0.01):
+                lines = []
+                size = 0
+                while size < size_mb * MB:
+                    line = traceback() if rate and rng.random() < rate else plain
+                    lines.append(line)
+                    size += len(line)
+                data = b''.join(lines)
+                del lines
+                best = min(timed(filter_stream, TracebackRewriter([symbols]), io.BytesIO(data), io.BytesIO())[0]
+                           for _ in range(args.repeats))
+                rows.append(('filter', f'{size_mb} MB, {rate:.1%} tracebacks', f'{len(data) / best / MB:.0f} MB/s',
+                             f'{best * 1000:.0f} ms'))
+        symbols.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('operation', 'input', 'throughput', 'time'), rows)
+
+def find_interpreters():
+    import subprocess
+
+    found = {}
+    for minor in range(8, 15):
+        path = shutil.which(f'python3.{minor}')
+        if not path:
+            continue
+        proc = subprocess.run([path, '-c', 'import importlib.util; print(importlib.util.MAGIC_NUMBER.hex())'],
+                              capture_output=True, text=True)
+        if proc.returncode == 0:
+            found.setdefault(proc.stdout.strip(), path)
+    return list(found.values())
+
+def bench_interpreters(args):
+    from encoder import encode_compiled
+
+    interpreters = find_interpreters()
+    if not interpreters:
+        print("❌ No python3.X interpreters found on PATH", file=sys.stderr)
+        return 1
+    rows = []
+    workdir = tempfile.mkdtemp(prefix='se_bench_')
+    try:
+        for size_mb in args.sizes:
+            input_path = os.path.join(workdir, f'src_{size_mb}.py')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                index = 0
+                while f.tell() < size_mb * MB:
+                    f.write(f'def func_{index}(value, **kwargs):\n')
+                    f.write(f'    return value in {{"x{index}", "y{index}"}} or kwargs.get("k{index}", {index})\n\n')
+                    index += 1
+            content = read_source(input_path)
+            local = min(timed(encode_compiled, content, make_options())[0] for _ in range(args.repeats))
+            # Отдельный прогон на каждую версию, как без этого режима
+            separate = local + sum(
+                min(timed(encode_compiled, content, make_options(interpreters=path))[0] for _ in range(args.repeats))
+                - local for path in interpreters)
+            elapsed, (payloads, _) = timed(encode_compiled, content,
+                                           make_options(interpreters=os.pathsep.join(interpreters)))
+            combined = min([elapsed] + [timed(encode_compiled, content,
+                                              make_options(interpreters=os.pathsep.join(interpreters)))[0]
+                                        for _ in range(args.repeats - 1)])
+            rows.append((f'{size_mb} MB', f'{len(payloads)}', f'{local:.2f}s', f'{separate:.2f}s', f'{combined:.2f}s'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(('input', 'payloads', 'one compile', 'one run per version', 'parallel'), rows)
+
+def bench_stages(args):
+    import marshal
+    from stages import STAGES, measure_stage
+
+    rows = []
+    for size_mb in args.sizes:
+        # Типичная нагрузка: marshal сгенерированного модуля
+        lines = []
+        index = 0
+        while sum(map(len, lines)) < size_mb * MB // 2:
+            lines.append(f'def func_{index}(value, **kwargs):\n'
+                         f'    return value in {{"x{index}", "y{index}"}} or kwargs.get("k{index}", {index})\n\n')
+            index += 1
+        sample = marshal.dumps(compile(''.join(lines), '<bench>', 'exec'))[:size_mb * MB]
+        context = {'zdict': sample[:32 * 1024]}
+        for stage in STAGES:
+            if stage.encode is None:
+                continue
+            options = make_options(**{stage.option: True})
+            cost = measure_stage(stage, sample, options, context, args.repeats)
+            declared = '-' if stage.throughput is None else f'{stage.throughput} MB/s'
+            rows.append((f'{size_mb} MB', stage.name, f"{cost['encode_throughput']:.0f} MB/s",
+                         f"{cost['throughput']:.0f} MB/s", declared, f"{cost['ratio']:.2f}",
+                         '-' if stage.ratio is None else f'{stage.ratio:.2f}'))
+    print_table(('payload', 'stage', 'encode', 'decode', 'declared', 'ratio', 'declared'), rows)
+
+def bench_queue(args):
+    import threading
+    from collections import deque
+    from PySide6.QtWidgets import QApplication, QTextEdit
+    from jobtable import JobTableModel, JobTableView, REFRESH_INTERVAL
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    count = args.files
+    jobs = [(f'/src/pkg{i // 100}/module_{i}.py', f'/out/module_{i}_encoded.py') for i in range(count)]
+    results = [{'input': input_path, 'output': output_path, 'ok': True, 'source_size': 4000 + i,
+                'output_size': 3000 + i, 'encode_time': 0.002} for i, (input_path, output_path) in enumerate(jobs)]
+
+    model = JobTableModel(lambda key: key)
+    view = JobTableView()
+    view.setModel(model)
+    view.resize(900, 600)
+    view.show()
+    app.processEvents()
+    add_time, _ = timed(model.add_jobs, jobs)
+    model.mark_running(jobs)
+    app.processEvents()
+
+    # Рабочие процессы присылают результаты быстрее, чем таймер обновляет таблицу
+    pending = deque()
+
+    def feed():
+        for i in range(0, count, 50):
+            pending.extend(results[i:i + 50])
+            time.sleep(0.001)
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    flushes = []
+    start = time.perf_counter()
+    while feeder.is_alive() or pending:
+        time.sleep(REFRESH_INTERVAL / 1000)
+        batch = [pending.popleft() for _ in range(len(pending))]
+        elapsed, _ = timed(lambda: (model.apply_results(batch), app.processEvents()))
+        flushes.append(elapsed)
+    total = time.perf_counter() - start
+    flushes.sort()
+    view.close()
+
+    text = QTextEdit()
+    text.show()
+    sample = min(count, 2000)
+    text_time, _ = timed(lambda: [text.append(f"✅ {r['input']} -> {r['output']} ({r['source_size']:,} bytes)")
+                                  or app.processEvents() for r in results[:sample]])
+    text.close()
+
+    print_table(('view', 'rows', 'insert', 'median flush', 'worst flush', 'total'), [
+        ('table', f'{count:,}', f'{add_time * 1000:.0f} ms', f'{flushes[len(flushes) // 2] * 1000:.1f} ms',
+         f'{flushes[-1] * 1000:.1f} ms', f'{total:.2f} s'),
+        ('text append', f'{sample:,}', '', '', '', f'{text_time:.2f} s'),
+    ])
+
+BENCHMARKS = {
+    'transport': bench_transport,
+    'io': bench_io,
+    'determinism': bench_determinism,
+    'startup': bench_startup,
+    'runtime': bench_runtime,
+    'zdict': bench_zdict,
+    'prefetch': bench_prefetch,
+    'cipher': bench_cipher,
+    'queue': bench_queue,
+    'dedup': bench_dedup,
+    'profile': bench_profile,
+    'interpreters': bench_interpreters,
+    'stages': bench_stages,
+    'tracemap': bench_tracemap,
+    'memory': bench_memory,
+    'segments': bench_segments,
+    'junk': bench_junk,
+    'lazy': bench_lazy,
+    'memo': bench_memo,
+    'assets': bench_assets,
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Simple Encoder benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100], help='Input sizes in MB')
+    parser.add_argument('--files', type=int, default=2, help='Files per size')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=10)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return BENCHMARKS[args.benchmark](args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
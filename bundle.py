@@ -0,0 +1,68 @@
+import os
+
+from encoder import (ASSET_BUNDLE, BUNDLE_MAGIC, BUNDLE_HEADER, BUNDLE_RECORD, CIPHER_KEY_SIZE, EncodeError,
+                     apply_codecs, cipher_material, decode_chain, atomic_open)
+
+# Служебные файлы кодировщика и исходники в пакет ассетов не попадают
+SKIP_SUFFIXES = ('.py', '.pyc', '.pyo', '.sebundle', '.semap')
+SKIP_PREFIXES = ('.se_journal', '_se_runtime')
+
+def asset_options(options):
+    # Ассеты - байты, а не код: без marshal, сегментов и общего словаря
+    return {**options, 'use_marshal': False, 'use_zdict': False, 'zlib_segments': 0}
+
+def collect_assets(inputs, output_dir=None):
+    skip_dir = os.path.abspath(output_dir) if output_dir else None
+    assets = {}
+    for path in inputs:
+        if not os.path.isdir(path):
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__' and not d.startswith('.')
+                             and os.path.abspath(os.path.join(root, d)) != skip_dir)
+            for name in sorted(files):
+                if name.endswith(SKIP_SUFFIXES) or name.startswith(SKIP_PREFIXES):
+                    continue
+                full_path = os.path.join(root, name)
+                asset = os.path.relpath(full_path, path).replace(os.sep, '/')
+                if asset in assets:
+                    raise EncodeError("Bundle Error", f"Duplicate asset {asset}: {assets[asset]} and {full_path}")
+                assets[asset] = full_path
+    return sorted(assets.items())
+
+def write_bundle(path, assets, options):
+    options = asset_options(options)
+    chain = decode_chain(options).encode('ascii')
+    names = [name.encode('utf-8') for name, _ in assets]
+    index_offset = BUNDLE_HEADER.size + len(chain)
+    offset = index_offset + sum(BUNDLE_RECORD.size + len(name) for name in names)
+    records = []
+    source_size = 0
+    # Ключевая часть (или соль пароля) общая на пакет, nonce у каждого ассета свой:
+    # с паролем PBKDF2 при чтении выполняется один раз, а не на каждый файл
+    shared = cipher_material(options, b'\0'.join(names)) if options['use_cipher'] else None
+    with atomic_open(path) as f:
+        # Записи известны только после кодирования: оглавление дописывается в конце на своё место
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, len(assets), len(chain)) + chain)
+        f.seek(offset)
+        for name, (_, asset_path) in zip(names, assets):
+            with open(asset_path, 'rb') as asset:
+                data = asset.read()
+            source_size += len(data)
+            material = None
+            if shared is not None:
+                material = shared[:CIPHER_KEY_SIZE] + cipher_material(options, data)[CIPHER_KEY_SIZE:]
+            encoded = apply_codecs(data, options, material=material)
+            f.write(encoded)
+            records.append(BUNDLE_RECORD.pack(offset, len(encoded), len(name)) + name)
+            offset += len(encoded)
+        f.seek(index_offset)
+        f.write(b''.join(records))
+    return {'path': path, 'count': len(assets), 'source_size': source_size, 'output_size': offset}
+
+def write_assets(inputs, output_root, options, name=ASSET_BUNDLE, output_dir=None):
+    assets = collect_assets(inputs, output_dir)
+    if not assets:
+        return None
+    os.makedirs(output_root, exist_ok=True)
+    return write_bundle(os.path.join(output_root, name), assets, options)
@@ -0,0 +1,280 @@
+import os
+import re
+import sys
+import time
+import shutil
+import difflib
+import argparse
+import tempfile
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from encoder import EncodeError
+from batch import add_option_arguments, options_from_args, encode_batch
+
+MODES = ('scripts', 'pytest')
+PERCENTILES = (50, 90, 99)
+DIFF_LINES = 20
+
+TEST_FILE_RE = re.compile(r'^(test_.*|.*_test)\.py$')
+# Не тестируемый код, а обвязка pytest: остаётся исходником, иначе pytest не перепишет assert
+TEST_SUPPORT = ('conftest.py',)
+DURATION_RE = re.compile(rb'\bin \d+(\.\d+)?s\b')
+TRACEBACK = b'Traceback (most recent call last):'
+
+# Старт - импорт скрипта без ветки __main__: заглушка, цепочка декодирования и код модуля
+STARTUP_SCRIPT = '''
+import sys
+sys.argv = sys.argv[1:]
+with open(sys.argv[0], 'rb') as f:
+    code = compile(f.read(), sys.argv[0], 'exec')
+exec(code, {'__name__': '__difftest__', '__file__': sys.argv[0], '__builtins__': __builtins__})
+'''
+
+def is_test_file(name):
+    return bool(TEST_FILE_RE.match(name)) or name in TEST_SUPPORT
+
+def walk_sources(root):
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__' and not d.startswith('.'))
+        for name in sorted(files):
+            if name.endswith('.py'):
+                yield os.path.relpath(os.path.join(dirpath, name), root), dirpath, files
+
+def collect_units(root, mode):
+    units = []
+    for rel, dirpath, files in walk_sources(root):
+        name = os.path.basename(rel)
+        if mode == 'pytest':
+            if TEST_FILE_RE.match(name):
+                units.append(rel)
+        # Модули пакетов и обвязка тестов сами по себе не запускаются
+        elif '__init__.py' not in files and not name.startswith('_') and name not in TEST_SUPPORT:
+            units.append(rel)
+    return units
+
+def prepare_trees(root, work_dir, options, mode, workers=None):
+    # Обе версии запускаются из копий с одинаковой структурой: пути в выводе сравнимы
+    # после замены корня, а скрипты не мусорят в исходном каталоге
+    original = os.path.join(work_dir, 'original')
+    encoded = os.path.join(work_dir, 'encoded')
+    ignore = shutil.ignore_patterns('__pycache__', '.*')
+    shutil.copytree(root, original, ignore=ignore)
+    shutil.copytree(root, encoded, ignore=ignore)
+    jobs = [(os.path.join(original, rel), os.path.join(encoded, rel)) for rel, _, _ in walk_sources(original)
+            if not (mode == 'pytest' and is_test_file(os.path.basename(rel)))]
+    if not jobs:
+        raise EncodeError("Test Error", f"No code under test in {root}")
+    results = encode_batch(jobs, options, workers=workers)
+    failed = [stats for stats in results if not stats['ok']]
+    if failed:
+        raise EncodeError("Encode Error", '\n'.join(f"{stats['input']}: {stats['error']}" for stats in failed))
+    # Общий рантайм лежит в общем каталоге результатов, не обязательно в корне дерева
+    runtime_dir = os.path.relpath(os.path.commonpath([os.path.dirname(output) for _, output in jobs]), encoded)
+    return original, encoded, runtime_dir
+
+def tree_env(tree, runtime_dir):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    paths = [tree, os.path.normpath(os.path.join(tree, runtime_dir))]
+    if env.get('PYTHONPATH'):
+        paths.append(env['PYTHONPATH'])
+    env['PYTHONPATH'] = os.pathsep.join(dict.fromkeys(paths))
+    return env
+
+def unit_commands(python, unit, mode):
+    if mode == 'pytest':
+        # Сравниваются исходы тестов, а не трассировки: у закодированного модуля нет строк исходника
+        base = [python, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', unit]
+        return base + ['--collect-only'], base + ['--tb=no', '-rA']
+    return [python, '-c', STARTUP_SCRIPT, unit], [python, unit]
+
+def run_timed(command, cwd, env, timeout):
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(command, cwd=cwd, env=env, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        return {'returncode': None, 'stdout': e.stdout or b'', 'stderr': e.stderr or b'', 'time': timeout}
+    return {'returncode': proc.returncode, 'stdout': proc.stdout, 'stderr': proc.stderr,
+            'time': time.perf_counter() - start}
+
+def normalize(output, tree, mode):
+    for root in dict.fromkeys((tree, os.path.realpath(tree))):
+        output = output.replace(os.fsencode(root), b'<root>')
+    if mode == 'pytest':
+        output = DURATION_RE.sub(b'in <time>', output)
+    return output.replace(b'\r\n', b'\n')
+
+def normalize_stderr(output, tree, mode):
+    output = normalize(output, tree, mode)
+    if TRACEBACK in output:
+        # Кадры трассировки у закодированного кода другие: сравнивается только итоговое исключение
+        lines = [line for line in output.splitlines() if line.strip()]
+        return lines[-1] if lines else b''
+    return output
+
+def compare(original, encoded, trees, mode):
+    mismatches = []
+    if original['returncode'] != encoded['returncode']:
+        mismatches.append(('exit code', f"{original['returncode']} != {encoded['returncode']}"))
+    for stream, normalizer in (('stdout', normalize), ('stderr', normalize_stderr)):
+        expected = normalizer(original[stream], trees[0], mode)
+        actual = normalizer(encoded[stream], trees[1], mode)
+        if expected != actual:
+            diff = difflib.unified_diff(expected.decode('utf-8', 'replace').splitlines(),
+                                        actual.decode('utf-8', 'replace').splitlines(),
+                                        'original', 'encoded', lineterm='')
+            mismatches.append((stream, '\n'.join(list(diff)[:DIFF_LINES])))
+    return mismatches
+
+def run_unit(unit, trees, envs, mode, python, repeats, timeout):
+    cwd = [os.path.join(tree, os.path.dirname(unit)) for tree in trees]
+    name = os.path.basename(unit)
+    startup_command, total_command = unit_commands(python, name, mode)
+    times = {'startup': ([], []), 'total': ([], [])}
+    first = None
+    for repeat in range(repeats):
+        # Порядок версий чередуется, чтобы прогрев кэшей не доставался всегда одной из них
+        order = (0, 1) if repeat % 2 == 0 else (1, 0)
+        runs = [None, None]
+        for kind, command in (('startup', startup_command), ('total', total_command)):
+            for side in order:
+                result = run_timed(command, cwd[side], envs[side], timeout)
+                times[kind][side].append(result['time'])
+                if kind == 'total':
+                    runs[side] = result
+        if first is None:
+            first = runs
+    timings = {kind: tuple(statistics.median(values) for values in sides) for kind, sides in times.items()}
+    return {'unit': unit, 'returncode': first[0]['returncode'],
+            'mismatches': compare(first[0], first[1], trees, mode), **timings}
+
+def percentile(values, p):
+    values = sorted(values)
+    position = (len(values) - 1) * p / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+def overhead(timing):
+    original, encoded = timing
+    return encoded - original, encoded / (original or 1e-9)
+
+def summarize(results):
+    summary = {}
+    for kind in ('startup', 'total'):
+        deltas, ratios = zip(*(overhead(r[kind]) for r in results))
+        summary[kind] = {p: (percentile(deltas, p), percentile(ratios, p)) for p in PERCENTILES}
+        summary[kind]['max'] = (max(deltas), max(ratios))
+    return summary
+
+def differential_test(root, options, mode='scripts', python=None, workers=None, repeats=3, timeout=60.0,
+                      work_dir=None, on_result=None):
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    python = python or sys.executable
+    root = os.path.abspath(root)
+    units = collect_units(root, mode)
+    if not units:
+        raise EncodeError("Test Error", f"No {'test files' if mode == 'pytest' else 'scripts'} found in {root}")
+    if mode == 'pytest' and subprocess.run([python, '-c', 'import pytest'], capture_output=True).returncode:
+        raise EncodeError("Test Error", f"pytest is not installed for {python}")
+    owned = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='se_difftest_')
+    try:
+        original, encoded, runtime_dir = prepare_trees(root, work_dir, options, mode, workers)
+        trees = (original, encoded)
+        envs = tuple(tree_env(tree, runtime_dir) for tree in trees)
+        # Каждая версия - отдельный интерпретатор: потокам пула остаётся только ждать процессы
+        results = []
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(run_unit, unit, trees, envs, mode, python, repeats, timeout) for unit in units]
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+    finally:
+        if owned:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def format_timing(timing):
+    delta, ratio = overhead(timing)
+    return f"{timing[0] * 1000:>8.1f} {timing[1] * 1000:>8.1f} {delta * 1000:>+8.1f}ms x{ratio:<5.2f}"
+
+def format_report(results, summary):
+    lines = [f"{'file':<32} {'status':<8} {'start-up: original  encoded  overhead':>38}   "
+             f"{'total: original  encoded  overhead':>35}"]
+    for r in results:
+        status = 'mismatch' if r['mismatches'] else 'ok'
+        lines.append(f"{r['unit']:<32} {status:<8} {format_timing(r['startup']):>38}   {format_timing(r['total']):>35}")
+    lines.append('')
+    for kind in ('startup', 'total'):
+        cells = [f"p{p} {summary[kind][p][0] * 1000:+.1f}ms x{summary[kind][p][1]:.2f}" for p in PERCENTILES]
+        cells.append(f"max {summary[kind]['max'][0] * 1000:+.1f}ms x{summary[kind]['max'][1]:.2f}")
+        lines.append(f"{'Start-up' if kind == 'startup' else 'Total'} overhead: " + ', '.join(cells))
+    return lines
+
+def format_mismatches(result):
+    lines = [f"❌ {result['unit']}"]
+    for what, detail in result['mismatches']:
+        lines.append(f"  {what}: {detail}" if what == 'exit code' else f"  {what} differs:")
+        if what != 'exit code':
+            lines.extend('    ' + line for line in detail.splitlines())
+    return lines
+
+def check_budget(summary, limits, gate):
+    exceeded = []
+    for kind, limit in limits.items():
+        if limit is None:
+            continue
+        ratio = summary[kind][gate][1]
+        if ratio > limit:
+            exceeded.append(f"{kind} overhead p{gate} x{ratio:.2f} exceeds x{limit:.2f}")
+    return exceeded
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Run original and encoded programs side by side and compare them')
+    parser.add_argument('path', help='Directory of scripts or of a pytest suite')
+    parser.add_argument('--mode', choices=MODES, default='scripts')
+    parser.add_argument('--python', default=None, help='Interpreter for both versions (default: current)')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per version; timings are medians')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds per run')
+    parser.add_argument('--max-startup-overhead', type=float, default=None,
+                        help='Fail when encoded/original start-up time exceeds this ratio at the gate percentile')
+    parser.add_argument('--max-total-overhead', type=float, default=None,
+                        help='Fail when encoded/original run time exceeds this ratio at the gate percentile')
+    parser.add_argument('--gate-percentile', type=int, choices=PERCENTILES, default=90)
+    parser.add_argument('--keep', metavar='DIR', default=None, help='Keep both trees in DIR for inspection')
+    add_option_arguments(parser)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = options_from_args(args)
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=False)
+    try:
+        results = differential_test(args.path, options, args.mode, args.python, args.workers, args.repeats,
+                                    args.timeout, work_dir=args.keep)
+    except EncodeError as e:
+        print(f"❌ {e.title}: {e.message}", file=sys.stderr)
+        return 2
+    results.sort(key=lambda r: r['unit'])
+    summary = summarize(results)
+    print('\n'.join(format_report(results, summary)))
+    mismatched = [r for r in results if r['mismatches']]
+    for result in mismatched:
+        print('\n'.join(format_mismatches(result)), file=sys.stderr)
+    exceeded = check_budget(summary, {'startup': args.max_startup_overhead, 'total': args.max_total_overhead},
+                            args.gate_percentile)
+    for message in exceeded:
+        print(f"❌ {message}", file=sys.stderr)
+    print(f"Matched {len(results) - len(mismatched)}/{len(results)} "
+          f"{'test files' if args.mode == 'pytest' else 'scripts'}")
+    return 1 if mismatched or exceeded else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1456 @@
+import os
+import mmap
+import marshal
+import base64
+import zlib
+import binascii
+import random
+import string
+import hashlib
+import textwrap
+import re
+import ast
+import dis
+import time
+import io
+import types
+import json
+import struct
+import shutil
+import inspect
+import subprocess
+import importlib.util
+from functools import lru_cache
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+
+from stages import (STAGES, CIPHER_KEY_SIZE, CIPHER_NONCE_SIZE, CIPHER_SALT_SIZE, CIPHER_CHUNK, CIPHER_KEY_ENV,
+                    CIPHER_SOURCE, B85_ALPHABET, B85_SOURCE, active_stages, keystream_xor, encrypt_payload, zdict_id)
+
+DEFAULT_OPTIONS = {
+    'use_marshal': True,
+    'use_base64': True,
+    'use_zlib': True,
+    'use_binascii': False,
+    'use_compile': False,
+    'use_encryption': False,
+    'use_junk': False,
+    'use_rename': False,
+    'use_compress': False,
+    'layers': 1,
+    'junk_size': 100,
+    'junk_bytes': 0,
+    'optimize_level': 0,
+    'strip_docstrings': False,
+    'strip_debug': False,
+    'strip_lines': False,
+    'prune_constants': False,
+    'lazy_constants': False,
+    'lazy_threshold': 4096,
+    'deterministic': False,
+    'seed_key': '',
+    'shared_runtime': False,
+    'use_zdict': False,
+    'zlib_segments': 0,
+    'prefetch': False,
+    'use_cipher': False,
+    'cipher_key': '',
+    'cipher_salt': '',
+    'verify': True,
+    'profile_hooks': False,
+    'interpreters': '',
+    'traceback_map': False,
+}
+
+# Опции сторонних ступеней из реестра, по умолчанию выключены
+for _stage in STAGES:
+    DEFAULT_OPTIONS.setdefault(_stage.option, _stage.default)
+    for _key in _stage.extra_options:
+        DEFAULT_OPTIONS.setdefault(_key, False)
+
+AST_TRANSFORM_KEYS = ('strip_docstrings', 'strip_debug', 'strip_lines', 'use_rename', 'lazy_constants')
+
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# Байты, которые repr() оставляет как есть внутри b'...'
+REPR_SAFE_BYTES = bytes(c for c in range(32, 127) if c not in b"'\\")
+
+OUTPUT_FOOTER = ('\n\n'
+                 'result = decode(encoded)\n'
+                 'if result is not None:\n'
+                 '    exec(result)')
+
+PROFILE_FOOTER = ('\n\n'
+                  'result = decode(encoded)\n'
+                  'if result is not None:\n'
+                  '    _profile_exec(result, globals(), _profile_records)')
+
+ZDICT_SIZE = 32 * 1024
+ZDICT_SAMPLE_SIZE = 64 * 1024
+
+PREFETCH_IMPORTS = 16
+
+# Компиляция под другой интерпретатор: те же compile_source и BytecodeShrinker,
+# исходник приходит через stdin, в stdout - MAGIC_NUMBER и marshal этой версии
+COMPILE_WORKER = '''
+options = json.loads(sys.argv[1])
+content = sys.stdin.buffer.read().decode('utf-8')
+code = compile_source(content, options)[0]
+sys.stdout.buffer.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+'''
+
+# Выбор нагрузки под текущий интерпретатор; нагрузки других версий не декодируются вовсе
+SELECT_SOURCE = '''
+def _select_payload(payloads):
+    payload = payloads.get(importlib.util.MAGIC_NUMBER)
+    if payload is None:
+        raise ValueError(f"no payload for Python {sys.version.split()[0]}")
+    return payload
+'''
+
+PROFILE_ENV = 'SE_PROFILE'
+
+# Замеры шагов декодирования и exec. Переменная окружения читается один раз при импорте:
+# без неё остаётся одна проверка глобального имени на модуль.
+# SE_PROFILE=1 - строка в stderr, иначе путь к файлу, куда дописывается JSON на модуль.
+PROFILE_SOURCE = f'''
+_PROFILE = os.environ.get({PROFILE_ENV!r})
+
+def _profile_steps(encoded, steps):
+    records = []
+    for name, step in steps:
+        size = len(encoded)
+        start = time.perf_counter_ns()
+        encoded = step(encoded)
+        records.append((name, time.perf_counter_ns() - start, size,
+                        len(encoded) if isinstance(encoded, (bytes, bytearray)) else None))
+    return encoded, records
+
+def _profile_exec(code, namespace, records):
+    target = _PROFILE
+    if not target:
+        exec(code, namespace)
+        return
+    # Программа выполняется в тех же глобальных именах и может перекрыть time, os и sys
+    from time import perf_counter_ns
+    start = perf_counter_ns()
+    try:
+        exec(code, namespace)
+    finally:
+        _profile_report(target, namespace, records, perf_counter_ns() - start)
+
+def _profile_report(target, namespace, records, exec_ns):
+    import os, sys, json
+    module = namespace.get('__name__')
+    if target in ('1', 'stderr'):
+        steps = ', '.join(f'{{name}} {{ns / 1e6:.2f}} ms ({{size:,}} B -> {{"code" if out is None else f"{{out:,}} B"}})'
+                          for name, ns, size, out in records)
+        sys.stderr.write(f'[se-profile] {{module}}: {{steps}}, exec {{exec_ns / 1e6:.2f}} ms\\n')
+        return
+    record = {{'module': module, 'file': namespace.get('__file__'), 'pid': os.getpid(),
+              'steps': [{{'step': name, 'ns': ns, 'in': size, 'out': out}} for name, ns, size, out in records],
+              'decode_ns': sum(step[1] for step in records), 'exec_ns': exec_ns}}
+    try:
+        with open(target, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\\n')
+    except OSError:
+        pass
+'''
+
+RUNTIME_MODULE = '_se_runtime'
+RUNTIME_VERSION = 2
+
+# Общий модуль декодирования: компилируется один раз на всё приложение.
+# Функции версионированы, чтобы старые файлы продолжали работать с новым рантаймом.
+RUNTIME_IMPORTS = ('os', 'sys', 're', 'time', 'base64', 'threading', 'importlib.util')
+
+RUNTIME_HEADER = f'''from queue import Queue
+
+RUNTIME_VERSION = {RUNTIME_VERSION}
+
+ZDICTS = {{}}
+
+PREFETCH_LIMIT = 32
+'''
+
+RUNTIME_SOURCE = '''
+def decode_v1(encoded, chain, records=None):
+    try:
+        if isinstance(encoded, dict):
+            encoded = _select_payload(encoded)
+        steps = chain.split('+') if chain else ()
+        if records is not None:
+            encoded, records[:] = _profile_steps(encoded, [(step, _STEPS_V1[step]) for step in steps])
+            return encoded
+        for step in steps:
+            encoded = _STEPS_V1[step](encoded)
+        return encoded
+    except Exception as e:
+        print("Decoding error:", str(e))
+        return None
+
+def run_v1(encoded, chain, namespace):
+    records = [] if _PROFILE else None
+    result = decode_v1(encoded, chain, records)
+    if result is not None:
+        _profile_exec(result, namespace, records)
+
+_STUB_RE = re.compile(rb"\\nencoded = b'([^'\\\\]*)'\\n\\nrun_v%d\\(encoded, '([a-z0-9+]*)'" % RUNTIME_VERSION)
+_slots = {}
+_slots_lock = threading.Lock()
+_queue = None
+
+class _Slot:
+    __slots__ = ('ready', 'result', 'claimed')
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.result = None
+        self.claimed = False
+
+def _claim(slot):
+    with _slots_lock:
+        if slot.claimed:
+            return False
+        slot.claimed = True
+        return True
+
+def _predecode(name):
+    parent = name.rpartition('.')[0]
+    # find_spec импортирует родительский пакет, этого в фоновом потоке делать нельзя
+    if parent and parent not in sys.modules:
+        return None
+    spec = importlib.util.find_spec(name)
+    if spec is None or not spec.origin or not spec.origin.endswith('.py'):
+        return None
+    with open(spec.origin, 'rb') as f:
+        match = _STUB_RE.search(f.read())
+    if match is None:
+        return None
+    return decode_v1(match.group(1), match.group(2).decode('ascii'))
+
+def _prefetch_worker():
+    while True:
+        name, slot = _queue.get()
+        if not _claim(slot):
+            continue
+        try:
+            slot.result = _predecode(name)
+        except Exception:
+            slot.result = None
+        finally:
+            if slot.result is None:
+                # Модуль не закодирован: место освобождается сразу, run_v2 его не заберёт
+                with _slots_lock:
+                    if _slots.get(name) is slot:
+                        del _slots[name]
+            slot.ready.set()
+
+def _evict():
+    # Вызывается под _slots_lock при заполненной очереди: модули, импортированные в обход run_v2,
+    # и самые старые готовые результаты, которые так и не понадобились
+    for name in [name for name in _slots if name in sys.modules]:
+        del _slots[name]
+    for name in [name for name, slot in _slots.items() if slot.ready.is_set()]:
+        if len(_slots) < PREFETCH_LIMIT:
+            break
+        del _slots[name]
+
+def _schedule(names, package):
+    global _queue
+    for name in names:
+        try:
+            name = importlib.util.resolve_name(name, package)
+        except (ImportError, ValueError):
+            continue
+        # from x import Name: у обычного модуля x это атрибут, а не подмодуль
+        parent = sys.modules.get(name.rpartition('.')[0])
+        if parent is not None and not hasattr(parent, '__path__'):
+            continue
+        with _slots_lock:
+            if len(_slots) >= PREFETCH_LIMIT:
+                _evict()
+            if name in sys.modules or name in _slots or len(_slots) >= PREFETCH_LIMIT:
+                continue
+            if _queue is None:
+                _queue = Queue()
+                threading.Thread(target=_prefetch_worker, name='se-prefetch', daemon=True).start()
+            slot = _slots[name] = _Slot()
+        _queue.put((name, slot))
+
+def _take(name):
+    with _slots_lock:
+        slot = _slots.pop(name, None)
+    # Поток ещё не дошёл до модуля: декодируем сами, а не ждём очередь
+    if slot is None or _claim(slot):
+        return None
+    slot.ready.wait()
+    return slot.result
+
+def run_v2(encoded, chain, namespace, imports=()):
+    records = [] if _PROFILE else None
+    result = _take(namespace.get('__name__'))
+    if imports and not os.environ.get('SE_NO_PREFETCH'):
+        _schedule(imports, namespace.get('__package__'))
+    if result is None:
+        result = decode_v1(encoded, chain, records)
+    elif records is not None:
+        # Распаковано фоновым потоком, время шагов на старт модуля не легло
+        records.append(('prefetched', 0, len(encoded), None))
+    if result is not None:
+        _profile_exec(result, namespace, records)
+'''
+
+# Пакет ассетов: заголовок (сигнатура, число записей, длина цепочки), цепочка декодирования,
+# записи (смещение, размер, длина имени) с именами и данные, закодированные той же цепочкой
+ASSET_BUNDLE = 'assets.sebundle'
+BUNDLE_MAGIC = b'SEBNDL1\n'
+BUNDLE_HEADER = struct.Struct('>8sII')
+BUNDLE_RECORD = struct.Struct('>QQH')
+
+ASSETS_SOURCE = f'''
+ASSET_BUNDLE = {ASSET_BUNDLE!r}
+_bundles = {{}}
+_bundles_lock = threading.Lock()
+
+class AssetBundle:
+    # Файл отображается в память один раз, ассет декодируется при каждом чтении
+    def __init__(self, path):
+        import mmap, struct
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, chain_size = struct.unpack_from({BUNDLE_HEADER.format!r}, self._data)
+        if magic != {BUNDLE_MAGIC!r}:
+            self._data.close()
+            raise ValueError('%s: not an asset bundle' % path)
+        offset = {BUNDLE_HEADER.size}
+        chain = self._data[offset:offset + chain_size].decode('ascii')
+        offset += chain_size
+        self._steps = [_STEPS_V1[step] for step in chain.split('+') if step]
+        self.index = {{}}
+        self.dirs = {{''}}
+        for _ in range(count):
+            start, size, name_size = struct.unpack_from({BUNDLE_RECORD.format!r}, self._data, offset)
+            offset += {BUNDLE_RECORD.size}
+            name = self._data[offset:offset + name_size].decode('utf-8')
+            offset += name_size
+            self.index[name] = (start, size)
+            parts = name.split('/')
+            self.dirs.update('/'.join(parts[:i]) for i in range(1, len(parts)))
+
+    def read_bytes(self, name):
+        try:
+            start, size = self.index[name.strip('/')]
+        except KeyError:
+            raise FileNotFoundError(name) from None
+        data = self._data[start:start + size]
+        for step in self._steps:
+            data = step(data)
+        return bytes(data)
+
+class AssetPath:
+    # Traversable из importlib.resources поверх пакета ассетов
+    def __init__(self, bundle, path=''):
+        self.bundle = bundle
+        self.path = path
+
+    @property
+    def name(self):
+        return self.path.rpartition('/')[2]
+
+    def joinpath(self, *parts):
+        path = self.path
+        for part in parts:
+            for piece in str(part).replace('\\\\', '/').split('/'):
+                if piece == '..':
+                    path = path.rpartition('/')[0]
+                elif piece and piece != '.':
+                    path = path + '/' + piece if path else piece
+        return AssetPath(self.bundle, path)
+
+    __truediv__ = joinpath
+
+    def is_file(self):
+        return self.path in self.bundle.index
+
+    def is_dir(self):
+        return self.path in self.bundle.dirs
+
+    def iterdir(self):
+        if not self.is_dir():
+            raise NotADirectoryError(self.path)
+        prefix = self.path + '/' if self.path else ''
+        names = {{name[len(prefix):].partition('/')[0] for name in self.bundle.index if name.startswith(prefix)}}
+        return iter([self.joinpath(name) for name in sorted(names)])
+
+    def read_bytes(self):
+        return self.bundle.read_bytes(self.path)
+
+    def read_text(self, encoding=None, errors='strict'):
+        return self.read_bytes().decode(encoding or 'utf-8', errors)
+
+    def open(self, mode='r', *args, **kwargs):
+        import io
+        stream = io.BytesIO(self.read_bytes())
+        if 'b' in mode:
+            return stream
+        kwargs.setdefault('encoding', 'utf-8')
+        return io.TextIOWrapper(stream, *args, **kwargs)
+
+    def __repr__(self):
+        return 'AssetPath(%r, %r)' % (self.bundle.path, self.path)
+
+def open_bundle(path=None):
+    path = os.path.abspath(path or os.path.join(os.path.dirname(os.path.abspath(__file__)), ASSET_BUNDLE))
+    with _bundles_lock:
+        bundle = _bundles.get(path)
+        if bundle is None:
+            bundle = _bundles[path] = AssetBundle(path)
+    return bundle
+
+def files(path=None):
+    return AssetPath(open_bundle(path))
+
+def read_binary(name, path=None):
+    return open_bundle(path).read_bytes(name)
+
+def read_text(name, encoding='utf-8', errors='strict', path=None):
+    return read_binary(name, path).decode(encoding, errors)
+
+def open_binary(name, path=None):
+    return files(path).joinpath(name).open('rb')
+
+def open_text(name, encoding='utf-8', errors='strict', path=None):
+    return files(path).joinpath(name).open('r', encoding=encoding, errors=errors)
+
+def is_resource(name, path=None):
+    return files(path).joinpath(name).is_file()
+
+def contents(path=None):
+    return [entry.name for entry in files(path).iterdir()]
+'''
+
+class EncodeError(Exception):
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+
+    # Ошибка возвращается из рабочих процессов пакетного режима через pickle
+    def __reduce__(self):
+        return (type(self), (self.title, self.message))
+
+def make_options(**overrides):
+    options = dict(DEFAULT_OPTIONS)
+    options.update(overrides)
+    return options
+
+def content_digest(content):
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    return hashlib.sha256(data).digest()
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        # hashlib.file_digest появился в 3.11
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+def make_rng(options, content):
+    if not options['deterministic']:
+        return random.Random()
+    seed = hashlib.sha256(options['seed_key'].encode('utf-8') + b'\0' + content_digest(content)).digest()
+    return random.Random(int.from_bytes(seed, 'big'))
+
+def generate_junk_code(size, rng=random):
+    junk = []
+    variables = [f"var_{i}" for i in range(rng.randint(5, 10))]
+    functions = [f"func_{i}" for i in range(rng.randint(3, 7))]
+
+    for _ in range(size):
+        choice = rng.randint(1, 4)
+        if choice == 1:
+            var = rng.choice(variables)
+            value = rng.choice([
+                str(rng.randint(-1000, 1000)),
+                f'"{generate_random_string(10, rng)}"',
+                f"[{', '.join([str(rng.randint(0, 100)) for _ in range(3)])}]",
+                f"{{{', '.join([f'{rng.randint(0, 100)}: {rng.randint(0, 100)}' for _ in range(2)])}}}"
+            ])
+            junk.append(f"{var} = {value}")
+        elif choice == 2:
+            var = rng.choice(variables)
+            junk.append(f"if {var}:")
+            junk.append(f"    pass")
+        elif choice == 3:
+            func = rng.choice(functions)
+            args = ', '.join(rng.sample(variables, rng.randint(0, 3)))
+            junk.append(f"def {func}({args}):")
+            junk.append(f"    return None")
+        elif choice == 4:
+            var = rng.choice(variables)
+            junk.append(f"for _ in range({rng.randint(1, 5)}):")
+            junk.append(f"    {var} = {rng.randint(0, 100)}")
+
+    return '\n'.join(junk)
+
+def junk_block(size, rng=random):
+    body = generate_junk_code(size, rng)
+    if not body:
+        return ''
+    name = '_' + generate_random_string(12, rng)
+    return f"\n\ndef {name}():\n" + textwrap.indent(body, '    ')
+
+# Шаблоны мусорных инструкций. v и w - локальные имена вида _abcde: с "_" и буквами
+# они не совпадают ни со встроенными именами из шаблонов, ни с ключевыми словами
+JUNK_TEMPLATES = (
+    '{v} = {n}',
+    '{v} = "{s}"',
+    '{v} = [{n}, {m}, {n}]',
+    '{v} = {{{n}: {m}, "{s}": {w}}}',
+    '{v} = {w} if {w} else {n}',
+    '{v} = "{s}".join(str({w}) for {w} in range({n}))',
+    '{v} = lambda {w}: {w} * {n} + {m}',
+    'if {v} > {n}:\n    {w} = "{s}"',
+    'for {v} in range({n}):\n    {w} += {v} * {m}',
+    'while {v} < {n}:\n    {v} += {m}',
+    'try:\n    {v} = {w} // {n}\nexcept Exception:\n    {v} = None',
+    'def {v}({w}):\n    return {w} + {n}',
+    'class {c}:\n    {v} = "{s}"',
+)
+JUNK_POOL_SIZE = 4096
+JUNK_NAMES = 64
+
+def _junk_pool(rng):
+    # Пул готовых инструкций собирается один раз; дальше мегабайты мусора - это выборка
+    # rng.choices из пула и один join, без вызовов random на каждую строку
+    letters = string.ascii_lowercase
+    names = ['_' + ''.join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(JUNK_NAMES)]
+    classes = [name[0] + name[1:].capitalize() for name in names]
+    words = [''.join(rng.choices(string.ascii_letters, k=rng.randint(6, 16))) for _ in range(JUNK_NAMES)]
+    numbers = [str(number) for number in rng.choices(range(1000), k=JUNK_NAMES)]
+    pool = []
+    for template in rng.choices(JUNK_TEMPLATES, k=JUNK_POOL_SIZE):
+        v, w = rng.sample(names, 2)
+        statement = template.format(v=v, w=w, c=rng.choice(classes), s=rng.choice(words),
+                                    n=rng.choice(numbers), m=rng.choice(numbers))
+        pool.append('    ' + statement.replace('\n', '\n    ') + '\n')
+    return pool
+
+def generate_junk_bytes(size, rng=random):
+    # Тело функции ровно из size байт: инструкции из пула, остаток добивается комментарием
+    pool = _junk_pool(rng)
+    average = sum(map(len, pool)) / len(pool)
+    parts = []
+    total = 0
+    while total < size:
+        batch = rng.choices(pool, k=int((size - total) / average) + 1)
+        parts.extend(batch)
+        total += sum(map(len, batch))
+    while parts and total > size:
+        total -= len(parts.pop())
+    if not parts:
+        parts.append('    pass\n')
+        total = len(parts[0])
+    padding = size - total
+    if padding >= 8:
+        parts.append('    # ' + ''.join(rng.choices(string.ascii_letters, k=padding - 7)) + '\n')
+    elif padding:
+        parts.append(' ' * (padding - 1) + '\n')
+    return ''.join(parts)
+
+def junk_bytes_block(size, rng=random):
+    header = f"\n\ndef _{generate_random_string(12, rng)}():\n"
+    # Меньше одной инструкции с заголовком не бывает
+    if size < len(header) + len('    pass\n'):
+        return ''
+    return header + generate_junk_bytes(size - len(header), rng)
+
+def stub_junk(options, rng=None):
+    if not options['use_junk']:
+        return ''
+    if options['junk_bytes']:
+        return junk_bytes_block(options['junk_bytes'], rng or random.Random())
+    if options['junk_size']:
+        return junk_block(options['junk_size'], rng or random.Random())
+    return ''
+
+def generate_random_string(length, rng=random):
+    return ''.join(rng.choice(string.ascii_letters) for _ in range(length))
+
+def encrypt_strings(content):
+    def encode_string(match):
+        s = match.group(1)
+        encoded = ''.join(chr(ord(c) ^ 42) for c in s)
+        escaped = ''.join(f'\\x{ord(c):02x}' for c in encoded)
+        return f"'{escaped}'"
+
+    return re.sub(r"'([^']*)'", encode_string, content)
+
+class LocalRenamer:
+    # Переименовываются только локальные имена функций: снаружи функции их не видно.
+    # Имена, которые видят вложенные области, и функции с locals()/eval() не трогаются.
+    SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+              ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+    DYNAMIC = frozenset(('locals', 'vars', 'eval', 'exec', 'dir'))
+
+    def __init__(self, tree):
+        self.taken = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                self.taken.add(node.id)
+            elif isinstance(node, ast.arg):
+                self.taken.add(node.arg)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.taken.add(node.name)
+            elif isinstance(node, ast.alias):
+                self.taken.add((node.asname or node.name).split('.')[0])
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                self.taken.update(node.names)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                self.taken.add(node.name)
+        self.counter = 0
+        # Номер нового имени _vN -> исходное имя, для карты трассировок
+        self.names = {}
+
+    def _new_name(self, original):
+        while True:
+            index = self.counter
+            self.counter += 1
+            name = f'_v{index}'
+            if name not in self.taken:
+                self.taken.add(name)
+                self.names[index] = original
+                return name
+
+    def _own_nodes(self, function):
+        stack = list(function.body)
+        while stack:
+            node = stack.pop()
+            yield node
+            if not isinstance(node, self.SCOPES):
+                stack.extend(ast.iter_child_nodes(node))
+
+    def _rename_function(self, function):
+        if getattr(function, 'type_params', None):
+            return
+        if any(isinstance(node, ast.Name) and node.id in self.DYNAMIC for node in ast.walk(function)):
+            return
+        nodes = list(self._own_nodes(function))
+        stored = set()
+        args = function.args
+        excluded = {arg.arg for arg in (*args.posonlyargs, *args.args, *args.kwonlyargs, args.vararg, args.kwarg)
+                    if arg is not None}
+        for node in nodes:
+            # match (3.10+) связывает имена в шаблонах, их не переименовываем
+            if isinstance(node, getattr(ast, 'Match', ())):
+                return
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                stored.add(node.id)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                stored.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                excluded.update(node.names)
+            elif isinstance(node, ast.alias):
+                excluded.add((node.asname or node.name).split('.')[0])
+            elif isinstance(node, self.SCOPES):
+                if not isinstance(node, ast.Lambda) and hasattr(node, 'name'):
+                    excluded.add(node.name)
+                for inner in ast.walk(node):
+                    if isinstance(inner, ast.Name):
+                        excluded.add(inner.id)
+                    elif isinstance(inner, (ast.Global, ast.Nonlocal)):
+                        excluded.update(inner.names)
+        mapping = {name: self._new_name(name) for name in sorted(stored - excluded)}
+        for node in nodes:
+            if isinstance(node, ast.Name) and node.id in mapping:
+                node.id = mapping[node.id]
+            elif isinstance(node, ast.ExceptHandler) and node.name in mapping:
+                node.name = mapping[node.name]
+
+    def rename(self, tree):
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self._rename_function(node)
+        return tree
+
+class BytecodeShrinker(ast.NodeTransformer):
+    def __init__(self, options):
+        self.options = options
+        # Порядковый номер строки -> исходная строка, заполняется при strip_lines с картой трассировок
+        self.line_map = []
+
+    def _strip_docstring(self, node):
+        body = node.body
+        if (body and isinstance(body[0], ast.Expr)
+                and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str)):
+            node.body = body[1:] or [ast.Pass()]
+
+    def _visit_scope(self, node):
+        if self.options['strip_docstrings']:
+            self._strip_docstring(node)
+        self.generic_visit(node)
+        return node
+
+    visit_Module = _visit_scope
+    visit_ClassDef = _visit_scope
+    visit_FunctionDef = _visit_scope
+    visit_AsyncFunctionDef = _visit_scope
+
+    def visit_If(self, node):
+        self.generic_visit(node)
+        if self.options['strip_debug'] and isinstance(node.test, ast.Name) and node.test.id == '__debug__':
+            return node.orelse or None
+        return node
+
+    def visit_Assert(self, node):
+        return None if self.options['strip_debug'] else node
+
+    def _line_ranks(self, tree):
+        lines = set()
+        for node in ast.walk(tree):
+            if getattr(node, 'lineno', None):
+                lines.add(node.lineno)
+                lines.add(node.end_lineno or node.lineno)
+        self.line_map = sorted(lines)
+        return {line: rank for rank, line in enumerate(self.line_map, 1)}
+
+    def shrink(self, tree):
+        tree = self.visit(tree)
+        # С картой трассировок строки не схлопываются в 1, а нумеруются по порядку:
+        # таблица строк почти так же мала, а исходный номер восстанавливается по карте
+        ranks = None
+        if self.options['strip_lines'] and self.options['traceback_map']:
+            ranks = self._line_ranks(tree)
+        for node in ast.walk(tree):
+            # Тело могло опустеть после удаления assert и веток __debug__
+            if isinstance(getattr(node, 'body', None), list) and not node.body and not isinstance(node, ast.Module):
+                node.body = [ast.Pass()]
+            if isinstance(node, ast.Try) and not node.handlers and not node.finalbody:
+                node.finalbody = [ast.Pass()]
+            if self.options['strip_lines'] and 'lineno' in node._attributes:
+                if ranks is None:
+                    node.lineno = node.end_lineno = 1
+                elif getattr(node, 'lineno', None):
+                    node.lineno, node.end_lineno = ranks[node.lineno], ranks[node.end_lineno or node.lineno]
+                node.col_offset = node.end_col_offset = 0
+        return ast.fix_missing_locations(tree)
+
+class ConstantExtractor(ast.NodeTransformer):
+    # Большие литералы уходят из кода в сжатые блоки marshal: при загрузке модуля
+    # читается только кортеж bytes, а значение распаковывается при первом обращении.
+    # Глобальные таблицы модуля (NAME = литерал) ленивы целиком; внутри функций выносятся
+    # только неизменяемые литералы - изменяемый создаётся заново при каждом вызове.
+    NAME = '_se_lazy'
+    SOURCE = (
+        "class _se_lazy(dict):\n"
+        "    def __missing__(self, index):\n"
+        "        import marshal, zlib\n"
+        "        return self.setdefault(index, marshal.loads(zlib.decompress(self.blobs[index])))\n"
+        "_se_lazy = _se_lazy()\n"
+        "_se_lazy.blobs = ()\n"
+    )
+    # Доступ снаружи: module.NAME, from module import NAME и * через __all__. После первого
+    # обращения значение кладётся в globals() и дальше видно в vars(module) как обычно
+    GETATTR_SOURCE = (
+        "_se_lazy.names = {}\n"
+        "def __getattr__(name):\n"
+        "    if name in _se_lazy.names:\n"
+        "        value = globals()[name] = _se_lazy[_se_lazy.names[name]]\n"
+        "        return value\n"
+        "    raise AttributeError('module %r has no attribute %r' % (__name__, name))\n"
+        "def __dir__():\n"
+        "    return sorted(set(globals()) | set(_se_lazy.names))\n"
+    )
+    DYNAMIC = frozenset(('globals', 'locals', 'vars', 'eval', 'exec', 'dir'))
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.blobs = []
+        self.globals = {}
+        self._literals = set()
+        self._immutable = set()
+        self._function = 0
+
+    def _mark(self, node):
+        # Снизу вверх: узел - литерал, если из литералов состоят все его части
+        children = [self._mark(child) for child in ast.iter_child_nodes(node)
+                    if not isinstance(child, (ast.expr_context, ast.unaryop))]
+        if isinstance(node, ast.Constant):
+            literal = immutable = True
+        elif isinstance(node, ast.UnaryOp):
+            literal = immutable = (isinstance(node.op, (ast.USub, ast.UAdd)) and isinstance(node.operand, ast.Constant)
+                                   and isinstance(node.operand.value, (int, float, complex)))
+        elif isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            literal = all(literal for literal, _ in children)
+            immutable = literal and isinstance(node, ast.Tuple) and all(immutable for _, immutable in children)
+        elif isinstance(node, ast.Dict):
+            literal = None not in node.keys and all(literal for literal, _ in children)
+            immutable = False
+        else:
+            literal = immutable = False
+        if literal:
+            self._literals.add(id(node))
+        if immutable:
+            self._immutable.add(id(node))
+        return literal, immutable
+
+    def _reference(self, index, source):
+        node = ast.parse(f'{self.NAME}[{index}]', mode='eval').body
+        for child in ast.walk(node):
+            ast.copy_location(child, source)
+        return node
+
+    def _add(self, node):
+        try:
+            value = ast.literal_eval(node)
+            data = marshal.dumps(value)
+        except (ValueError, TypeError):
+            return None
+        if len(data) < self.threshold:
+            return None
+        self.blobs.append(zlib.compress(data, 9))
+        return len(self.blobs) - 1
+
+    def _lazy_names(self, tree):
+        # Ленивым становится имя, которое связывается ровно один раз и не читается через globals()
+        bindings = Counter()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                if node.id in self.DYNAMIC:
+                    return set()
+                if not isinstance(node.ctx, ast.Load):
+                    bindings[node.id] += 1
+            elif isinstance(node, ast.arg):
+                bindings[node.arg] += 1
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if node.name in ('__getattr__', '__dir__'):
+                    return set()
+                bindings[node.name] += 1
+            elif isinstance(node, ast.alias):
+                if node.name == '*':
+                    return set()
+                bindings[(node.asname or node.name).split('.')[0]] += 1
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                bindings.update(node.names)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                bindings[node.name] += 1
+            elif isinstance(node, ast.Attribute) and (node.attr in ('__dict__', '__dir__')
+                                                      or isinstance(node.value, ast.Name) and node.value.id == '__all__'):
+                return set()
+            elif isinstance(getattr(node, 'name', None), str) or isinstance(getattr(node, 'rest', None), str):
+                # Захваты в case и параметры типов
+                bindings[getattr(node, 'name', None) or node.rest] += 1
+        if bindings['__all__'] != 1:
+            return set()
+        exported = self._exports(tree)
+        return {name for name, count in bindings.items() if count == 1 and name in exported}
+
+    @staticmethod
+    def _exports(tree):
+        # Без __all__ звёздочка берёт имена из __dict__ модуля, а ленивого имени там нет.
+        # Поэтому ленивы только имена из литерального __all__: их * получает через __getattr__
+        for statement in tree.body:
+            if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name) and statement.targets[0].id == '__all__'
+                    and isinstance(statement.value, (ast.List, ast.Tuple))
+                    and all(isinstance(item, ast.Constant) and isinstance(item.value, str)
+                            for item in statement.value.elts)):
+                return {item.value for item in statement.value.elts if not item.value.startswith('__')}
+        return set()
+
+    def extract(self, tree):
+        if any(isinstance(node, ast.Name) and node.id == self.NAME for node in ast.walk(tree)):
+            return tree
+        self._mark(tree)
+        candidates = self._lazy_names(tree)
+        body = []
+        for statement in tree.body:
+            if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name) and statement.targets[0].id in candidates
+                    and id(statement.value) in self._literals):
+                index = self._add(statement.value)
+                if index is not None:
+                    self.globals[statement.targets[0].id] = index
+                    continue
+            body.append(statement)
+        tree.body = body
+        tree = self.visit(tree)
+        if not self.blobs:
+            return tree
+        source = self.SOURCE + (self.GETATTR_SOURCE if self.globals else '')
+        preamble = ast.parse(source).body
+        values = {'blobs': ast.Constant(tuple(self.blobs)), 'names': ast.parse(repr(self.globals), mode='eval').body}
+        for statement in preamble:
+            if isinstance(statement, ast.Assign) and isinstance(statement.targets[0], ast.Attribute):
+                statement.value = values[statement.targets[0].attr]
+        # Заготовка встаёт после docstring и from __future__ import
+        body = tree.body
+        position = 0
+        if (body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)):
+            position = 1
+        while position < len(body) and isinstance(body[position], ast.ImportFrom) and body[position].module == '__future__':
+            position += 1
+        if body:
+            anchor = body[max(position - 1, 0)]
+            for statement in preamble:
+                for node in ast.walk(statement):
+                    ast.copy_location(node, anchor)
+        body[position:position] = preamble
+        return ast.fix_missing_locations(tree)
+
+    def visit(self, node):
+        if id(node) in self._immutable and self._function:
+            index = self._add(node)
+            return node if index is None else self._reference(index, node)
+        return super().visit(node)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.globals:
+            return self._reference(self.globals[node.id], node)
+        return node
+
+    def _visit_function(self, node):
+        # Декораторы и значения по умолчанию выполняются при определении, аннотации не трогаются
+        node.decorator_list = [self.visit(item) for item in node.decorator_list]
+        node.args = self.visit(node.args)
+        self._function += 1
+        node.body = [self.visit(statement) for statement in node.body]
+        self._function -= 1
+        return node
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_Lambda(self, node):
+        node.args = self.visit(node.args)
+        self._function += 1
+        node.body = self.visit(node.body)
+        self._function -= 1
+        return node
+
+    def visit_arg(self, node):
+        return node
+
+    def visit_Expr(self, node):
+        # Строка-выражение - это docstring или ничего не делает
+        if isinstance(node.value, ast.Constant):
+            return node
+        node.value = self.visit(node.value)
+        return node
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            node.value = self.visit(node.value)
+        return node
+
+    def visit_JoinedStr(self, node):
+        return node
+
+    def visit_match_case(self, node):
+        if node.guard is not None:
+            node.guard = self.visit(node.guard)
+        node.body = [self.visit(statement) for statement in node.body]
+        return node
+
+def prune_constants(code, keep_docstrings=True):
+    used = {instr.arg for instr in dis.get_instructions(code) if instr.opcode in dis.hasconst}
+    # Строка документации функции лежит в co_consts[0] и не загружается ни одной инструкцией
+    if keep_docstrings and code.co_flags & inspect.CO_OPTIMIZED:
+        used.add(0)
+    consts = tuple(
+        (prune_constants(const, keep_docstrings) if isinstance(const, type(code)) else const) if i in used else None
+        for i, const in enumerate(code.co_consts)
+    )
+    return code.replace(co_consts=consts)
+
+def map_module_id(content, options):
+    # Имя файла в коде и ключ карты трассировок; зависит от опций, меняющих имена и строки
+    digest = hashlib.sha256(f"se-map:{options['strip_lines']:d}{options['use_rename']:d}\0".encode())
+    digest.update(content.encode('utf-8') if isinstance(content, str) else content)
+    return digest.hexdigest()[:16]
+
+def compile_source(content, options, symbols=None):
+    filename = f"<se:{map_module_id(content, options)}>" if options['traceback_map'] else '<string>'
+    renamer = shrinker = None
+    if any(options[key] for key in AST_TRANSFORM_KEYS):
+        tree = ast.parse(content)
+        if options['use_rename']:
+            renamer = LocalRenamer(tree)
+            tree = renamer.rename(tree)
+        if options['lazy_constants']:
+            tree = ConstantExtractor(options['lazy_threshold']).extract(tree)
+        shrinker = BytecodeShrinker(options)
+        source = shrinker.shrink(tree)
+    else:
+        source = content
+    code = compile(source, filename, 'exec', optimize=options['optimize_level'])
+    if options['prune_constants']:
+        code = prune_constants(code, not options['strip_docstrings'])
+    if symbols is not None and options['traceback_map']:
+        symbols.update(module=filename[4:-1], lines=shrinker.line_map if shrinker else [],
+                       names=renamer.names if renamer else {})
+    return code, source
+
+def measure_bytecode_savings(content, options, repeats=5):
+    def measure(opts):
+        data = marshal.dumps(compile_source(content, opts)[0])
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            marshal.loads(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return len(data), best
+
+    baseline = make_options(**{**options, 'optimize_level': 0, 'prune_constants': False,
+                               **{key: False for key in AST_TRANSFORM_KEYS}})
+    base_size, base_time = measure(baseline)
+    size, load_time = measure(options)
+    return {
+        'marshal_size': size,
+        'marshal_size_saved': base_size - size,
+        'loads_time': load_time,
+        'loads_time_saved': base_time - load_time,
+    }
+
+def bytecode_shrinking_enabled(options):
+    return options['optimize_level'] > 0 or options['prune_constants'] or any(options[key] for key in AST_TRANSFORM_KEYS)
+
+def decode_chain(options):
+    return '+'.join(stage.name for stage in reversed(active_stages(options)))
+
+def generate_runtime_stub(options, rng=None):
+    stub = "# -*- coding: utf-8 -*-\n"
+    stub += f"from {RUNTIME_MODULE} import run_v{RUNTIME_VERSION}"
+    stub += stub_junk(options, rng)
+    return stub
+
+def extract_imports(content, limit=PREFETCH_IMPORTS):
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return ()
+    imports = []
+    # ast.walk идёт в ширину: импорты верхнего уровня попадают в начало списка
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = '.' * node.level + (node.module or '')
+            if node.module:
+                imports.append(base)
+            prefix = base if base.endswith('.') else base + '.'
+            imports.extend(prefix + alias.name for alias in node.names if alias.name != '*')
+    return tuple(dict.fromkeys(imports))[:limit]
+
+def output_footer(options, imports=()):
+    if options['shared_runtime']:
+        if options['prefetch'] and imports:
+            return f"\n\nrun_v{RUNTIME_VERSION}(encoded, {decode_chain(options)!r}, globals(), {tuple(imports)!r})"
+        return f"\n\nrun_v{RUNTIME_VERSION}(encoded, {decode_chain(options)!r}, globals())"
+    if options['profile_hooks']:
+        return PROFILE_FOOTER
+    return OUTPUT_FOOTER
+
+RUNTIME_ZDICT_RE = re.compile(r"^ZDICTS\['[0-9a-f]+'\] = base64\.b85decode\(b'([^']*)'\)$", re.M)
+
+def generate_runtime(zdicts=()):
+    # Рантайм знает все зарегистрированные ступени: файлы с любыми цепочками делят один модуль
+    imports = dict.fromkeys(RUNTIME_IMPORTS + tuple(module for stage in STAGES for module in stage.imports))
+    runtime = "# -*- coding: utf-8 -*-\n" + "".join(f"import {module}\n" for module in imports) + RUNTIME_HEADER
+    entries = "".join(f"ZDICTS[{zdict_id(zdict).hex()!r}] = base64.b85decode({base64.b85encode(zdict)!r})\n"
+                      for zdict in sorted(set(zdicts), key=zdict_id) if zdict)
+    runtime = runtime.replace("ZDICTS = {}\n", "ZDICTS = {}\n" + entries, 1)
+    runtime += "".join(dict.fromkeys(stage.source for stage in STAGES))
+    runtime += SELECT_SOURCE + PROFILE_SOURCE
+    runtime += "\n_STEPS_V1 = {\n" + "".join(f"    {stage.name!r}: {stage.decode},\n" for stage in STAGES) + "}\n"
+    return runtime + RUNTIME_SOURCE + ASSETS_SOURCE
+
+def write_runtime(output_dir, zdict=b''):
+    runtime_path = os.path.join(output_dir, RUNTIME_MODULE + '.py')
+    zdicts = [zdict]
+    existing = None
+    if os.path.exists(runtime_path):
+        with open(runtime_path, 'r', encoding='utf-8') as f:
+            existing = f.read()
+        # Словари прежних пакетов каталога остаются: их модули ссылаются на свои id
+        zdicts.extend(base64.b85decode(literal) for literal in RUNTIME_ZDICT_RE.findall(existing))
+    runtime = generate_runtime(zdicts)
+    if runtime == existing:
+        return runtime_path
+    with atomic_open(runtime_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(runtime)
+    return runtime_path
+
+def generate_decoder(options, rng=None):
+    if options['shared_runtime']:
+        return generate_runtime_stub(options, rng)
+
+    stages = active_stages(options)
+    for stage in stages:
+        if not stage.standalone:
+            raise EncodeError("Options Error", f"The {stage.name} stage needs the shared runtime")
+    decode_steps = [(stage.name, stage.decode) for stage in reversed(stages)]
+
+    imports = []
+    if options['profile_hooks']:
+        imports.extend(('os', 'time'))
+    if multi_interpreter(options):
+        imports.extend(('sys', 'importlib.util'))
+    imports.extend(module for stage in stages for module in stage.imports)
+
+    decoder = "# -*- coding: utf-8 -*-\n"
+    decoder += "\n".join(f"import {module}" for module in dict.fromkeys(imports)) + "\n"
+    decoder += "".join(dict.fromkeys(stage.source for stage in reversed(stages)))
+    if multi_interpreter(options):
+        decoder += SELECT_SOURCE
+
+    if options['profile_hooks']:
+        decoder += PROFILE_SOURCE
+        decoder += "\n_profile_records = []\n"
+        decoder += "\n_DECODE_STEPS = [" + ", ".join(f"({name!r}, {func})" for name, func in decode_steps) + "]\n"
+    decoder += "\n"
+    decoder += "def decode(encoded):\n"
+    decoder += "    try:\n"
+    if multi_interpreter(options):
+        decoder += "        encoded = _select_payload(encoded)\n"
+    if options['profile_hooks']:
+        decoder += "        if _PROFILE:\n"
+        decoder += "            encoded, _profile_records[:] = _profile_steps(encoded, _DECODE_STEPS)\n"
+        decoder += "            return encoded\n"
+
+    decoder += "\n".join(f"        encoded = {func}(encoded)" for _, func in decode_steps)
+    decoder += "\n        return encoded"
+    decoder += "\n    except Exception as e:"
+    decoder += '\n        print("Decoding error:", str(e))'
+    decoder += "\n        return None"
+
+    decoder += stub_junk(options, rng)
+
+    return decoder
+
+def interpreter_list(options):
+    return [path.strip() for path in options['interpreters'].split(os.pathsep) if path.strip()]
+
+def multi_interpreter(options):
+    # Без marshal нагрузка - текст и от версии не зависит
+    return options['use_marshal'] and bool(interpreter_list(options))
+
+@lru_cache(maxsize=1)
+def compile_worker_source():
+    return ("import sys, ast, dis, zlib, json, marshal, hashlib, importlib.util\n"
+            "from collections import Counter\n"
+            f"AST_TRANSFORM_KEYS = {AST_TRANSFORM_KEYS!r}\n"
+            + inspect.getsource(LocalRenamer) + inspect.getsource(ConstantExtractor)
+            + inspect.getsource(BytecodeShrinker)
+            + inspect.getsource(prune_constants) + inspect.getsource(map_module_id)
+            + inspect.getsource(compile_source) + COMPILE_WORKER)
+
+def start_compile_workers(content, options):
+    # Все интерпретаторы стартуют сразу и компилируют параллельно с локальной компиляцией
+    worker_options = json.dumps({key: options[key] for key in
+                                 (*AST_TRANSFORM_KEYS, 'lazy_threshold', 'optimize_level', 'prune_constants',
+                                  'traceback_map')})
+    data = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+    workers = []
+    for interpreter in interpreter_list(options):
+        try:
+            process = subprocess.Popen([interpreter, '-I', '-c', compile_worker_source(), worker_options],
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            for _, started in workers:
+                started.kill()
+            raise EncodeError("Interpreter Error", f"Cannot start {interpreter}: {str(e)}")
+        workers.append((interpreter, process))
+    for interpreter, process in workers:
+        try:
+            process.stdin.write(data)
+            process.stdin.close()
+        except OSError:
+            # Процесс уже завершился, причина будет в stderr
+            pass
+    return workers
+
+def collect_compile_workers(workers):
+    payloads = {}
+    errors = []
+    for interpreter, process in workers:
+        # stdin уже закрыт, communicate() на нём падает; stderr короткий и трубу не переполнит
+        output = process.stdout.read()
+        error = process.stderr.read()
+        process.wait()
+        if process.returncode != 0 or len(output) < 4:
+            lines = error.decode('utf-8', 'replace').strip().splitlines()
+            errors.append(f"{interpreter}: {lines[-1] if lines else f'exit code {process.returncode}'}")
+            continue
+        payloads.setdefault(output[:4], output[4:])
+    if errors:
+        raise EncodeError("Interpreter Error", "\n".join(errors))
+    return payloads
+
+def compile_payload(content, options, symbols=None):
+    try:
+        code, source = compile_source(content, options, symbols)
+    except SyntaxError as e:
+        raise EncodeError("Syntax Error", f"Source file contains an error:\n{str(e)}")
+
+    if options['use_marshal']:
+        try:
+            return marshal.dumps(code), code
+        except Exception as e:
+            raise EncodeError("Marshal Error", f"Error using marshal: {str(e)}")
+    if symbols:
+        # Текст исполняется как "<string>": кадры такой нагрузки с картой не связать
+        symbols.clear()
+    if isinstance(source, ast.AST):
+        payload = ast.unparse(source).encode()
+    else:
+        payload = content.encode() if isinstance(content, str) else bytes(content)
+    if isinstance(source, ast.AST) or options['prune_constants']:
+        # Без marshal исполняется текст: эталоном служит код, скомпилированный из самой нагрузки
+        code = compile(payload, '<string>', 'exec', optimize=options['optimize_level'])
+    return payload, code
+
+def build_payload(content, options):
+    return compile_payload(content, options)[0]
+
+def cipher_material(options, content):
+    size = CIPHER_KEY_SIZE + CIPHER_NONCE_SIZE
+    if not options['deterministic']:
+        return os.urandom(size)
+    seed = options['seed_key'].encode('utf-8') + b'\0cipher\0' + content_digest(content)
+    return hashlib.shake_256(seed).digest(size)
+
+def cipher_salt(options):
+    if not options['deterministic']:
+        return os.urandom(CIPHER_SALT_SIZE).hex()
+    return hashlib.shake_256(options['seed_key'].encode('utf-8') + b'\0salt\0').hexdigest(CIPHER_SALT_SIZE)
+
+def with_cipher_salt(options, salt=None):
+    # Одна соль на пакет или сеанс: пароль проходит PBKDF2 один раз на процесс, файлы различает nonce
+    if not (options['use_cipher'] and options['cipher_key']) or options['cipher_salt']:
+        return options
+    return {**options, 'cipher_salt': salt or cipher_salt(options)}
+
+def apply_stage(stage, encoded, options, context):
+    try:
+        return stage.encode(encoded, options, context)
+    except EncodeError:
+        raise
+    except Exception as e:
+        raise EncodeError(f"{stage.label} Error", f"Error in {stage.name} stage: {str(e)}")
+
+def apply_codecs(encoded, options, zdict=None, material=None):
+    context = {'zdict': zdict, 'material': material}
+    for stage in active_stages(options):
+        if stage.encode is not None:
+            encoded = apply_stage(stage, encoded, options, context)
+    return encoded
+
+def encode_compiled(content, options, zdict=None, symbols=None):
+    workers = start_compile_workers(content, options) if multi_interpreter(options) else ()
+    try:
+        payload, code = compile_payload(content, options, symbols)
+    except BaseException:
+        for _, process in workers:
+            process.kill()
+            process.wait()
+        raise
+    material = cipher_material(options, content) if options['use_cipher'] else None
+    encoded = apply_codecs(payload, options, zdict, material)
+    if not workers:
+        return encoded, code
+    payloads = {importlib.util.MAGIC_NUMBER: encoded}
+    for magic, foreign in collect_compile_workers(workers).items():
+        if magic not in payloads:
+            # Своя гамма для каждой нагрузки: один ключ и nonce на разные данные дали бы их XOR
+            payloads[magic] = apply_codecs(foreign, options, zdict,
+                                           material and hashlib.shake_256(material + magic).digest(len(material)))
+    return payloads, code
+
+def encode_source(content, options, zdict=None):
+    return encode_compiled(content, options, zdict)[0]
+
+CODE_ATTRS = ('co_name', 'co_qualname', 'co_argcount', 'co_posonlyargcount', 'co_kwonlyargcount',
+              'co_flags', 'co_code', 'co_names', 'co_varnames', 'co_freevars', 'co_cellvars',
+              'co_firstlineno', 'co_linetable', 'co_exceptiontable')
+
+def compare_code(expected, actual, path='<module>'):
+    for attr in CODE_ATTRS:
+        if getattr(expected, attr, None) != getattr(actual, attr, None):
+            return f"{path}: {attr} differs"
+    if len(expected.co_consts) != len(actual.co_consts):
+        return f"{path}: co_consts differs"
+    for index, (a, b) in enumerate(zip(expected.co_consts, actual.co_consts)):
+        if isinstance(a, types.CodeType) and isinstance(b, types.CodeType):
+            difference = compare_code(a, b, f"{path}.{a.co_name}")
+            if difference:
+                return difference
+        # repr() нужен для NaN, который не равен сам себе
+        elif type(a) is not type(b) or (a != b and repr(a) != repr(b)):
+            return f"{path}: co_consts[{index}] differs"
+    return None
+
+def _literal_bytes(literal):
+    if literal.startswith(b"b'") and b"\\" not in literal:
+        return literal[2:-1]
+    return ast.literal_eval(literal.decode('ascii'))
+
+def extract_payload(data):
+    start = data.index(b"\n\nencoded = ") + len(b"\n\nencoded = ")
+    if data.startswith(b"{\n", start):
+        # Нагрузки под несколько интерпретаторов: по строке на MAGIC_NUMBER
+        payloads = {}
+        for line in data[start + 2:data.index(b"\n}", start)].split(b"\n"):
+            magic, literal = line.strip().rstrip(b",").split(b": ", 1)
+            payloads[ast.literal_eval(magic.decode('ascii'))] = _literal_bytes(literal)
+        return payloads
+    return _literal_bytes(data[start:data.index(b"\n", start)])
+
+@lru_cache(maxsize=4)
+def _runtime_namespace(zdict):
+    namespace = {'__name__': RUNTIME_MODULE}
+    exec(generate_runtime([zdict]), namespace)
+    return namespace
+
+JUNK_BLOCK_RE = re.compile(rb"\n\ndef _[A-Za-z]{12}\(\):\n")
+
+@lru_cache(maxsize=8)
+def _decoder_namespace(decoder):
+    namespace = {}
+    exec(decoder, namespace)
+    return namespace
+
+def load_decoder(data, options, zdict=None):
+    if options['shared_runtime']:
+        chain = re.search(rb"run_v\d+\(encoded, '([a-z0-9+]*)'", data).group(1).decode('ascii')
+        decode = _runtime_namespace(zdict or b'')['decode_v1']
+        return lambda encoded: decode(encoded, chain)
+    decoder = data[:data.index(b"\n\nencoded = ")]
+    # Мусорная функция никогда не вызывается и у каждого файла своя: без неё декодер
+    # одинаков для всех файлов с теми же опциями и компилируется один раз
+    junk = JUNK_BLOCK_RE.search(decoder)
+    if junk:
+        decoder = decoder[:junk.start()]
+    return _decoder_namespace(decoder)['decode']
+
+@contextmanager
+def cipher_key_env(options):
+    if not (options['use_cipher'] and options['cipher_key']):
+        yield
+        return
+    previous = os.environ.get(CIPHER_KEY_ENV)
+    os.environ[CIPHER_KEY_ENV] = options['cipher_key']
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ[CIPHER_KEY_ENV]
+        else:
+            os.environ[CIPHER_KEY_ENV] = previous
+
+def verify_output(data, options, expected, zdict=None):
+    # Декодер из самого файла, но без exec полезной нагрузки
+    messages = io.StringIO()
+    try:
+        with redirect_stdout(messages), cipher_key_env(options):
+            decoded = load_decoder(data, options, zdict)(extract_payload(data))
+        if decoded is None:
+            raise ValueError(messages.getvalue().strip() or "decoder returned None")
+        if not isinstance(decoded, types.CodeType):
+            decoded = compile(decoded, '<string>', 'exec', optimize=options['optimize_level'])
+    except Exception as e:
+        raise EncodeError("Verify Error", f"Output does not decode: {str(e)}")
+    difference = compare_code(expected, decoded)
+    if difference:
+        raise EncodeError("Verify Error", f"Decoded code differs from the source: {difference}")
+
+def train_zdict(samples, size=ZDICT_SIZE, segment=8, step=2):
+    counts = Counter()
+    for sample in samples:
+        counts.update({sample[i:i + segment] for i in range(0, len(sample) - segment + 1, step)})
+    common = sorted(((n, chunk) for chunk, n in counts.items() if n > 1), reverse=True)
+    seen = bytearray()
+    picked = []
+    for n, chunk in common:
+        if len(seen) + len(chunk) > size:
+            break
+        if chunk in seen:
+            continue
+        seen += chunk
+        picked.append(chunk)
+    # zlib дешевле ссылается на близкие данные, поэтому частые фрагменты — в конец словаря
+    return b''.join(reversed(picked))
+
+def render_output(decoder, encoded, footer=OUTPUT_FOOTER):
+    if isinstance(encoded, dict):
+        return b''.join(output_chunks(decoder, encoded, footer)).decode('utf-8')
+    return (decoder
+            + '\n\nencoded = ' + repr(encoded)
+            + footer)
+
+def _literal_chunks(encoded):
+    if not encoded.translate(None, REPR_SAFE_BYTES):
+        # base85/hex: repr() ничего не экранирует, пишем буфер без копии
+        yield b"b'"
+        yield memoryview(encoded)
+        yield b"'"
+    else:
+        yield repr(encoded).encode('ascii')
+
+def output_chunks(decoder, encoded, footer=OUTPUT_FOOTER):
+    yield decoder.encode('utf-8')
+    yield b"\n\nencoded = "
+    if isinstance(encoded, dict):
+        yield b"{"
+        for magic, payload in encoded.items():
+            yield f"\n    {magic!r}: ".encode('ascii')
+            yield from _literal_chunks(payload)
+            yield b","
+        yield b"\n}"
+    else:
+        yield from _literal_chunks(encoded)
+    yield footer.encode('ascii')
+
+def read_source(input_path):
+    with open(input_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+@contextmanager
+def open_source(input_path):
+    if os.path.getsize(input_path) < MMAP_THRESHOLD:
+        yield read_source(input_path)
+        return
+    with open(input_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield mm
+
+def temp_path(path):
+    return f'{path}.{os.getpid()}.tmp'
+
+@contextmanager
+def atomic_open(path, mode='wb', **kwargs):
+    # Запись во временный файл рядом и os.replace: после сбоя на месте либо старый файл, либо новый
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def backup_file(path, backup_path):
+    # Копия, а не переименование: исходный файл остаётся на месте до замены новым
+    with open(path, 'rb') as src, atomic_open(backup_path) as dst:
+        shutil.copyfileobj(src, dst)
+
+def write_output(output_path, decoder, encoded, footer=OUTPUT_FOOTER):
+    with atomic_open(output_path) as f:
+        f.writelines(output_chunks(decoder, encoded, footer))
@@ -0,0 +1,191 @@
+import os
+from collections import deque, Counter
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, Signal
+from PySide6.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+
+COLUMNS = ('file', 'status', 'time', 'source_size', 'output_size', 'ratio')
+
+# Результаты из рабочих процессов применяются к таблице не чаще этого интервала (мс)
+REFRESH_INTERVAL = 100
+
+class JobTableModel(QAbstractTableModel):
+    def __init__(self, tr, parent=None):
+        super().__init__(parent)
+        self.tr = tr
+        self._jobs = []
+        self._rows = {}
+        self._counts = Counter()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._jobs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self._jobs[index.row()]
+        column = COLUMNS[index.column()]
+        if role == Qt.DisplayRole:
+            return self._format(job, column)
+        if role == Qt.ToolTipRole:
+            return job.get('error') or job['input']
+        if role == Qt.TextAlignmentRole and column not in ('file', 'status'):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def _format(self, job, column):
+        if column == 'file':
+            return os.path.basename(job['input'])
+        if column == 'status':
+            return self.tr('job_' + job['status'])
+        if job['status'] != 'done':
+            return ''
+        if column == 'time':
+            return f"{job['encode_time'] * 1000:.0f} ms"
+        if column == 'ratio':
+            return f"{job['output_size'] / (job['source_size'] or 1):.0%}"
+        return f"{job[column]:,}"
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.tr('job_' + COLUMNS[section])
+        return None
+
+    def retranslate(self):
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(COLUMNS) - 1)
+        self._changed(0, len(self._jobs) - 1)
+
+    def _changed(self, first, last):
+        if first <= last:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(COLUMNS) - 1))
+
+    def add_jobs(self, jobs):
+        new = [(input_path, output_path) for input_path, output_path in dict(jobs).items()
+               if input_path not in self._rows]
+        if not new:
+            return 0
+        first = len(self._jobs)
+        self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+        for row, (input_path, output_path) in enumerate(new, first):
+            self._rows[input_path] = row
+            self._jobs.append({'input': input_path, 'output': output_path, 'status': 'queued'})
+        self._counts['queued'] += len(new)
+        self.endInsertRows()
+        return len(new)
+
+    def clear(self):
+        self.beginResetModel()
+        self._jobs = []
+        self._rows = {}
+        self._counts = Counter()
+        self.endResetModel()
+
+    def jobs(self):
+        return [(job['input'], job['output']) for job in self._jobs]
+
+    def pending_jobs(self):
+        return [(job['input'], job['output']) for job in self._jobs if job['status'] in ('queued', 'failed')]
+
+    def mark_running(self, jobs):
+        rows = [self._rows[input_path] for input_path, _ in jobs]
+        for row in rows:
+            self._set_status(self._jobs[row], 'running')
+        if rows:
+            self._changed(min(rows), max(rows))
+
+    def apply_results(self, results):
+        # Одна пачка результатов - один сигнал dataChanged на весь затронутый диапазон
+        rows = []
+        for stats in results:
+            row = self._rows.get(stats['input'])
+            if row is None:
+                continue
+            job = self._jobs[row]
+            job.update(stats)
+            self._set_status(job, 'done' if stats['ok'] else 'failed')
+            rows.append(row)
+        if rows:
+            self._changed(min(rows), max(rows))
+
+    def _set_status(self, job, status):
+        self._counts[job['status']] -= 1
+        self._counts[status] += 1
+        job['status'] = status
+
+    def status(self, input_path):
+        row = self._rows.get(input_path)
+        return None if row is None else self._jobs[row]['status']
+
+    def counts(self):
+        return {status: self._counts[status] for status in ('queued', 'running', 'done', 'failed')}
+
+class JobTableView(QTableView):
+    paths_dropped = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAcceptDrops(True)
+        self.setDragDropMode(QAbstractItemView.DropOnly)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setWordWrap(False)
+        self.setShowGrid(False)
+        self.setAlternatingRowColors(True)
+        # Фиксированная высота строк: представлению не нужно измерять 50k строк
+        vertical = self.verticalHeader()
+        vertical.setVisible(False)
+        vertical.setSectionResizeMode(QHeaderView.Fixed)
+        vertical.setDefaultSectionSize(24)
+
+    def setModel(self, model):
+        super().setModel(model)
+        header = self.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super().dragEnterEvent(event)
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super().dragMoveEvent(event)
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.paths_dropped.emit(paths)
+        else:
+            super().dropEvent(event)
+
+class BatchWorker(QThread):
+    def __init__(self, jobs, options, parent=None):
+        super().__init__(parent)
+        self.jobs = jobs
+        self.options = options
+        # Пополняется из потока пакета, забирается таймером в потоке интерфейса
+        self.results = deque()
+        self.error = None
+
+    def run(self):
+        import multiprocessing
+        from batch import encode_batch
+
+        # fork из процесса с потоками Qt небезопасен: рабочие процессы запускаются заново
+        try:
+            encode_batch(self.jobs, self.options, on_result=self.results.append,
+                         mp_context=multiprocessing.get_context('spawn'))
+        except Exception as e:
+            self.error = str(e)
+
+    def take_results(self):
+        results = []
+        while self.results:
+            results.append(self.results.popleft())
+        return results
@@ -0,0 +1,119 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import sqlite3
+
+from encoder import file_digest
+
+JOURNAL_NAME = '.se_journal.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    input TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    options_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    input_size INTEGER,
+    input_mtime INTEGER,
+    input_hash TEXT,
+    output_size INTEGER,
+    output_hash TEXT,
+    source_size INTEGER,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value BLOB
+);
+'''
+
+def options_key(options):
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+
+def input_stat(input_path):
+    st = os.stat(input_path)
+    return st.st_size, st.st_mtime_ns
+
+def default_journal_path(jobs):
+    root = os.path.commonpath([os.path.abspath(os.path.dirname(output_path) or '.') for _, output_path in jobs])
+    return os.path.join(root, JOURNAL_NAME)
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        # WAL: запись одной строки на каждый файл не ждёт fsync всей базы
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def reset(self):
+        with self.db:
+            self.db.execute('DELETE FROM jobs')
+            self.db.execute('DELETE FROM meta')
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def completed(self, jobs, key):
+        # Проверка готовых файлов стоит stat на файл; хэш входа читается только если stat изменился
+        rows = {row[0]: row for row in self.db.execute(
+            'SELECT input, output, options_key, input_size, input_mtime, input_hash, output_size, source_size '
+            "FROM jobs WHERE state = 'done'")}
+        done = {}
+        for input_path, output_path in jobs:
+            row = rows.get(input_path)
+            if row is None or row[1] != output_path or row[2] != key:
+                continue
+            try:
+                if os.path.getsize(output_path) != row[6]:
+                    continue
+                stat = input_stat(input_path)
+            except OSError:
+                continue
+            if stat != (row[3], row[4]):
+                if file_digest(input_path) != row[5]:
+                    continue
+                with self.db:
+                    self.db.execute('UPDATE jobs SET input_size = ?, input_mtime = ? WHERE input = ?',
+                                    (*stat, input_path))
+            done[input_path] = {'input': input_path, 'output': output_path, 'ok': True, 'skipped': True,
+                                'source_size': row[7], 'output_size': row[6], 'encode_time': 0.0,
+                                'verify_time': 0.0}
+        return done
+
+    def recover(self):
+        # Файлы, которые были в работе при сбое: их временные файлы больше никто не допишет
+        for (output_path,) in self.db.execute("SELECT output FROM jobs WHERE state = 'running'"):
+            for tmp_path in glob.glob(glob.escape(output_path) + '.*.tmp'):
+                os.remove(tmp_path)
+
+    def start(self, jobs, key, stats):
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO jobs (input, output, options_key, state, input_size, input_mtime, updated) '
+                "VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                [(input_path, output_path, key, *stats[input_path], time.time()) for input_path, output_path in jobs])
+
+    def finish(self, stats):
+        with self.db:
+            if stats['ok']:
+                self.db.execute(
+                    "UPDATE jobs SET state = 'done', input_hash = ?, output_size = ?, output_hash = ?, "
+                    'source_size = ?, updated = ? WHERE input = ?',
+                    (stats['input_hash'], stats['output_size'], stats['output_hash'], stats['source_size'],
+                     time.time(), stats['input']))
+            else:
+                self.db.execute("UPDATE jobs SET state = 'failed', updated = ? WHERE input = ?",
+                                (time.time(), stats['input']))
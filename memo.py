@@ -0,0 +1,102 @@
+import time
+import threading
+from collections import OrderedDict
+
+from encoder import (AST_TRANSFORM_KEYS, content_digest, cipher_material, compile_payload, apply_stage,
+                     encode_compiled, multi_interpreter)
+from stages import active_stages
+
+MEMO_BYTES = 256 * 1024 * 1024
+
+# Опции, от которых зависит нагрузка до первой ступени кодирования
+COMPILE_KEYS = (*AST_TRANSFORM_KEYS, 'lazy_threshold', 'optimize_level', 'prune_constants', 'traceback_map',
+                'use_marshal')
+
+class StageMemo:
+    # Промежуточные результаты конвейера: ключ - хэш исходника и префикс ступеней с их опциями.
+    # LRU по байтам: при переполнении вытесняются давно не использованные результаты.
+    def __init__(self, max_bytes=MEMO_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Кэш делят поток предпросмотра и кнопка Encode
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, value, size, elapsed):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (value, size, elapsed)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+def stage_key(stage, options, context):
+    if stage.depends is None:
+        # Сторонняя ступень не объявила зависимости: в ключ идут все опции и весь context
+        return (tuple(sorted((key, repr(value)) for key, value in options.items())),
+                context.get('zdict'), context.get('material'))
+    return tuple(options[key] if key in options else context.get(key) for key in stage.depends)
+
+def encode_memoized(memo, content, options, zdict=None, symbols=None, report=None):
+    # Пересчитывается только суффикс конвейера после последнего закэшированного префикса
+    if multi_interpreter(options):
+        return encode_compiled(content, options, zdict, symbols)
+    key = ('compile', content_digest(content), tuple(options[name] for name in COMPILE_KEYS))
+    entry = memo.get(key)
+    cached = entry is not None
+    if entry is None:
+        compiled_symbols = {} if options['traceback_map'] else None
+        start = time.perf_counter()
+        payload, code = compile_payload(content, options, compiled_symbols)
+        # Объекты кода по размеру примерно как их marshal
+        entry = ((payload, code, compiled_symbols), 2 * len(payload), time.perf_counter() - start)
+        memo.put(key, *entry)
+    (payload, code, compiled_symbols), _, estimated = entry
+    if symbols is not None and compiled_symbols:
+        symbols.update(compiled_symbols)
+    steps, hits = 1, int(cached)
+
+    material = cipher_material(options, content) if options['use_cipher'] else None
+    context = {'zdict': zdict, 'material': material}
+    encoded = payload
+    for stage in active_stages(options):
+        if stage.encode is None:
+            continue
+        key = (key, stage.name, stage_key(stage, options, context))
+        entry = memo.get(key)
+        steps += 1
+        if entry is None:
+            start = time.perf_counter()
+            encoded = apply_stage(stage, encoded, options, context)
+            entry = (encoded, len(encoded), time.perf_counter() - start)
+            memo.put(key, *entry)
+        else:
+            hits += 1
+        encoded, _, elapsed = entry
+        estimated += elapsed
+    if report is not None:
+        # estimated_time - цена полного кодирования без кэша
+        report.update(steps=steps, cached=hits, estimated_time=estimated)
+    return encoded, code
@@ -1,68 +1,34 @@
 import sys
 import os
-import marshal
-import base64
-import zlib
-import binascii
-import random
-import string
-import re
-import ast
-import json
-import subprocess
+import time
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                             QCheckBox, QSpinBox, QTextEdit, QFileDialog,
                             QGroupBox, QMessageBox, QStatusBar, QFrame,
                             QComboBox, QTabWidget)
-from PySide6.QtCore import Qt, QPropertyAnimation, QEasingCurve, Property, QPoint, QTimer, QSettings
+from PySide6.QtCore import (Qt, QPropertyAnimation, QEasingCurve, Property, QPoint, QTimer, QSettings, QObject, QEvent,
+                            QThread, Signal)
 from PySide6.QtGui import QColor, QPalette, QFont, QPainter, QLinearGradient
 from translations import TRANSLATIONS
+from styles import build_stylesheet
+from stages import ui_stages, CIPHER_SALT_SIZE
 
-class LanguageComboBox(QComboBox):
+# Кодировщик (marshal, zlib, ast, subprocess...) импортируется только при первом кодировании,
+# чтобы не замедлять запуск окна
+
+# Предпросмотр пересчитывается после паузы в изменениях опций (мс)
+PREVIEW_DELAY = 300
+
+class ModernComboBox(QComboBox):
+    pass
+
+class LanguageComboBox(ModernComboBox):
     def __init__(self, parent=None):
         super().__init__(parent)
         
-        self._icon_path = parent._icon_path if parent else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icons')
-        arrow_path = os.path.join(self._icon_path, 'arrow.svg').replace('\\', '/')
-        
         self.setFixedWidth(120)
         self.addItem("English", "en")
         self.addItem("Русский", "ru")
-        
-        self.setStyleSheet(f"""
-            QComboBox {{
-                background-color: #2b2b2b;
-                color: white;
-                border: 2px solid #555555;
-                border-radius: 5px;
-                padding: 5px 10px;
-                min-height: 30px;
-            }}
-            QComboBox:hover {{
-                border: 2px solid #2d5af5;
-            }}
-            QComboBox::drop-down {{
-                border: none;
-                width: 30px;
-            }}
-            QComboBox::down-arrow {{
-                image: url("{arrow_path}");
-                width: 12px;
-                height: 12px;
-            }}
-            QComboBox::down-arrow:hover {{
-                image: url("{arrow_path}");
-            }}
-            QComboBox QAbstractItemView {{
-                background-color: #2b2b2b;
-                color: white;
-                selection-background-color: #2d5af5;
-                selection-color: white;
-                border: 2px solid #555555;
-                border-radius: 5px;
-            }}
-        """)
 
 class ModernButton(QPushButton):
     def __init__(self, *args, **kwargs):
@@ -71,134 +37,21 @@ class ModernButton(QPushButton):
         self._animation = QPropertyAnimation(self, b"pos")
         self._animation.setEasingCurve(QEasingCurve.InOutCubic)
         self._animation.setDuration(150)
-        
-        self.setStyleSheet("""
-            QPushButton {
-                background-color: #2d5af5;
-                border: none;
-                border-radius: 8px;
-                color: white;
-                padding: 8px 16px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #4169e1;
-            }
-            QPushButton:pressed {
-                background-color: #1e3cad;
-            }
-        """)
 
 class ModernCheckBox(QCheckBox):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.setStyleSheet("""
-            QCheckBox {
-                spacing: 8px;
-                color: #ffffff;
-                font-size: 13px;
-                min-height: 25px;
-                padding-right: 10px;
-            }
-            QCheckBox::indicator {
-                width: 20px;
-                height: 20px;
-                border-radius: 4px;
-                border: 2px solid #555555;
-            }
-            QCheckBox::indicator:unchecked {
-                background-color: #2b2b2b;
-            }
-            QCheckBox::indicator:checked {
-                background-color: #2d5af5;
-                border: 2px solid #2d5af5;
-                image: url(checkmark.svg);
-            }
-            QCheckBox::indicator:hover {
-                border: 2px solid #2d5af5;
-            }
-        """)
+    pass
 
 class ModernGroupBox(QGroupBox):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.setStyleSheet("""
-            QGroupBox {
-                background-color: #1e1e1e;
-                border: 1px solid #333333;
-                border-radius: 6px;
-                margin-top: 1.2em;
-                padding: 6px;
-                font-size: 13px;
-                font-weight: bold;
-                color: #ffffff;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 6px;
-                padding: 0 4px;
-                top: -6px;
-                background-color: #1e1e1e;
-            }
-        """)
+    pass
 
 class ModernSpinBox(QSpinBox):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.setStyleSheet("""
-            QSpinBox {
-                background-color: #2b2b2b;
-                border: 2px solid #333333;
-                border-radius: 6px;
-                color: white;
-                padding: 4px;
-                min-width: 80px;
-                min-height: 30px;
-            }
-            QSpinBox::up-button, QSpinBox::down-button {
-                border: none;
-                background-color: #2d5af5;
-                border-radius: 4px;
-                margin: 2px;
-            }
-            QSpinBox::up-button:hover, QSpinBox::down-button:hover {
-                background-color: #4169e1;
-            }
-        """)
+    pass
 
 class ModernLineEdit(QLineEdit):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.setStyleSheet("""
-            QLineEdit {
-                background-color: #2b2b2b;
-                border: 2px solid #333333;
-                border-radius: 8px;
-                color: white;
-                padding: 8px;
-                min-height: 40px;
-                font-size: 13px;
-            }
-            QLineEdit:focus {
-                border: 2px solid #2d5af5;
-            }
-        """)
+    pass
 
 class ModernTextEdit(QTextEdit):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.setStyleSheet("""
-            QTextEdit {
-                background-color: #1a1a1a;
-                border: 2px solid #333333;
-                border-radius: 10px;
-                color: white;
-                padding: 10px;
-                font-size: 13px;
-                selection-background-color: #2d5af5;
-            }
-        """)
+    pass
 
 class EncoderApp(QMainWindow):
     def __init__(self):
@@ -213,6 +66,7 @@ class EncoderApp(QMainWindow):
         self.setMinimumSize(900, 700)  # Уменьшаем размер окна
         
         self.set_dark_theme()
+        self.setStyleSheet(build_stylesheet(self._icon_path))
         
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -258,19 +112,15 @@ class EncoderApp(QMainWindow):
         basic_layout = QVBoxLayout()
         basic_layout.setSpacing(5)
         
-        self.use_marshal = ModernCheckBox("Marshal")
-        self.use_base64 = ModernCheckBox("Base64")
-        self.use_zlib = ModernCheckBox("Zlib")
-        self.use_binascii = ModernCheckBox("Binascii")
+        # Флажок на каждую ступень из реестра, включая сторонние
+        self.stage_boxes = {}
+        for stage in ui_stages():
+            box = ModernCheckBox(stage.label)
+            box.setChecked(stage.default)
+            self.stage_boxes[stage.option] = box
+            basic_layout.addWidget(box)
         self.use_compile = ModernCheckBox("Compile")
-        
-        self.use_marshal.setChecked(True)
-        self.use_base64.setChecked(True)
-        self.use_zlib.setChecked(True)
-        
-        for widget in [self.use_marshal, self.use_base64, self.use_zlib, 
-                      self.use_binascii, self.use_compile]:
-            basic_layout.addWidget(widget)
+        basic_layout.addWidget(self.use_compile)
         
         basic_group.setLayout(basic_layout)
         left_panel.addWidget(basic_group)
@@ -283,14 +133,64 @@ class EncoderApp(QMainWindow):
         self.use_junk = ModernCheckBox("Add Junk Code")
         self.use_rename = ModernCheckBox("Rename Variables")
         self.use_compress = ModernCheckBox("Maximum Compression")
+        self.deterministic = ModernCheckBox("Deterministic output")
+        self.shared_runtime = ModernCheckBox("Shared runtime module")
+        self.prefetch = ModernCheckBox("Prefetch imported modules")
+        self.use_cipher = ModernCheckBox("Encrypt payload")
+        self.verify = ModernCheckBox("Verify output")
+        self.verify.setChecked(True)
+        self.profile_hooks = ModernCheckBox("Decode profiling hooks")
         
         for widget in [self.use_encryption, self.use_junk, 
-                      self.use_rename, self.use_compress]:
+                      self.use_rename, self.use_compress, self.deterministic,
+                      self.shared_runtime, self.prefetch, self.use_cipher, self.verify,
+                      self.profile_hooks]:
             additional_layout.addWidget(widget)
         
+        self.seed_key = ModernLineEdit()
+        self.seed_key.setPlaceholderText("Seed key")
+        additional_layout.addWidget(self.seed_key)
+        
+        self.cipher_key = ModernLineEdit()
+        self.cipher_key.setEchoMode(QLineEdit.Password)
+        self.cipher_key.setPlaceholderText("Passphrase")
+        additional_layout.addWidget(self.cipher_key)
+        
+        self.interpreters = ModernLineEdit()
+        self.interpreters.setPlaceholderText("Extra interpreters")
+        additional_layout.addWidget(self.interpreters)
+        
         additional_group.setLayout(additional_layout)
         left_panel.addWidget(additional_group)
         
+        self.bytecode_group = ModernGroupBox("Bytecode Optimization")
+        bytecode_layout = QVBoxLayout()
+        bytecode_layout.setSpacing(5)
+        
+        level_layout = QHBoxLayout()
+        level_layout.setSpacing(5)
+        self.optimize_level_label = QLabel("Optimize level:")
+        self.optimize_level_spin = ModernSpinBox()
+        self.optimize_level_spin.setRange(0, 2)
+        self.optimize_level_spin.setValue(0)
+        level_layout.addWidget(self.optimize_level_label)
+        level_layout.addWidget(self.optimize_level_spin)
+        bytecode_layout.addLayout(level_layout)
+        
+        self.strip_docstrings = ModernCheckBox("Strip docstrings")
+        self.strip_debug = ModernCheckBox("Remove asserts and __debug__ branches")
+        self.strip_lines = ModernCheckBox("Collapse line numbers")
+        self.prune_constants = ModernCheckBox("Prune unused constants")
+        self.lazy_constants = ModernCheckBox("Load large constants lazily")
+        self.traceback_map = ModernCheckBox("Traceback map")
+        
+        for widget in [self.strip_docstrings, self.strip_debug,
+                      self.strip_lines, self.prune_constants, self.lazy_constants, self.traceback_map]:
+            bytecode_layout.addWidget(widget)
+        
+        self.bytecode_group.setLayout(bytecode_layout)
+        left_panel.addWidget(self.bytecode_group)
+        
         advanced_group = ModernGroupBox("Advanced Settings")
         advanced_layout = QVBoxLayout()
         advanced_layout.setSpacing(5)
@@ -313,8 +213,38 @@ class EncoderApp(QMainWindow):
         junk_layout.addWidget(self.junk_label)
         junk_layout.addWidget(self.junk_spin)
         
+        junk_bytes_layout = QHBoxLayout()
+        junk_bytes_layout.setSpacing(5)
+        self.junk_bytes_label = QLabel("Junk KB:")
+        self.junk_bytes_spin = ModernSpinBox()
+        self.junk_bytes_spin.setRange(0, 65536)
+        self.junk_bytes_spin.setValue(0)
+        junk_bytes_layout.addWidget(self.junk_bytes_label)
+        junk_bytes_layout.addWidget(self.junk_bytes_spin)
+        
+        segments_layout = QHBoxLayout()
+        segments_layout.setSpacing(5)
+        self.segments_label = QLabel("Zlib Segments:")
+        self.segments_spin = ModernSpinBox()
+        self.segments_spin.setRange(0, 64)
+        self.segments_spin.setValue(0)
+        segments_layout.addWidget(self.segments_label)
+        segments_layout.addWidget(self.segments_spin)
+        
+        optimize_layout = QHBoxLayout()
+        optimize_layout.setSpacing(5)
+        self.optimize_label = QLabel("Optimize:")
+        self.optimize_combo = ModernComboBox()
+        for key in ('optimize_off', 'optimize_size', 'optimize_startup', 'optimize_balanced'):
+            self.optimize_combo.addItem(key, key.split('_', 1)[1])
+        optimize_layout.addWidget(self.optimize_label)
+        optimize_layout.addWidget(self.optimize_combo)
+        
         advanced_layout.addLayout(layers_layout)
         advanced_layout.addLayout(junk_layout)
+        advanced_layout.addLayout(junk_bytes_layout)
+        advanced_layout.addLayout(segments_layout)
+        advanced_layout.addLayout(optimize_layout)
         advanced_group.setLayout(advanced_layout)
         left_panel.addWidget(advanced_group)
         
@@ -323,51 +253,31 @@ class EncoderApp(QMainWindow):
         right_panel = QVBoxLayout()
         right_panel.setSpacing(8)
         
-        output_group = ModernGroupBox("Output Settings")
-        output_layout = QVBoxLayout()
-        output_layout.setSpacing(5)
-        
-        filename_layout = QHBoxLayout()
-        filename_layout.setSpacing(5)
-        filename_label = QLabel("Filename:")
-        self.output_filename = ModernLineEdit()
-        self.output_filename.setPlaceholderText("Enter output filename")
-        filename_layout.addWidget(filename_label)
-        filename_layout.addWidget(self.output_filename)
-        
-        dir_layout = QHBoxLayout()
-        dir_layout.setSpacing(5)
-        dir_label = QLabel("Directory:")
-        self.output_dir = ModernLineEdit()
-        self.output_dir.setPlaceholderText("Output directory")
-        browse_dir_btn = ModernButton("...")
-        browse_dir_btn.setFixedWidth(40)
-        browse_dir_btn.clicked.connect(self.select_output_dir)
-        dir_layout.addWidget(dir_label)
-        dir_layout.addWidget(self.output_dir)
-        dir_layout.addWidget(browse_dir_btn)
-        
-        self.overwrite_existing = ModernCheckBox("Overwrite existing files")
-        self.create_backup = ModernCheckBox("Create backup")
-        
-        output_layout.addLayout(filename_layout)
-        output_layout.addLayout(dir_layout)
-        output_layout.addWidget(self.overwrite_existing)
-        output_layout.addWidget(self.create_backup)
-        output_group.setLayout(output_layout)
-        right_panel.addWidget(output_group)
+        self.tabs = QTabWidget()
         
-        self.result_group = ModernGroupBox("Result")
-        result_layout = QVBoxLayout()
+        self.result_group = QWidget()
+        result_layout = QVBoxLayout(self.result_group)
         result_layout.setSpacing(5)
+        result_layout.setContentsMargins(8, 8, 8, 8)
         
         self.result_text = ModernTextEdit()
         self.result_text.setReadOnly(True)
         self.result_text.setMinimumHeight(200)
         result_layout.addWidget(self.result_text)
+        self.tabs.addTab(self.result_group, "Result")
+        
+        # Вкладки Output и EXE строятся при первом показе
+        self._lazy_tabs = {}
+        self.output_tab = self.add_lazy_tab("Output", self.create_output_settings)
+        self.exe_tab = self.add_lazy_tab("EXE Options", self.create_exe_settings)
+        self.queue_tab = self.add_lazy_tab("Queue", self.create_queue_settings)
+        self.tabs.currentChanged.connect(lambda index: self.ensure_tab(self.tabs.widget(index)))
+        
+        right_panel.addWidget(self.tabs)
         
-        self.result_group.setLayout(result_layout)
-        right_panel.addWidget(self.result_group)
+        self.preview_label = QLabel()
+        self.preview_label.setWordWrap(True)
+        right_panel.addWidget(self.preview_label)
         
         content_layout.addLayout(left_panel, 2)
         content_layout.addLayout(right_panel, 3)
@@ -383,17 +293,7 @@ class EncoderApp(QMainWindow):
         
         self.clear_button = ModernButton("Clear")
         self.clear_button.setMinimumWidth(120)
-        self.clear_button.setStyleSheet("""
-            QPushButton {
-                background-color: #555555;
-            }
-            QPushButton:hover {
-                background-color: #666666;
-            }
-            QPushButton:pressed {
-                background-color: #444444;
-            }
-        """)
+        self.clear_button.setObjectName("clearButton")
         self.clear_button.clicked.connect(self.clear_all)
         
         buttons_layout.addStretch()
@@ -403,54 +303,26 @@ class EncoderApp(QMainWindow):
         main_layout.addLayout(buttons_layout)
         
         self.statusBar = QStatusBar()
-        self.statusBar.setStyleSheet("""
-            QStatusBar {
-                background-color: #1a1a1a;
-                color: white;
-                padding: 5px;
-                font-size: 13px;
-            }
-        """)
         self.setStatusBar(self.statusBar)
         
-        checkmark_path = os.path.join(self._icon_path, 'checkmark.svg').replace('\\', '/')
-        arrow_path = os.path.join(self._icon_path, 'arrow.svg').replace('\\', '/')
-        
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: #121212;
-            }}
-            QWidget {{
-                color: white;
-                font-family: 'Segoe UI', Arial, sans-serif;
-                font-size: 13px;
-            }}
-            QLabel {{
-                padding: 2px;
-            }}
-            QCheckBox::indicator {{
-                width: 16px;
-                height: 16px;
-                border-radius: 3px;
-                border: 2px solid #555555;
-            }}
-            QCheckBox::indicator:unchecked {{
-                background-color: #2b2b2b;
-            }}
-            QCheckBox::indicator:checked {{
-                background-color: #2d5af5;
-                border: 2px solid #2d5af5;
-                image: url("{checkmark_path}");
-            }}
-            QCheckBox::indicator:hover {{
-                border: 2px solid #2d5af5;
-            }}
-            QComboBox::down-arrow {{
-                image: url("{arrow_path}");
-                width: 12px;
-                height: 12px;
-            }}
-        """)
+        # Кэш промежуточных результатов создаётся при первом кодировании или предпросмотре
+        self.memo = None
+        self.preview_worker = None
+        self.tuner_worker = None
+        # Соль пароля на сеанс: модули одного общего рантайма выводят ключ один раз
+        self.cipher_salt = os.urandom(CIPHER_SALT_SIZE).hex()
+        self._preview_pending = False
+        self._preview_report = None
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self.start_preview)
+        for box in self.findChildren(QCheckBox):
+            box.toggled.connect(self.schedule_preview)
+        for spin in self.findChildren(QSpinBox):
+            spin.valueChanged.connect(self.schedule_preview)
+        for edit in [self.input_path, self.seed_key, self.cipher_key, self.interpreters]:
+            edit.textChanged.connect(self.schedule_preview)
         
         self.retranslateUi()
         
@@ -465,6 +337,23 @@ class EncoderApp(QMainWindow):
         palette.setColor(QPalette.ButtonText, QColor(255, 255, 255))
         self.setPalette(palette)
         
+    def add_lazy_tab(self, title, builder):
+        tab = QWidget()
+        self._lazy_tabs[tab] = builder
+        self.tabs.addTab(tab, title)
+        return tab
+    
+    def ensure_tab(self, tab):
+        builder = self._lazy_tabs.pop(tab, None)
+        if builder is None:
+            return
+        layout = QVBoxLayout(tab)
+        layout.setSpacing(10)
+        layout.setContentsMargins(10, 10, 10, 10)
+        builder(layout)
+        layout.addStretch()
+        self.retranslateUi()
+    
     def create_language_selector(self, parent_layout):
         lang_layout = QHBoxLayout()
         lang_layout.setSpacing(10)
@@ -486,8 +375,8 @@ class EncoderApp(QMainWindow):
         
         parent_layout.addLayout(lang_layout)
     
-    def tr(self, key):
-        return TRANSLATIONS[self.current_language].get(key, key)
+    def tr(self, key, default=None):
+        return TRANSLATIONS[self.current_language].get(key, key if default is None else default)
     
     def change_language(self, index):
         self.current_language = self.lang_combo.itemData(index)
@@ -500,25 +389,63 @@ class EncoderApp(QMainWindow):
         self.input_path.setPlaceholderText(self.tr('select_file_placeholder'))
         self.browse_button.setText(self.tr('browse_button'))
         
-        self.use_marshal.setText(self.tr('use_marshal'))
-        self.use_base64.setText(self.tr('use_base64'))
-        self.use_zlib.setText(self.tr('use_zlib'))
-        self.use_binascii.setText(self.tr('use_binascii'))
+        for stage in ui_stages():
+            self.stage_boxes[stage.option].setText(self.tr(stage.option, stage.label))
         self.use_compile.setText(self.tr('use_compile'))
         
         self.use_encryption.setText(self.tr('use_encryption'))
         self.use_junk.setText(self.tr('use_junk'))
         self.use_rename.setText(self.tr('use_rename'))
         self.use_compress.setText(self.tr('use_compress'))
+        self.deterministic.setText(self.tr('deterministic'))
+        self.shared_runtime.setText(self.tr('shared_runtime'))
+        self.prefetch.setText(self.tr('prefetch'))
+        self.use_cipher.setText(self.tr('use_cipher'))
+        self.verify.setText(self.tr('verify'))
+        self.profile_hooks.setText(self.tr('profile_hooks'))
+        self.seed_key.setPlaceholderText(self.tr('seed_key_placeholder'))
+        self.cipher_key.setPlaceholderText(self.tr('cipher_key_placeholder'))
+        self.interpreters.setPlaceholderText(self.tr('interpreters_placeholder').format(sep=os.pathsep))
+        
+        self.bytecode_group.setTitle(self.tr('bytecode_optimization'))
+        self.optimize_level_label.setText(self.tr('optimize_level'))
+        self.strip_docstrings.setText(self.tr('strip_docstrings'))
+        self.strip_debug.setText(self.tr('strip_debug'))
+        self.strip_lines.setText(self.tr('strip_lines'))
+        self.prune_constants.setText(self.tr('prune_constants'))
+        self.lazy_constants.setText(self.tr('lazy_constants'))
+        self.lazy_constants.setToolTip(self.tr('lazy_constants_tooltip'))
+        self.traceback_map.setText(self.tr('traceback_map'))
         
         self.layers_label.setText(self.tr('encoding_layers'))
         self.junk_label.setText(self.tr('junk_code_size'))
-        
-        self.overwrite_existing.setText(self.tr('overwrite_existing'))
-        self.create_backup.setText(self.tr('create_backup'))
+        self.junk_bytes_label.setText(self.tr('junk_bytes'))
+        self.junk_bytes_spin.setToolTip(self.tr('junk_bytes_tooltip'))
+        self.segments_label.setText(self.tr('zlib_segments'))
+        self.segments_spin.setToolTip(self.tr('zlib_segments_tooltip'))
+        self.optimize_label.setText(self.tr('optimize'))
+        for index in range(self.optimize_combo.count()):
+            self.optimize_combo.setItemText(index, self.tr('optimize_' + self.optimize_combo.itemData(index)))
+        
+        self.tabs.setTabText(self.tabs.indexOf(self.result_group), self.tr('result'))
+        self.tabs.setTabText(self.tabs.indexOf(self.output_tab), self.tr('output_tab'))
+        self.tabs.setTabText(self.tabs.indexOf(self.exe_tab), self.tr('exe_tab'))
+        self.tabs.setTabText(self.tabs.indexOf(self.queue_tab), self.tr('queue_tab'))
+        if self.output_tab not in self._lazy_tabs:
+            self.overwrite_existing.setText(self.tr('overwrite_existing'))
+            self.create_backup.setText(self.tr('create_backup'))
+        if self.queue_tab not in self._lazy_tabs:
+            self.add_files_button.setText(self.tr('add_files'))
+            self.add_folder_button.setText(self.tr('add_folder'))
+            self.encode_queue_button.setText(self.tr('encode_queue'))
+            self.clear_queue_button.setText(self.tr('clear_queue'))
+            self.job_model.retranslate()
+            self.update_queue_summary()
         
         self.encode_button.setText(self.tr('encode_button'))
         self.clear_button.setText(self.tr('clear_button'))
+        if self._preview_report is not None:
+            self.show_preview(self._preview_report)
 
     def create_file_section(self, parent_layout):
         self.file_group = ModernGroupBox("File Selection")
@@ -799,6 +726,120 @@ class EncoderApp(QMainWindow):
         exe_group.setLayout(layout)
         parent_layout.addWidget(exe_group)
 
+    def create_queue_settings(self, parent_layout):
+        from jobtable import JobTableModel, JobTableView, REFRESH_INTERVAL
+        
+        self.job_model = JobTableModel(self.tr, self)
+        self.job_view = JobTableView()
+        self.job_view.setModel(self.job_model)
+        self.job_view.setMinimumHeight(300)
+        self.job_view.paths_dropped.connect(self.add_queue_paths)
+        self.job_worker = None
+        
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(REFRESH_INTERVAL)
+        self.job_timer.timeout.connect(self.flush_job_results)
+        
+        buttons_layout = QHBoxLayout()
+        buttons_layout.setSpacing(8)
+        self.add_files_button = ModernButton("Add Files")
+        self.add_files_button.clicked.connect(self.select_queue_files)
+        self.add_folder_button = ModernButton("Add Folder")
+        self.add_folder_button.clicked.connect(self.select_queue_folder)
+        self.clear_queue_button = ModernButton("Clear Queue")
+        self.clear_queue_button.setObjectName("clearButton")
+        self.clear_queue_button.clicked.connect(self.clear_queue)
+        self.encode_queue_button = ModernButton("Encode Queue")
+        self.encode_queue_button.clicked.connect(self.encode_queue)
+        for button in [self.add_files_button, self.add_folder_button, self.clear_queue_button]:
+            buttons_layout.addWidget(button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.encode_queue_button)
+        
+        self.queue_summary = QLabel()
+        
+        parent_layout.addWidget(self.job_view, 1)
+        parent_layout.addWidget(self.queue_summary)
+        parent_layout.addLayout(buttons_layout)
+
+    def select_queue_files(self):
+        filenames, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Select Python Files",
+            "",
+            "Python Files (*.py);;All Files (*.*)"
+        )
+        if filenames:
+            self.add_queue_paths(filenames)
+
+    def select_queue_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if directory:
+            self.add_queue_paths([directory])
+
+    def add_queue_paths(self, paths):
+        from batch import collect_jobs
+        from encoder import EncodeError
+        
+        self.ensure_tab(self.output_tab)
+        try:
+            jobs = collect_jobs(paths, self.output_dir.text() or None, existing=self.job_model.jobs())
+        except EncodeError as e:
+            QMessageBox.critical(self, e.title, e.message)
+            return
+        self.job_model.add_jobs(jobs)
+        self.update_queue_summary()
+
+    def clear_queue(self):
+        if self.job_worker is not None:
+            return
+        self.job_model.clear()
+        self.update_queue_summary()
+
+    def update_queue_summary(self):
+        counts = self.job_model.counts()
+        self.queue_summary.setText(self.tr('queue_summary').format(
+            total=self.job_model.rowCount(), **counts))
+
+    def encode_queue(self):
+        from jobtable import BatchWorker
+        
+        if self.job_worker is not None:
+            return
+        jobs = self.job_model.pending_jobs()
+        if not jobs:
+            return
+        self.job_model.mark_running(jobs)
+        self.job_worker = BatchWorker(jobs, self.get_options(), self)
+        self.job_worker.finished.connect(self.finish_queue)
+        self.encode_queue_button.setEnabled(False)
+        self.clear_queue_button.setEnabled(False)
+        self.job_timer.start()
+        self.job_worker.start()
+        self.update_queue_summary()
+
+    def flush_job_results(self):
+        results = self.job_worker.take_results() if self.job_worker else []
+        if results:
+            self.job_model.apply_results(results)
+            self.update_queue_summary()
+
+    def finish_queue(self):
+        self.flush_job_results()
+        worker, self.job_worker = self.job_worker, None
+        self.job_timer.stop()
+        self.encode_queue_button.setEnabled(True)
+        self.clear_queue_button.setEnabled(True)
+        # Задачи, до которых пакет не дошёл из-за ошибки, помечаются как неудачные и попадут в следующий запуск
+        self.job_model.apply_results([{'input': input_path, 'ok': False, 'error': worker.error}
+                                      for input_path, _ in worker.jobs
+                                      if self.job_model.status(input_path) == 'running'])
+        self.update_queue_summary()
+        if worker.error:
+            QMessageBox.critical(self, "Error", worker.error)
+        else:
+            self.statusBar.showMessage(self.tr('queue_finished'), 5000)
+
     def toggle_exe_options(self, state):
         for widget in [self.icon_path, self.hide_console, self.one_file,
                       self.uac_admin, self.add_version, self.version_number,
@@ -821,6 +862,7 @@ class EncoderApp(QMainWindow):
             self.icon_path.setText(filename)
 
     def get_output_path(self, input_path):
+        self.ensure_tab(self.output_tab)
         if self.output_filename.text():
             filename = self.output_filename.text()
         else:
@@ -834,6 +876,8 @@ class EncoderApp(QMainWindow):
         return os.path.join(output_dir, filename + '.py')
 
     def compile_to_executable(self, script_path):
+        import subprocess
+        
         try:
             cmd = ['pyinstaller', '--noconfirm', '--clean']
             
@@ -913,109 +957,97 @@ class EncoderApp(QMainWindow):
             self.input_path.setText(filename)
             self.statusBar.showMessage(f"Selected file: {os.path.basename(filename)}")
             
-    def generate_junk_code(self, size):
-        junk = []
-        variables = [f"var_{i}" for i in range(random.randint(5, 10))]
-        functions = [f"func_{i}" for i in range(random.randint(3, 7))]
-        
-        for _ in range(size):
-            choice = random.randint(1, 4)
-            if choice == 1:
-                var = random.choice(variables)
-                value = random.choice([
-                    str(random.randint(-1000, 1000)),
-                    f'"{self.generate_random_string(10)}"',
-                    f"[{', '.join([str(random.randint(0, 100)) for _ in range(3)])}]",
-                    f"{{{', '.join([f'{random.randint(0, 100)}: {random.randint(0, 100)}' for _ in range(2)])}}}"
-                ])
-                junk.append(f"{var} = {value}")
-            elif choice == 2:
-                var = random.choice(variables)
-                junk.append(f"if {var}:")
-                junk.append(f"    pass")
-            elif choice == 3:
-                func = random.choice(functions)
-                args = ', '.join(random.sample(variables, random.randint(0, 3)))
-                junk.append(f"def {func}({args}):")
-                junk.append(f"    return None")
-            elif choice == 4:
-                var = random.choice(variables)
-                junk.append(f"for _ in range({random.randint(1, 5)}):")
-                junk.append(f"    {var} = {random.randint(0, 100)}")
-        
-        return '\n'.join(junk)
-    
-    def generate_random_string(self, length):
-        return ''.join(random.choice(string.ascii_letters) for _ in range(length))
-    
-    def encrypt_strings(self, content):
-        def encode_string(match):
-            s = match.group(1)
-            encoded = ''.join(chr(ord(c) ^ 42) for c in s)
-            return f"'{''.join(f'\\x{ord(c):02x}' for c in encoded)}'"
+    def get_options(self):
+        from encoder import make_options, with_cipher_salt
+        
+        options = make_options(
+            **{option: box.isChecked() for option, box in self.stage_boxes.items()},
+            use_compile=self.use_compile.isChecked(),
+            use_encryption=self.use_encryption.isChecked(),
+            use_junk=self.use_junk.isChecked(),
+            use_rename=self.use_rename.isChecked(),
+            use_compress=self.use_compress.isChecked(),
+            layers=self.layers_spin.value(),
+            junk_size=self.junk_spin.value(),
+            junk_bytes=self.junk_bytes_spin.value() * 1024,
+            zlib_segments=self.segments_spin.value(),
+            optimize_level=self.optimize_level_spin.value(),
+            strip_docstrings=self.strip_docstrings.isChecked(),
+            strip_debug=self.strip_debug.isChecked(),
+            strip_lines=self.strip_lines.isChecked(),
+            prune_constants=self.prune_constants.isChecked(),
+            lazy_constants=self.lazy_constants.isChecked(),
+            traceback_map=self.traceback_map.isChecked(),
+            deterministic=self.deterministic.isChecked(),
+            seed_key=self.seed_key.text(),
+            shared_runtime=self.shared_runtime.isChecked(),
+            prefetch=self.shared_runtime.isChecked() and self.prefetch.isChecked(),
+            use_cipher=self.use_cipher.isChecked(),
+            cipher_key=self.cipher_key.text(),
+            interpreters=self.interpreters.text(),
+            verify=self.verify.isChecked(),
+            profile_hooks=self.profile_hooks.isChecked(),
+        )
+        return with_cipher_salt(options, None if options['deterministic'] else self.cipher_salt)
+
+    def apply_options(self, options):
+        from tuner import STAGE_KEYS
         
-        return re.sub(r"'([^']*)'", encode_string, content)
+        for key in STAGE_KEYS:
+            widget = self.stage_boxes.get(key) or getattr(self, key, None)
+            if widget is not None:
+                widget.setChecked(options[key])
     
-    def rename_variables(self, content):
-        class VariableRenamer(ast.NodeTransformer):
-            def __init__(self):
-                self.counter = 0
-                self.mapping = {}
-            
-            def visit_Name(self, node):
-                if isinstance(node.ctx, ast.Store):
-                    if node.id not in self.mapping:
-                        self.mapping[node.id] = f"var_{self.counter}"
-                        self.counter += 1
-                return ast.Name(id=self.mapping.get(node.id, node.id), ctx=node.ctx)
+    def stage_memo(self):
+        from memo import StageMemo
         
-        try:
-            tree = ast.parse(content)
-            transformer = VariableRenamer()
-            transformed = transformer.visit(tree)
-            return ast.unparse(transformed)
-        except:
-            return content
+        if self.memo is None:
+            self.memo = StageMemo()
+        return self.memo
+    
+    def schedule_preview(self, *args):
+        self.preview_timer.start()
+    
+    def start_preview(self):
+        input_path = self.input_path.text()
+        if not input_path or not os.path.isfile(input_path):
+            self._preview_report = None
+            self.preview_label.clear()
+            return
+        # Один расчёт за раз: изменения во время расчёта дают ещё один, с последними опциями
+        if self.preview_worker is not None:
+            self._preview_pending = True
+            return
+        self.preview_worker = PreviewWorker(input_path, self.get_options(), self.stage_memo(), self)
+        self.preview_worker.ready.connect(self.show_preview)
+        self.preview_worker.finished.connect(self.finish_preview)
+        self.preview_worker.start()
+    
+    def finish_preview(self):
+        self.preview_worker = None
+        if self._preview_pending:
+            self._preview_pending = False
+            self.start_preview()
     
-    def generate_decoder(self):
-        imports = []
-        decode_steps = []
-        
-        if self.use_marshal.isChecked():
-            imports.append("import marshal")
-        if self.use_base64.isChecked():
-            imports.append("import base64")
-        if self.use_zlib.isChecked():
-            imports.append("import zlib")
-        if self.use_binascii.isChecked():
-            imports.append("import binascii")
-        
-        decoder = "# -*- coding: utf-8 -*-\n"
-        decoder += "\n".join(imports) + "\n\n"
-        decoder += "def decode(encoded):\n"
-        decoder += "    try:\n"
-        
-        if self.use_base64.isChecked():
-            decode_steps.append("        encoded = base64.b85decode(encoded)")
-        
-        if self.use_binascii.isChecked():
-            decode_steps.append("        encoded = binascii.unhexlify(encoded)")
-        
-        if self.use_zlib.isChecked():
-            decode_steps.append("        encoded = zlib.decompress(encoded)")
-        
-        if self.use_marshal.isChecked():
-            decode_steps.append("        encoded = marshal.loads(encoded)")
-        
-        decoder += "\n".join(decode_steps)
-        decoder += "\n        return encoded"
-        decoder += "\n    except Exception as e:"
-        decoder += '\n        print("Decoding error:", str(e))'
-        decoder += "\n        return None"
-        
-        return decoder
+    def show_preview(self, report):
+        self._preview_report = report
+        if 'error' in report:
+            self.preview_label.setText(f"{self.tr('preview')} {report['error']}")
+            return
+        self.preview_label.setText(f"{self.tr('preview')} " + self.tr('preview_text').format(
+            size=report['size'], time=report['estimated_time'] * 1000,
+            cached=report['cached'], steps=report['steps']))
+    
+    def generate_decoder(self, rng=None):
+        from encoder import generate_decoder
+        
+        return generate_decoder(self.get_options(), rng)
     
     def encode_file(self):
+        from encoder import backup_file
+        
+        if self.tuner_worker is not None:
+            return
         input_path = self.input_path.text()
         if not input_path or not os.path.exists(input_path):
             QMessageBox.critical(self, "Error", "Please select an input file!")
@@ -1029,74 +1061,98 @@ class EncoderApp(QMainWindow):
                     QMessageBox.critical(self, "Error", "Output file already exists!")
                     return
                 if self.create_backup.isChecked():
-                    backup_path = output_path + '.bak'
-                    if os.path.exists(backup_path):
-                        os.remove(backup_path)
-                    os.rename(output_path, backup_path)
-            
-            with open(input_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
+                    backup_file(output_path, output_path + '.bak')
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Unexpected error during encoding:\n{str(e)}")
+            return
+        
+        objective = self.optimize_combo.currentData()
+        if objective == 'off':
+            self.write_encoded(input_path, output_path)
+            return
+        # Перебор идёт в фоновом потоке: окно не замирает, а кодирование продолжится по его окончании
+        self.statusBar.showMessage(self.tr('optimize_running'))
+        self.encode_button.setEnabled(False)
+        self.tuner_worker = TunerWorker(input_path, output_path, self.get_options(), objective, self)
+        self.tuner_worker.finished.connect(self.finish_tuning)
+        self.tuner_worker.start()
+    
+    def finish_tuning(self):
+        worker, self.tuner_worker = self.tuner_worker, None
+        self.encode_button.setEnabled(True)
+        if worker.error:
+            QMessageBox.critical(self, *worker.error)
+            return
+        self.apply_options(worker.results[0]['options'])
+        self.write_encoded(worker.input_path, worker.output_path, worker.results)
+    
+    def write_encoded(self, input_path, output_path, results=None):
+        import html
+        from encoder import (EncodeError, verify_output, open_source, output_chunks, atomic_open, make_rng,
+                             bytecode_shrinking_enabled, measure_bytecode_savings,
+                             output_footer, write_runtime, extract_imports)
+        from stages import active_stages
+        from memo import encode_memoized
+        from tracemap import write_build_map
+        from tuner import format_report
+        
+        try:
+            report = format_report(results) if results else []
             try:
-                compile(content, '<string>', 'exec')
-            except SyntaxError as e:
-                QMessageBox.critical(self, "Syntax Error", f"Source file contains an error:\n{str(e)}")
+                options = self.get_options()
+                symbols = {} if options['traceback_map'] else None
+                with open_source(input_path) as content:
+                    encoded, code = encode_memoized(self.stage_memo(), content, options, symbols=symbols)
+                    rng = make_rng(options, content)
+                    imports = extract_imports(content) if options['prefetch'] else ()
+                    if options['use_marshal'] and bytecode_shrinking_enabled(options):
+                        savings = measure_bytecode_savings(content, options)
+                    else:
+                        savings = None
+            except EncodeError as e:
+                QMessageBox.critical(self, e.title, e.message)
                 return
             
-            if self.use_marshal.isChecked():
-                try:
-                    encoded = marshal.dumps(compile(content, '<string>', 'exec'))
-                except Exception as e:
-                    QMessageBox.critical(self, "Marshal Error", f"Error using marshal: {str(e)}")
-                    return
-            else:
-                encoded = content.encode()
-            
-            if self.use_zlib.isChecked():
-                try:
-                    encoded = zlib.compress(encoded, level=9 if self.use_compress.isChecked() else 6)
-                except Exception as e:
-                    QMessageBox.critical(self, "Zlib Error", f"Compression error: {str(e)}")
-                    return
-            
-            if self.use_binascii.isChecked():
+            # Как в пакетном режиме: проверяется результат в памяти, и при ошибке на диск ничего не пишется
+            chunks = list(output_chunks(self.generate_decoder(rng), encoded, output_footer(options, imports)))
+            if options['verify']:
                 try:
-                    encoded = binascii.hexlify(encoded)
-                except Exception as e:
-                    QMessageBox.critical(self, "Binascii Error", f"Error using binascii: {str(e)}")
+                    verify_output(b''.join(chunks), options, code)
+                except EncodeError as e:
+                    QMessageBox.critical(self, e.title, e.message)
                     return
-            
-            if self.use_base64.isChecked():
-                try:
-                    encoded = base64.b85encode(encoded)
-                except Exception as e:
-                    QMessageBox.critical(self, "Base64 Error", f"Error encoding base64: {str(e)}")
-                    return
-            
-            decoder = self.generate_decoder()
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(decoder)
-                f.write('\n\nencoded = ' + repr(encoded) + '\n\n')
-                f.write('result = decode(encoded)\n')
-                f.write('if result is not None:\n')
-                f.write('    exec(result)')
+            with atomic_open(output_path) as f:
+                f.writelines(chunks)
+            if options['shared_runtime']:
+                runtime_path = write_runtime(os.path.dirname(os.path.abspath(output_path)))
+            if symbols:
+                map_path = write_build_map(os.path.dirname(os.path.abspath(output_path)),
+                                           [{**symbols, 'path': input_path}])
             
             self.result_text.clear()
+            if report:
+                self.result_text.append(f"{self.tr('optimize_winner')} {results[0]['stages']}")
+                self.result_text.append('<pre>' + html.escape('\n'.join(report)) + '</pre>')
             self.result_text.append("✅ File successfully encoded!")
             self.result_text.append(f"📁 Result saved to: {output_path}")
-            self.result_text.append(f"🔄 Encoding methods applied: {sum([
-                self.use_marshal.isChecked(),
-                self.use_zlib.isChecked(),
-                self.use_base64.isChecked(),
-                self.use_binascii.isChecked()
-            ])}")
+            if options['verify']:
+                self.result_text.append(self.tr('output_verified'))
+            self.result_text.append(f"🔄 Encoding methods applied: {len(active_stages(options))}")
             self.result_text.append(f"📊 Source file size: {os.path.getsize(input_path):,} bytes")
             self.result_text.append(f"📊 Encoded file size: {os.path.getsize(output_path):,} bytes")
+            if options['shared_runtime']:
+                self.result_text.append(f"{self.tr('runtime_saved')} {runtime_path}")
+            if symbols:
+                self.result_text.append(f"{self.tr('traceback_map_saved')} {map_path}")
+            if savings:
+                self.result_text.append(f"{self.tr('bytecode_size_saved')} {savings['marshal_size_saved']:,} "
+                                        f"{self.tr('bytes')} ({savings['marshal_size']:,} {self.tr('bytes')})")
+                self.result_text.append(f"{self.tr('loads_time_saved')} {savings['loads_time_saved'] * 1000:.3f} ms "
+                                        f"({savings['loads_time'] * 1000:.3f} ms)")
             
             self.statusBar.showMessage("Encoding completed successfully!", 5000)
             
-            if self.compile_to_exe.isChecked():
+            if self.exe_tab not in self._lazy_tabs and self.compile_to_exe.isChecked():
                 self.compile_to_executable(output_path)
             
         except Exception as e:
@@ -1107,6 +1163,8 @@ class EncoderApp(QMainWindow):
         self.result_text.clear()
         self.layers_spin.setValue(1)
         self.junk_spin.setValue(100)
+        self.junk_bytes_spin.setValue(0)
+        self.segments_spin.setValue(0)
         self.statusBar.showMessage("All fields cleared", 3000)
 
     def create_buttons(self, parent_layout):
@@ -1118,23 +1176,7 @@ class EncoderApp(QMainWindow):
         self.encode_button.clicked.connect(self.encode_with_animation)
         
         self.clear_button = ModernButton("Clear")
-        self.clear_button.setStyleSheet("""
-            QPushButton {
-                background-color: #555555;
-                border: none;
-                border-radius: 8px;
-                color: white;
-                padding: 8px 16px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #666666;
-            }
-            QPushButton:pressed {
-                background-color: #444444;
-            }
-        """)
+        self.clear_button.setObjectName("clearButton")
         self.clear_button.clicked.connect(self.clear_all)
         
         buttons_layout.addWidget(self.encode_button)
@@ -1143,8 +1185,77 @@ class EncoderApp(QMainWindow):
         
         parent_layout.addLayout(buttons_layout)
 
+class PreviewWorker(QThread):
+    ready = Signal(object)
+    
+    def __init__(self, input_path, options, memo, parent=None):
+        super().__init__(parent)
+        self.input_path = input_path
+        self.options = options
+        self.memo = memo
+    
+    def run(self):
+        from encoder import EncodeError, open_source, generate_decoder, output_chunks, output_footer
+        from memo import encode_memoized
+        
+        report = {}
+        try:
+            with open_source(self.input_path) as content:
+                encoded, _ = encode_memoized(self.memo, content, self.options, report=report)
+            report['size'] = sum(len(chunk) for chunk in output_chunks(generate_decoder(self.options), encoded,
+                                                                       output_footer(self.options)))
+        except EncodeError as e:
+            report = {'error': e.message.splitlines()[-1]}
+        except Exception as e:
+            report = {'error': str(e)}
+        self.ready.emit(report)
+
+class TunerWorker(QThread):
+    def __init__(self, input_path, output_path, options, objective, parent=None):
+        super().__init__(parent)
+        self.input_path = input_path
+        self.output_path = output_path
+        self.options = options
+        self.objective = objective
+        self.results = None
+        self.error = None
+    
+    def run(self):
+        import multiprocessing
+        from encoder import EncodeError
+        from tuner import optimize
+        
+        # fork из процесса с потоками Qt небезопасен: кандидаты замеряются в процессах spawn
+        try:
+            self.results = optimize(self.input_path, self.options, self.objective,
+                                    mp_context=multiprocessing.get_context('spawn'))
+        except EncodeError as e:
+            self.error = (e.title, e.message)
+        except Exception as e:
+            self.error = ("Error", str(e))
+
+class FirstPaintProbe(QObject):
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+    
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            print(f"first_paint={time.time():.6f}", flush=True)
+            QTimer.singleShot(0, self.app.quit)
+            self.app.removeEventFilter(self)
+        return False
+
 def main():
+    import multiprocessing
+    
+    # Очередь запускает рабочие процессы через spawn, в том числе из собранного EXE
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
+    # bench.py startup: сообщить время первой отрисовки окна и выйти
+    if os.environ.get('SE_STARTUP_PROBE'):
+        probe = FirstPaintProbe(app)
+        app.installEventFilter(probe)
     window = EncoderApp()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,155 @@
+import os
+import gc
+import sys
+import bisect
+import ctypes
+import ctypes.util
+
+from stages import active_stages
+
+MB = 1024 * 1024
+
+# Исходник, AST и объекты кода, marshal, литерал результата и проверка декодированием, в долях исходника
+BASE_FACTOR = 8.0
+# Временная память ступени в долях её входа, если ступень не заявила свою
+STAGE_MEMORY = 2.0
+# Постоянная часть: модули encoder и мелкие объекты задания
+JOB_OVERHEAD = 8 * MB
+
+# Замеры по маленьким файлам - в основном шум постоянной части
+FEEDBACK_MIN_SIZE = 1 * MB
+FEEDBACK_MARGIN = 1.2
+
+# После меньшего пика память не возвращается системе: gc и malloc_trim на каждом мелком файле дороже
+RELEASE_THRESHOLD = 64 * MB
+
+# Доля доступной памяти, которую пакет занимает по умолчанию
+DEFAULT_BUDGET_SHARE = 0.75
+
+def estimate_factor(options):
+    # Пик задания на байт исходника: ступени работают по очереди, их временные буферы
+    # не живут одновременно, но нагрузка и текущий вход остаются в памяти
+    factor = BASE_FACTOR
+    size = 1.0
+    for stage in active_stages(options):
+        if stage.encode is None:
+            continue
+        factor += size * (stage.memory or STAGE_MEMORY)
+        size *= stage.ratio or 1.0
+    return factor
+
+def available_memory():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def default_budget():
+    available = available_memory()
+    return int(available * DEFAULT_BUDGET_SHARE) if available else None
+
+def _status_field(name):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(name):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak_memory():
+    # Linux: "5" в clear_refs сбрасывает VmHWM, и пик меряется для одного задания, а не для процесса
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return None
+    return _status_field('VmRSS:')
+
+def peak_memory(base):
+    if base is None:
+        return None
+    peak = _status_field('VmHWM:')
+    return None if peak is None else max(peak - base, 0)
+
+_libc = None
+
+def release_memory(peak=None):
+    # Освобождённые большие буферы glibc держит в куче: без malloc_trim простаивающий
+    # процесс занимал бы пик прошлого задания, а следующий замер был бы занижен
+    global _libc
+    if peak is not None and peak < RELEASE_THRESHOLD:
+        return
+    gc.collect()
+    if not sys.platform.startswith('linux'):
+        return
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c'))
+            _libc.malloc_trim
+        except (OSError, AttributeError, TypeError):
+            _libc = False
+    if _libc:
+        _libc.malloc_trim(0)
+
+class MemoryScheduler:
+    def __init__(self, options, budget=None, slots=1):
+        self.budget = budget
+        self.slots = max(slots, 1)
+        self.factor = estimate_factor(options)
+        self.measured = None
+        self.reserved = 0
+        self.running = {}
+        self._sizes = []
+        self._jobs = []
+
+    def estimate(self, size):
+        return JOB_OVERHEAD + int(self.factor * size)
+
+    def add(self, jobs):
+        # Очередь по возрастанию размера: самое большое подходящее задание ищется двоичным поиском
+        self._jobs.extend(jobs)
+        self._jobs.sort(key=lambda item: item[1])
+        self._sizes = [size for _, size in self._jobs]
+
+    def pending(self):
+        return len(self._jobs)
+
+    def take(self):
+        started = []
+        while self._jobs and len(self.running) < self.slots:
+            if self.budget is None:
+                index = len(self._jobs) - 1
+            else:
+                free = self.budget - self.reserved - JOB_OVERHEAD
+                index = bisect.bisect_right(self._sizes, free / self.factor) - 1 if free >= 0 else -1
+                if index < 0:
+                    if self.running:
+                        break
+                    # Не помещается даже в пустой бюджет: идёт одно, самое большое
+                    index = len(self._jobs) - 1
+            job, size = self._jobs.pop(index)
+            del self._sizes[index]
+            estimate = self.estimate(size)
+            self.running[job] = (size, estimate)
+            self.reserved += estimate
+            started.append(job)
+        return started
+
+    def finish(self, job, peak=None):
+        size, estimate = self.running.pop(job)
+        self.reserved -= estimate
+        if peak is None or size < FEEDBACK_MIN_SIZE:
+            return
+        # Все задания пакета идут с одними опциями: оценка заменяется худшим измеренным пиком с запасом
+        observed = max(peak - JOB_OVERHEAD, 0) / size
+        self.measured = observed if self.measured is None else max(self.measured, observed)
+        self.factor = max(self.measured * FEEDBACK_MARGIN, 1.0)
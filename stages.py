@@ -0,0 +1,346 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import threading
+import base64
+import binascii
+import importlib
+
+# Реестр ступеней кодирования. Конвейер, декодер, общий рантайм, подбор методов,
+# бенчмарк и флажки интерфейса строятся по одному списку STAGES.
+# Модуль лёгкий: интерфейс читает его при запуске, не импортируя кодировщик.
+
+CIPHER_KEY_SIZE = 32
+CIPHER_NONCE_SIZE = 16
+CIPHER_SALT_SIZE = 16
+CIPHER_CHUNK = 1024 * 1024
+CIPHER_KEY_ENV = 'SE_PAYLOAD_KEY'
+# PBKDF2-HMAC-SHA256: десятки миллисекунд один раз на процесс (соль общая на пакет или сеанс),
+# а перебор паролей по словарю дорожает во столько же раз. Число итераций пишется в заголовок
+# и может расти без смены формата
+CIPHER_KDF_ITERATIONS = 200_000
+
+# Расшифровка для декодера и рантайма. Заголовок: 0 + ключ + nonce (ключ в файле) или
+# 1 + итерации + соль + nonce (ключ из пароля в переменной окружения). Файлы различает nonce,
+# соль у файлов одного пакета общая. Гамма shake_128 по блокам, XOR целого блока через int,
+# без циклов по байтам. Кодировщик шифрует той же _keystream_xor, что исполняется здесь.
+CIPHER_SOURCE = f'''
+# Кэш на весь процесс: автономные модули несут по своей копии этого кода, но делят ключи
+_CIPHER_KEYS = sys.__dict__.setdefault('_se_cipher_keys', {{}})
+
+def _cipher_key(passphrase, salt, iterations):
+    cache_key = (passphrase, salt, iterations)
+    if cache_key not in _CIPHER_KEYS:
+        _CIPHER_KEYS[cache_key] = hashlib.pbkdf2_hmac('sha256', passphrase.encode('utf-8'), salt, iterations)
+    return _CIPHER_KEYS[cache_key]
+
+def _keystream_xor(data, key, nonce):
+    view = memoryview(data)
+    chunks = []
+    for offset in range(0, len(view), {CIPHER_CHUNK}):
+        block = view[offset:offset + {CIPHER_CHUNK}]
+        stream = hashlib.shake_128(key + nonce + offset.to_bytes(8, 'little')).digest(len(block))
+        chunks.append((int.from_bytes(block, 'little') ^ int.from_bytes(stream, 'little')).to_bytes(len(block), 'little'))
+    return b''.join(chunks)
+
+def _decrypt(data):
+    view = memoryview(data)
+    if view[0]:
+        salt = bytes(view[5:{CIPHER_SALT_SIZE + 5}])
+        key = _cipher_key(os.environ[{CIPHER_KEY_ENV!r}], salt, int.from_bytes(view[1:5], 'big'))
+        view = view[{CIPHER_SALT_SIZE + 5}:]
+    else:
+        key = bytes(view[1:{CIPHER_KEY_SIZE + 1}])
+        view = view[{CIPHER_KEY_SIZE + 1}:]
+    return _keystream_xor(view[{CIPHER_NONCE_SIZE}:], key, bytes(view[:{CIPHER_NONCE_SIZE}]))
+'''
+
+_cipher_namespace = {}
+exec('import os\nimport sys\nimport hashlib\n' + CIPHER_SOURCE, _cipher_namespace)
+keystream_xor = _cipher_namespace['_keystream_xor']
+cipher_key = _cipher_namespace['_cipher_key']
+
+B85_ALPHABET = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!#$%&()*+-;<=>?@^_`{|}~"
+
+# base64.b85decode написан на Python и обходит группы по одной. Здесь цифры раскладываются
+# по 32-битным полосам одного большого int (срезы bytearray с шагом), и все группы
+# собираются за пять умножений.
+B85_SOURCE = f'''
+_B85_ALPHABET = {B85_ALPHABET!r}
+_B85_TABLE = bytes.maketrans(_B85_ALPHABET, bytes(range(85)))
+# Цифры 2**32 - 1: цифры одинаковой длины сравниваются как числа
+_B85_MAX = b'|NsC0'.translate(_B85_TABLE)
+
+def _b85decode(data):
+    data = bytes(data)
+    if data.translate(None, _B85_ALPHABET):
+        raise ValueError('bad base85 character')
+    padding = -len(data) % 5
+    digits = (data + b'~' * padding).translate(_B85_TABLE)
+    # Группа больше 2**32 - 1 молча перенесла бы разряд в соседнюю. Старшая цифра 83-84 - всегда
+    # переполнение, меньше 82 - никогда; целиком сравниваются только редкие группы со старшей цифрой 82
+    heads = digits[::5]
+    overflow = len(heads)
+    if heads.translate(None, bytes(range(83))):
+        overflow = min(index for index in (heads.find(83), heads.find(84)) if index >= 0)
+    index = heads.find(82, 0, overflow)
+    while index >= 0:
+        if digits[5 * index:5 * index + 5] > _B85_MAX:
+            overflow = index
+            break
+        index = heads.find(82, index + 1, overflow)
+    if overflow < len(heads):
+        raise ValueError('base85 overflow in hunk starting at byte %d' % (5 * overflow))
+    count = len(digits) // 5
+    lane = bytearray(4 * count)
+    value = 0
+    for k in range(5):
+        lane[3::4] = digits[k::5]
+        value += int.from_bytes(lane, 'big') * 85 ** (4 - k)
+    return value.to_bytes(4 * count, 'big')[:4 * count - padding]
+'''
+
+def encrypt_payload(data, options, material):
+    key, nonce = material[:CIPHER_KEY_SIZE], material[CIPHER_KEY_SIZE:]
+    if options['cipher_key']:
+        # Соль пакета из опций; без неё ключевая часть material становится солью файла
+        salt = bytes.fromhex(options['cipher_salt']) or key[:CIPHER_SALT_SIZE]
+        header = b'\1' + CIPHER_KDF_ITERATIONS.to_bytes(4, 'big') + salt + nonce
+        key = cipher_key(options['cipher_key'], salt, CIPHER_KDF_ITERATIONS)
+    else:
+        header = b'\0' + key + nonce
+    return header + keystream_xor(data, key, nonce)
+
+
+# Перед сжатыми данными - id словаря: общий рантайм каталога хранит словари всех пакетов,
+# закодированных в него, и новый пакет не отнимает словарь у прежних модулей
+ZDICT_ID_SIZE = 8
+
+ZDICT_SOURCE = f'''
+def _inflate_zdict(data):
+    inflater = zlib.decompressobj(zdict=ZDICTS[bytes(data[:{ZDICT_ID_SIZE}]).hex()])
+    return inflater.decompress(data[{ZDICT_ID_SIZE}:]) + inflater.flush()
+'''
+
+def zdict_id(zdict):
+    return hashlib.blake2b(zdict, digest_size=ZDICT_ID_SIZE).digest()
+
+# Сегменты сжаты независимо и распаковываются в потоках: zlib.decompress отпускает GIL.
+# Заголовок: число сегментов, затем для каждого размер до и после сжатия (big-endian, по 4 байта).
+# Все сегменты пишутся в один заранее выделенный bytearray, который целиком уходит в marshal.loads.
+SEGMENTS_SOURCE = '''
+def _inflate_segments(data):
+    count = int.from_bytes(data[:4], 'big')
+    view = memoryview(data)
+    jobs = []
+    start = 0
+    offset = 4 + 8 * count
+    for index in range(count):
+        entry = 4 + 8 * index
+        raw = int.from_bytes(data[entry:entry + 4], 'big')
+        packed = int.from_bytes(data[entry + 4:entry + 8], 'big')
+        jobs.append((start, raw, offset, packed))
+        start += raw
+        offset += packed
+    out = bytearray(start)
+    errors = []
+
+    def inflate(part):
+        try:
+            for start, raw, offset, packed in part:
+                out[start:start + raw] = zlib.decompress(view[offset:offset + packed], bufsize=raw or 1)
+        except Exception as e:
+            errors.append(e)
+
+    workers = min(count, os.cpu_count() or 1)
+    threads = [threading.Thread(target=inflate, args=(jobs[index::workers],)) for index in range(1, workers)]
+    for thread in threads:
+        thread.start()
+    inflate(jobs[::workers])
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return out
+'''
+
+STAGE_NAME_RE = re.compile(r'[a-z0-9]+')
+
+# Модули со сторонними ступенями, через запятую; импортируются вместе с этим модулем
+STAGE_PLUGINS_ENV = 'SE_STAGE_PLUGINS'
+
+class CodecStage:
+    # encode(data, options, context) -> bytes, context: zdict и material текущего файла.
+    # decode - выражение, которое вызывается в декодере и рантайме; source определяет его помощников.
+    # throughput (МБ/с распаковки) и ratio (выход/вход) - заявленная цена, measure_stage её уточняет.
+    # memory - пик временной памяти кодирования в долях входа, по нему пакет оценивает задания.
+    # depends - опции и поля context, от которых зависит результат encode, кроме входа;
+    # None - неизвестно, и кэш интерфейса считает зависимостью все опции.
+    def __init__(self, name, option, order, decode, encode=None, imports=(), source='', label=None,
+                 default=False, when=None, standalone=True, ui=True, tunable=True, extra_options=(),
+                 describe=None, throughput=None, ratio=None, memory=None, depends=None):
+        self.name = name
+        self.option = option
+        self.order = order
+        self.decode = decode
+        self.encode = encode
+        self.imports = tuple(imports)
+        self.source = source
+        self.label = label or name
+        self.default = default
+        self.when = when
+        self.standalone = standalone
+        self.ui = ui
+        self.tunable = tunable
+        self.extra_options = tuple(extra_options)
+        self.describe = describe
+        self.throughput = throughput
+        self.ratio = ratio
+        self.memory = memory
+        self.depends = None if depends is None else tuple(depends)
+
+    def enabled(self, options):
+        return bool(options.get(self.option)) and (self.when is None or self.when(options))
+
+    def __repr__(self):
+        return f"CodecStage({self.name!r}, {self.option!r}, order={self.order})"
+
+STAGES = []
+
+def register_stage(stage):
+    if not STAGE_NAME_RE.fullmatch(stage.name):
+        raise ValueError(f"Invalid stage name: {stage.name!r}")
+    if any(existing.name == stage.name for existing in STAGES):
+        raise ValueError(f"Stage already registered: {stage.name}")
+    STAGES.append(stage)
+    return stage
+
+def find_stage(name):
+    for stage in STAGES:
+        if stage.name == name:
+            return stage
+    raise KeyError(name)
+
+def active_stages(options):
+    # Порядок кодирования; декодер проходит этот список с конца
+    return sorted((stage for stage in STAGES if stage.enabled(options)), key=lambda stage: stage.order)
+
+def ui_stages():
+    return [stage for stage in STAGES if stage.ui]
+
+def tunable_stages():
+    return [stage for stage in STAGES if stage.tunable]
+
+def stage_decoder(stage, zdict=b''):
+    namespace = {'ZDICTS': {zdict_id(zdict).hex(): zdict}}
+    exec(''.join(f'import {module}\n' for module in stage.imports) + stage.source, namespace)
+    return eval(stage.decode, namespace)
+
+def measure_stage(stage, sample, options, context=None, repeats=3):
+    context = context or {}
+    decode = stage_decoder(stage, context.get('zdict') or b'')
+    encode_time = decode_time = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encoded = stage.encode(sample, options, context)
+        elapsed = time.perf_counter() - start
+        encode_time = elapsed if encode_time is None else min(encode_time, elapsed)
+        start = time.perf_counter()
+        decoded = decode(encoded)
+        elapsed = time.perf_counter() - start
+        decode_time = elapsed if decode_time is None else min(decode_time, elapsed)
+    if decoded != sample:
+        raise ValueError(f"Stage {stage.name} does not round-trip")
+    megabytes = len(sample) / (1024 * 1024)
+    return {
+        'encode_throughput': megabytes / (encode_time or 1e-9),
+        'throughput': megabytes / (decode_time or 1e-9),
+        'ratio': len(encoded) / (len(sample) or 1),
+    }
+
+def zlib_level(options):
+    return 9 if options['use_compress'] else 6
+
+def _encode_zlib(data, options, context):
+    return zlib.compress(data, level=zlib_level(options))
+
+def _encode_zdict(data, options, context):
+    compressor = zlib.compressobj(zlib_level(options), zdict=context['zdict'])
+    return zdict_id(context['zdict']) + compressor.compress(data) + compressor.flush()
+
+def _encode_segments(data, options, context):
+    view = memoryview(data)
+    count = max(min(options.get('zlib_segments') or 1, len(view)), 1)
+    size = -(-len(view) // count)
+    level = zlib_level(options)
+    parts = [view[start:start + size] for start in range(0, len(view), size)] or [view]
+    # Сжатие тоже идёт в потоках: zlib.compress отпускает GIL
+    results = [None] * len(parts)
+
+    def deflate(indexes):
+        for index in indexes:
+            results[index] = zlib.compress(parts[index], level)
+
+    workers = min(len(parts), os.cpu_count() or 1)
+    threads = [threading.Thread(target=deflate, args=(range(index, len(parts), workers),))
+               for index in range(1, workers)]
+    for thread in threads:
+        thread.start()
+    deflate(range(0, len(parts), workers))
+    for thread in threads:
+        thread.join()
+    table = b''.join(len(part).to_bytes(4, 'big') + len(packed).to_bytes(4, 'big')
+                     for part, packed in zip(parts, results))
+    return len(parts).to_bytes(4, 'big') + table + b''.join(results)
+
+def _encode_cipher(data, options, context):
+    material = context.get('material') or os.urandom(CIPHER_KEY_SIZE + CIPHER_NONCE_SIZE)
+    return encrypt_payload(data, options, material)
+
+def _uses_zdict(options):
+    return bool(options.get('use_zdict')) and bool(options.get('shared_runtime'))
+
+def _uses_segments(options):
+    # Только для marshal: bytearray из сегментов принимает marshal.loads, но не exec
+    return (not _uses_zdict(options) and (options.get('zlib_segments') or 0) > 1
+            and bool(options.get('use_marshal')))
+
+# Порядок регистрации - порядок флажков в интерфейсе, order - место в конвейере кодирования.
+# marshal сериализует объект кода ещё при компиляции, поэтому своего encode у него нет.
+register_stage(CodecStage('marshal', 'use_marshal', 0, 'marshal.loads', imports=('marshal',), label='Marshal',
+                          default=True))
+register_stage(CodecStage('b85', 'use_base64', 50, '_b85decode', lambda data, options, context: base64.b85encode(data),
+                          source=B85_SOURCE, label='Base64', default=True, throughput=60, ratio=1.25,
+                          memory=32.0, depends=()))
+register_stage(CodecStage('zlib', 'use_zlib', 20, 'zlib.decompress', _encode_zlib, imports=('zlib',), label='Zlib',
+                          default=True, when=lambda options: not _uses_zdict(options) and not _uses_segments(options),
+                          extra_options=('use_compress',),
+                          describe=lambda options: 'zlib9' if options['use_compress'] else 'zlib',
+                          throughput=500, ratio=0.15, memory=1.2, depends=('use_compress',)))
+register_stage(CodecStage('zlibd', 'use_zlib', 20, '_inflate_zdict', _encode_zdict, imports=('zlib',),
+                          source=ZDICT_SOURCE, label='Zlib', when=_uses_zdict, standalone=False, ui=False,
+                          tunable=False, throughput=500, ratio=0.15, memory=1.2, depends=('use_compress', 'zdict')))
+register_stage(CodecStage('zseg', 'use_zlib', 20, '_inflate_segments', _encode_segments,
+                          imports=('os', 'zlib', 'threading'), source=SEGMENTS_SOURCE, label='Zlib',
+                          when=_uses_segments, ui=False, tunable=False,
+                          describe=lambda options: f"zlib/{options['zlib_segments']}",
+                          throughput=500, ratio=0.15, memory=1.5, depends=('use_compress', 'zlib_segments')))
+register_stage(CodecStage('hex', 'use_binascii', 40, 'binascii.unhexlify',
+                          lambda data, options, context: binascii.hexlify(data), imports=('binascii',),
+                          label='Binascii', throughput=1100, ratio=2.0, memory=3.0, depends=()))
+# Шифрование после сжатия: зашифрованные данные уже не сжимаются. Флажок с полем пароля живёт
+# в дополнительных настройках интерфейса, а подбор методов ключ не перебирает.
+register_stage(CodecStage('shake', 'use_cipher', 30, '_decrypt', _encode_cipher, imports=('os', 'sys', 'hashlib'),
+                          source=CIPHER_SOURCE, label='Cipher', ui=False, tunable=False, throughput=190, ratio=1.0,
+                          depends=('cipher_key', 'cipher_salt', 'material')))
+
+def load_stage_plugins(names=None):
+    if names is None:
+        names = os.environ.get(STAGE_PLUGINS_ENV, '')
+    for name in names.split(','):
+        if name.strip():
+            importlib.import_module(name.strip())
+
+load_stage_plugins()
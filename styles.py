@@ -0,0 +1,224 @@
+import os
+from functools import lru_cache
+from string import Template
+
+# Одна таблица стилей на всё приложение: Qt разбирает её один раз,
+# вместо отдельного setStyleSheet у каждого виджета
+STYLESHEET = Template("""
+    QMainWindow {
+        background-color: #121212;
+    }
+    QWidget {
+        color: white;
+        font-family: 'Segoe UI', Arial, sans-serif;
+        font-size: 13px;
+    }
+    QLabel {
+        padding: 2px;
+    }
+    QCheckBox::indicator {
+        width: 16px;
+        height: 16px;
+        border-radius: 3px;
+        border: 2px solid #555555;
+    }
+    QCheckBox::indicator:unchecked {
+        background-color: #2b2b2b;
+    }
+    QCheckBox::indicator:checked {
+        background-color: #2d5af5;
+        border: 2px solid #2d5af5;
+        image: url("$checkmark_path");
+    }
+    QCheckBox::indicator:hover {
+        border: 2px solid #2d5af5;
+    }
+    QComboBox::down-arrow {
+        image: url("$arrow_path");
+        width: 12px;
+        height: 12px;
+    }
+    QStatusBar {
+        background-color: #1a1a1a;
+        color: white;
+        padding: 5px;
+        font-size: 13px;
+    }
+    QTabWidget::pane {
+        border: 1px solid #333333;
+        border-radius: 6px;
+        background-color: #1e1e1e;
+    }
+    QTabBar::tab {
+        background-color: #2b2b2b;
+        color: white;
+        padding: 6px 14px;
+        border-top-left-radius: 6px;
+        border-top-right-radius: 6px;
+    }
+    QTabBar::tab:selected {
+        background-color: #2d5af5;
+    }
+
+    ModernComboBox {
+        background-color: #2b2b2b;
+        color: white;
+        border: 2px solid #555555;
+        border-radius: 5px;
+        padding: 5px 10px;
+        min-height: 30px;
+    }
+    ModernComboBox:hover {
+        border: 2px solid #2d5af5;
+    }
+    ModernComboBox::drop-down {
+        border: none;
+        width: 30px;
+    }
+    ModernComboBox::down-arrow {
+        image: url("$arrow_path");
+        width: 12px;
+        height: 12px;
+    }
+    ModernComboBox QAbstractItemView {
+        background-color: #2b2b2b;
+        color: white;
+        selection-background-color: #2d5af5;
+        selection-color: white;
+        border: 2px solid #555555;
+        border-radius: 5px;
+    }
+
+    ModernButton {
+        background-color: #2d5af5;
+        border: none;
+        border-radius: 8px;
+        color: white;
+        padding: 8px 16px;
+        font-size: 14px;
+        font-weight: bold;
+    }
+    ModernButton:hover {
+        background-color: #4169e1;
+    }
+    ModernButton:pressed {
+        background-color: #1e3cad;
+    }
+    ModernButton#clearButton {
+        background-color: #555555;
+    }
+    ModernButton#clearButton:hover {
+        background-color: #666666;
+    }
+    ModernButton#clearButton:pressed {
+        background-color: #444444;
+    }
+
+    ModernCheckBox {
+        spacing: 8px;
+        color: #ffffff;
+        font-size: 13px;
+        min-height: 25px;
+        padding-right: 10px;
+    }
+    ModernCheckBox::indicator {
+        width: 20px;
+        height: 20px;
+        border-radius: 4px;
+        border: 2px solid #555555;
+    }
+    ModernCheckBox::indicator:unchecked {
+        background-color: #2b2b2b;
+    }
+    ModernCheckBox::indicator:checked {
+        background-color: #2d5af5;
+        border: 2px solid #2d5af5;
+        image: url("$checkmark_path");
+    }
+    ModernCheckBox::indicator:hover {
+        border: 2px solid #2d5af5;
+    }
+
+    ModernGroupBox {
+        background-color: #1e1e1e;
+        border: 1px solid #333333;
+        border-radius: 6px;
+        margin-top: 1.2em;
+        padding: 6px;
+        font-size: 13px;
+        font-weight: bold;
+        color: #ffffff;
+    }
+    ModernGroupBox::title {
+        subcontrol-origin: margin;
+        left: 6px;
+        padding: 0 4px;
+        top: -6px;
+        background-color: #1e1e1e;
+    }
+
+    ModernSpinBox {
+        background-color: #2b2b2b;
+        border: 2px solid #333333;
+        border-radius: 6px;
+        color: white;
+        padding: 4px;
+        min-width: 80px;
+        min-height: 30px;
+    }
+    ModernSpinBox::up-button, ModernSpinBox::down-button {
+        border: none;
+        background-color: #2d5af5;
+        border-radius: 4px;
+        margin: 2px;
+    }
+    ModernSpinBox::up-button:hover, ModernSpinBox::down-button:hover {
+        background-color: #4169e1;
+    }
+
+    ModernLineEdit {
+        background-color: #2b2b2b;
+        border: 2px solid #333333;
+        border-radius: 8px;
+        color: white;
+        padding: 8px;
+        min-height: 40px;
+        font-size: 13px;
+    }
+    ModernLineEdit:focus {
+        border: 2px solid #2d5af5;
+    }
+
+    JobTableView {
+        background-color: #1a1a1a;
+        alternate-background-color: #222222;
+        border: 2px solid #333333;
+        border-radius: 10px;
+        selection-background-color: #2d5af5;
+        selection-color: white;
+    }
+    JobTableView QHeaderView::section {
+        background-color: #2b2b2b;
+        color: white;
+        border: none;
+        border-right: 1px solid #333333;
+        padding: 4px 8px;
+    }
+
+    ModernTextEdit {
+        background-color: #1a1a1a;
+        border: 2px solid #333333;
+        border-radius: 10px;
+        color: white;
+        padding: 10px;
+        font-size: 13px;
+        selection-background-color: #2d5af5;
+    }
+""")
+
+@lru_cache(maxsize=None)
+def build_stylesheet(icon_path):
+    return STYLESHEET.substitute(
+        checkmark_path=os.path.join(icon_path, 'checkmark.svg').replace('\\', '/'),
+        arrow_path=os.path.join(icon_path, 'arrow.svg').replace('\\', '/'),
+    )
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from encoder import make_options
+from batch import encode_batch
+
+MODULES = {
+    'app/__init__.py': '',
+    'app/core.py': 'import json\n\ndef dump(value):\n    """Dump value."""\n    return json.dumps(value)\n',
+    'app/table.py': 'TABLE = {%s}\n' % ', '.join(f'{i}: "row-{i}"' for i in range(300)),
+    'app/copy.py': 'import json\n\ndef dump(value):\n    """Dump value."""\n    return json.dumps(value)\n',
+    'main.py': 'from app import core, table\nprint(core.dump(table.TABLE[7]))\n',
+}
+
+def read_tree(root):
+    tree = {}
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            with open(path, 'rb') as f:
+                tree[os.path.relpath(path, root)] = f.read()
+    return tree
+
+class DeterminismTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='se_test_')
+        for name, source in MODULES.items():
+            path = os.path.join(self.workdir, 'src', name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(source)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def encode(self, options, workers):
+        output_dir = os.path.join(self.workdir, f'out_{workers}')
+        jobs = [(os.path.join(self.workdir, 'src', name), os.path.join(output_dir, name)) for name in MODULES]
+        results = encode_batch(jobs, options, workers=workers)
+        for stats in results:
+            self.assertTrue(stats['ok'], stats.get('error'))
+        return read_tree(output_dir)
+
+    def assert_same_output(self, options):
+        # workers=0 кодирует в текущем процессе, 1 и 2 - в пуле
+        serial = self.encode(options, 1)
+        for workers in (0, 2):
+            other = self.encode(options, workers)
+            self.assertEqual(sorted(serial), sorted(other))
+            for name in serial:
+                self.assertEqual(serial[name], other[name], f'{name}, workers={workers}')
+
+    def test_standalone(self):
+        self.assert_same_output(make_options(deterministic=True, seed_key='test', use_junk=True, junk_size=50,
+                                             use_rename=True, use_cipher=True))
+
+    def test_shared_runtime(self):
+        self.assert_same_output(make_options(deterministic=True, seed_key='test', shared_runtime=True,
+                                             use_zdict=True, prefetch=True, use_cipher=True, cipher_key='secret'))
+
+if __name__ == '__main__':
+    unittest.main()
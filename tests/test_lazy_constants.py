@@ -0,0 +1,68 @@
+import os
+import ast
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from encoder import ConstantExtractor, make_options
+from batch import encode_batch
+
+TABLE = 'TABLE = {%s}\n' % ', '.join(f'{i}: "value-{i}"' for i in range(200))
+MODULE = TABLE + 'def lookup(key):\n    return TABLE[key]\n'
+EXPORTED = MODULE + "__all__ = ['TABLE', 'lookup']\n"
+
+# Что видит импортирующий код: звёздочка, dir() и vars() до и после обращения
+PROBE = '''
+import m
+before = 'TABLE' in vars(m)
+listed = 'TABLE' in dir(m)
+namespace = {}
+exec('from m import *', namespace)
+print(before, listed, len(namespace['TABLE']), namespace['lookup'](5), 'TABLE' in vars(m))
+'''
+
+class LazyConstantsTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='se_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def probe(self, source):
+        input_path = os.path.join(self.workdir, 'source.py')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        output_dir = os.path.join(self.workdir, 'out')
+        options = make_options(lazy_constants=True, lazy_threshold=16)
+        results = encode_batch([(input_path, os.path.join(output_dir, 'm.py'))], options, workers=1)
+        self.assertTrue(results[0]['ok'], results[0].get('error'))
+        proc = subprocess.run([sys.executable, '-c', PROBE], cwd=output_dir, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        return proc.stdout.split()
+
+    def test_globals_without_all_stay_in_module(self):
+        extractor = ConstantExtractor(16)
+        extractor.extract(ast.parse(MODULE))
+        self.assertEqual(extractor.globals, {})
+
+    def test_exported_globals_are_lazy(self):
+        extractor = ConstantExtractor(16)
+        extractor.extract(ast.parse(EXPORTED))
+        self.assertEqual(list(extractor.globals), ['TABLE'])
+
+    def test_modified_all_disables_lazy_globals(self):
+        extractor = ConstantExtractor(16)
+        extractor.extract(ast.parse(EXPORTED + "__all__.append('extra')\nextra = 1\n"))
+        self.assertEqual(extractor.globals, {})
+
+    def test_star_import_without_all(self):
+        self.assertEqual(self.probe(MODULE), ['True', 'True', '200', 'value-5', 'True'])
+
+    def test_star_import_with_all(self):
+        # Таблица не загружена до обращения, но видна в dir() и через *, а затем и в vars()
+        self.assertEqual(self.probe(EXPORTED), ['False', 'True', '200', 'value-5', 'True'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from encoder import compile_source, make_options
+
+SOURCE = '''
+def documented(x):
+    """Function doc."""
+    unused = ('dead', 'constants')
+    return x + 1
+
+class Documented:
+    """Class doc."""
+    def method(self):
+        """Method doc."""
+        return 2
+'''
+
+class PruneConstantsTest(unittest.TestCase):
+    def run_pruned(self, **overrides):
+        code, _ = compile_source(SOURCE, make_options(prune_constants=True, **overrides))
+        namespace = {}
+        exec(code, namespace)
+        return namespace
+
+    def test_docstrings_survive(self):
+        namespace = self.run_pruned()
+        self.assertEqual(namespace['documented'].__doc__, 'Function doc.')
+        self.assertEqual(namespace['Documented'].__doc__, 'Class doc.')
+        self.assertEqual(namespace['Documented'].method.__doc__, 'Method doc.')
+        self.assertEqual(namespace['documented'](1), 2)
+
+    def test_strip_docstrings(self):
+        namespace = self.run_pruned(strip_docstrings=True)
+        self.assertIsNone(namespace['documented'].__doc__)
+        self.assertIsNone(namespace['Documented'].method.__doc__)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import os
+import re
+import sys
+import mmap
+import glob
+import struct
+import hashlib
+import argparse
+
+MAP_MAGIC = b'SEMAP01\n'
+MAP_SUFFIX = '.semap'
+
+# Заголовок: сигнатура, хэш сборки, число записей в таблицах модулей, строк и имён.
+# Все таблицы - отсортированные записи одного формата: модуль (8 байт), ключ, значение.
+# Первые 12 байт записи сравниваются как байты, поэтому числа хранятся в big-endian.
+HEADER = struct.Struct('>8s16sIII')
+RECORD = struct.Struct('>8sII')
+KEY_SIZE = 12
+LENGTH = struct.Struct('>I')
+
+CHUNK_SIZE = 1024 * 1024
+
+# Кадр трассировки из закодированного модуля и имя после LocalRenamer в сообщении об ошибке
+TRACE_RE = re.compile(rb'<se:([0-9a-f]{16})>", line (\d+)|\'_v(\d+)\'')
+
+def build_hash(modules, key=''):
+    digest = hashlib.sha256(key.encode('utf-8'))
+    for module in sorted({module['module'] for module in modules}):
+        digest.update(bytes.fromhex(module))
+    return digest.digest()[:16]
+
+def write_map(path, modules, build):
+    from encoder import atomic_open
+
+    entries = {}
+    for module in modules:
+        # Копии одинаковых исходников дают тот же модуль
+        entries.setdefault(module['module'], module)
+    pool = bytearray()
+
+    def intern(text):
+        offset = len(pool)
+        data = text.encode('utf-8')
+        pool.extend(LENGTH.pack(len(data)) + data)
+        return offset
+
+    module_records, line_records, name_records = [], [], []
+    for module_id in sorted(entries):
+        module = entries[module_id]
+        key = bytes.fromhex(module_id)
+        module_records.append(RECORD.pack(key, 0, intern(module['path'])))
+        line_records.extend(RECORD.pack(key, rank, line) for rank, line in enumerate(module['lines'], 1))
+        names = sorted((int(index), name) for index, name in module['names'].items())
+        name_records.extend(RECORD.pack(key, index, intern(name)) for index, name in names)
+
+    with atomic_open(path) as f:
+        f.write(HEADER.pack(MAP_MAGIC, build, len(module_records), len(line_records), len(name_records)))
+        for records in (module_records, line_records, name_records):
+            f.write(b''.join(records))
+        f.write(pool)
+    return path
+
+def write_build_map(directory, modules, key=''):
+    build = build_hash(modules, key)
+    return write_map(os.path.join(directory, build.hex() + MAP_SUFFIX), modules, build)
+
+class SymbolMap:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.build, modules, lines, names = HEADER.unpack_from(self.data)
+        if magic != MAP_MAGIC:
+            self.data.close()
+            raise ValueError(f"{path}: not a traceback map")
+        offset = HEADER.size
+        self.modules = (offset, modules)
+        offset += modules * RECORD.size
+        self.lines = (offset, lines)
+        offset += lines * RECORD.size
+        self.names = (offset, names)
+        self.pool = offset + names * RECORD.size
+
+    def close(self):
+        self.data.close()
+
+    def _find(self, table, module, key):
+        # Двоичный поиск прямо по отображённому файлу: таблица не читается целиком
+        start, count = table
+        target = module + key.to_bytes(4, 'big')
+        data = self.data
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = start + mid * RECORD.size
+            if data[offset:offset + KEY_SIZE] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        offset = start + lo * RECORD.size
+        if lo < count and data[offset:offset + KEY_SIZE] == target:
+            return LENGTH.unpack_from(data, offset + KEY_SIZE)[0]
+        return None
+
+    def _string(self, offset):
+        offset += self.pool
+        size = LENGTH.unpack_from(self.data, offset)[0]
+        return self.data[offset + LENGTH.size:offset + LENGTH.size + size]
+
+    def source_path(self, module):
+        offset = self._find(self.modules, module, 0)
+        return None if offset is None else self._string(offset)
+
+    def line(self, module, line):
+        return self._find(self.lines, module, line)
+
+    def name(self, module, index):
+        offset = self._find(self.names, module, index)
+        return None if offset is None else self._string(offset)
+
+def open_maps(paths):
+    maps = []
+    for path in paths:
+        if os.path.isdir(path):
+            maps.extend(SymbolMap(name) for name in sorted(glob.glob(os.path.join(glob.escape(path), '*' + MAP_SUFFIX))))
+        else:
+            maps.append(SymbolMap(path))
+    return maps
+
+class TracebackRewriter:
+    def __init__(self, maps):
+        self.maps = maps
+        # Модуль последнего кадра: имена в сообщении об ошибке относятся к нему
+        self.module = None
+        self._paths = {}
+        self._lines = {}
+        self._names = {}
+
+    def _lookup(self, module):
+        if module not in self._paths:
+            self._paths[module] = next(((symbols, path) for symbols in self.maps
+                                        for path in [symbols.source_path(module)] if path is not None), None)
+        return self._paths[module]
+
+    def _frame(self, match):
+        module = bytes.fromhex(match.group(1).decode('ascii'))
+        found = self._lookup(module)
+        if found is None:
+            self.module = None
+            return match.group(0)
+        symbols, path = found
+        self.module = (module, symbols)
+        key = (module, match.group(2))
+        line = self._lines.get(key)
+        if line is None:
+            line = symbols.line(module, int(match.group(2)))
+            line = match.group(2) if line is None else str(line).encode('ascii')
+            self._lines[key] = line
+        return path + b'", line ' + line
+
+    def _name(self, match):
+        module, symbols = self.module
+        key = (module, match.group(3))
+        name = self._names.get(key)
+        if name is None:
+            original = symbols.name(module, int(match.group(3)))
+            name = match.group(0) if original is None else b"'" + original + b"'"
+            self._names[key] = name
+        return name
+
+    def _replace(self, match):
+        if match.group(1) is not None:
+            return self._frame(match)
+        return match.group(0) if self.module is None else self._name(match)
+
+    def feed(self, chunk):
+        # Маркеры ищутся через bytes.find, регулярное выражение разбирает только строки с ними
+        parts = []
+        start = 0
+        while True:
+            hit = chunk.find(b'<se:', start)
+            if self.module is not None:
+                name = chunk.find(b"'_v", start, len(chunk) if hit < 0 else hit)
+                if name >= 0:
+                    hit = name
+            if hit < 0:
+                break
+            line_start = max(chunk.rfind(b'\n', start, hit) + 1, start)
+            line_end = chunk.find(b'\n', hit) + 1 or len(chunk)
+            parts.append(chunk[start:line_start])
+            parts.append(TRACE_RE.sub(self._replace, chunk[line_start:line_end]))
+            start = line_end
+        if not parts:
+            return chunk
+        parts.append(chunk[start:])
+        return b''.join(parts)
+
+def filter_stream(rewriter, infile, outfile, chunk_size=CHUNK_SIZE):
+    tail = b''
+    while True:
+        # read1 отдаёт то, что уже есть: журнал из tail -f не ждёт заполнения буфера
+        chunk = infile.read1(chunk_size)
+        if not chunk:
+            break
+        chunk = tail + chunk if tail else chunk
+        cut = chunk.rfind(b'\n') + 1
+        if not cut and len(chunk) < chunk_size:
+            tail = chunk
+            continue
+        cut = cut or len(chunk)
+        outfile.write(rewriter.feed(chunk[:cut]))
+        outfile.flush()
+        tail = chunk[cut:]
+    if tail:
+        outfile.write(rewriter.feed(tail))
+        outfile.flush()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Rewrite tracebacks of encoded modules back to original names and lines')
+    parser.add_argument('maps', nargs='+', help='Traceback maps (.semap) or directories with them')
+    parser.add_argument('-i', '--input', help='Log file (default: stdin)')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    maps = open_maps(args.maps)
+    if not maps:
+        print("No traceback maps found", file=sys.stderr)
+        return 1
+    infile = open(args.input, 'rb') if args.input else sys.stdin.buffer
+    outfile = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        filter_stream(TracebackRewriter(maps), infile, outfile)
+    except BrokenPipeError:
+        # Читатель закрыл вывод (например, head): это не ошибка фильтра
+        sys.stderr.close()
+    finally:
+        if args.input:
+            infile.close()
+        if args.output:
+            outfile.close()
+        for symbols in maps:
+            symbols.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
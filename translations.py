@@ -10,9 +10,24 @@ TRANSLATIONS = {
         'advanced_settings': 'Advanced Settings',
         'encoding_layers': 'Layers:',
         'junk_code_size': 'Junk Size:',
+        'junk_bytes': 'Junk KB:',
+        'preview': 'Preview:',
+        'preview_text': '≈ {size:,} bytes, full encode ≈ {time:.0f} ms ({cached}/{steps} steps cached)',
+        'junk_bytes_tooltip': 'Exact junk code size in kilobytes, generated in bulk from statement templates (0: use Junk Size)',
+        'zlib_segments': 'Zlib Segments:',
+        'zlib_segments_tooltip': 'Compress the marshal payload in independent segments that the decoder inflates in parallel threads (0: one stream)',
+        'optimize': 'Optimize:',
+        'optimize_off': 'Off',
+        'optimize_size': 'Smallest size',
+        'optimize_startup': 'Fastest start-up',
+        'optimize_balanced': 'Balanced',
+        'optimize_running': 'Searching for the best stage combination...',
+        'optimize_winner': '🏆 Best configuration:',
         'encode_button': 'Encode',
         'clear_button': 'Clear',
         'result': 'Result',
+        'output_tab': 'Output',
+        'exe_tab': 'EXE Options',
         'select_file_dialog': 'Select Python File',
         'file_filter': 'Python Files (*.py);;All Files (*.*)',
         'error': 'Error',
@@ -50,6 +65,48 @@ TRANSLATIONS = {
         'use_junk': 'Add Junk Code',
         'use_rename': 'Rename Variables',
         'use_compress': 'Maximum Compression',
+        'deterministic': 'Deterministic output',
+        'shared_runtime': 'Shared runtime module',
+        'prefetch': 'Prefetch imported modules',
+        'runtime_saved': '🧩 Shared runtime:',
+        'seed_key_placeholder': 'Seed key for deterministic output',
+        'use_cipher': 'Encrypt payload',
+        'verify': 'Verify output',
+        'profile_hooks': 'Decode profiling hooks',
+        'queue_tab': 'Queue',
+        'add_files': 'Add Files',
+        'add_folder': 'Add Folder',
+        'encode_queue': 'Encode Queue',
+        'clear_queue': 'Clear Queue',
+        'queue_summary': '{total:,} files: {done:,} done, {failed:,} failed, {running:,} running, {queued:,} queued',
+        'queue_finished': 'Queue finished',
+        'job_file': 'File',
+        'job_status': 'Status',
+        'job_time': 'Time',
+        'job_source_size': 'Source',
+        'job_output_size': 'Output',
+        'job_ratio': 'Ratio',
+        'job_queued': 'Queued',
+        'job_running': 'Running',
+        'job_done': 'Done',
+        'job_failed': 'Failed',
+        'output_verified': '🔍 Output decodes to the same code',
+        'cipher_key_placeholder': 'Passphrase (optional, SE_PAYLOAD_KEY at run time)',
+        'interpreters_placeholder': 'Extra Python interpreters, separated by "{sep}"',
+        
+        # Bytecode optimization
+        'bytecode_optimization': 'Bytecode Optimization',
+        'optimize_level': 'Optimize level:',
+        'strip_docstrings': 'Strip docstrings',
+        'strip_debug': 'Remove asserts and __debug__ branches',
+        'strip_lines': 'Collapse line numbers',
+        'prune_constants': 'Prune unused constants',
+        'lazy_constants': 'Load large constants lazily',
+        'lazy_constants_tooltip': 'Move literal tables above the size threshold into a compressed blob decoded on first use',
+        'traceback_map': 'Traceback map',
+        'traceback_map_saved': '🗺 Traceback map:',
+        'bytecode_size_saved': '📉 Bytecode size saved:',
+        'loads_time_saved': '⏱ marshal.loads time saved:',
         
         # Output settings
         'overwrite_existing': 'Overwrite existing files',
@@ -66,9 +123,24 @@ TRANSLATIONS = {
         'advanced_settings': 'Расширенные настройки',
         'encoding_layers': 'Слои:',
         'junk_code_size': 'Размер мусора:',
+        'junk_bytes': 'Мусор, КБ:',
+        'preview': 'Предпросмотр:',
+        'preview_text': '≈ {size:,} байт, полное кодирование ≈ {time:.0f} мс ({cached}/{steps} шагов из кэша)',
+        'junk_bytes_tooltip': 'Точный размер мусорного кода в килобайтах, собирается пакетно из шаблонов инструкций (0 - по размеру мусора)',
+        'zlib_segments': 'Сегменты zlib:',
+        'zlib_segments_tooltip': 'Сжимать нагрузку marshal независимыми сегментами, которые декодер распаковывает в параллельных потоках (0 - один поток данных)',
+        'optimize': 'Оптимизация:',
+        'optimize_off': 'Выкл',
+        'optimize_size': 'Минимальный размер',
+        'optimize_startup': 'Быстрый запуск',
+        'optimize_balanced': 'Баланс',
+        'optimize_running': 'Поиск лучшей комбинации методов...',
+        'optimize_winner': '🏆 Лучшая конфигурация:',
         'encode_button': 'Закодировать',
         'clear_button': 'Очистить',
         'result': 'Результат',
+        'output_tab': 'Вывод',
+        'exe_tab': 'Настройки EXE',
         'select_file_dialog': 'Выберите Python файл',
         'file_filter': 'Python файлы (*.py);;Все файлы (*.*)',
         'error': 'Ошибка',
@@ -106,6 +178,48 @@ TRANSLATIONS = {
         'use_junk': 'Добавить мусор',
         'use_rename': 'Переименовать переменные',
         'use_compress': 'Максимальное сжатие',
+        'deterministic': 'Детерминированный результат',
+        'shared_runtime': 'Общий модуль рантайма',
+        'prefetch': 'Фоновая распаковка импортов',
+        'runtime_saved': '🧩 Общий рантайм:',
+        'seed_key_placeholder': 'Ключ для детерминированного результата',
+        'use_cipher': 'Шифровать полезную нагрузку',
+        'verify': 'Проверять результат',
+        'profile_hooks': 'Замеры декодирования',
+        'queue_tab': 'Очередь',
+        'add_files': 'Добавить файлы',
+        'add_folder': 'Добавить папку',
+        'encode_queue': 'Кодировать очередь',
+        'clear_queue': 'Очистить очередь',
+        'queue_summary': 'Файлов: {total:,}; готово {done:,}, ошибок {failed:,}, в работе {running:,}, в очереди {queued:,}',
+        'queue_finished': 'Очередь обработана',
+        'job_file': 'Файл',
+        'job_status': 'Статус',
+        'job_time': 'Время',
+        'job_source_size': 'Исходный',
+        'job_output_size': 'Результат',
+        'job_ratio': 'Степень',
+        'job_queued': 'В очереди',
+        'job_running': 'В работе',
+        'job_done': 'Готово',
+        'job_failed': 'Ошибка',
+        'output_verified': '🔍 Результат декодируется в тот же код',
+        'cipher_key_placeholder': 'Пароль (необязательно, SE_PAYLOAD_KEY при запуске)',
+        'interpreters_placeholder': 'Другие интерпретаторы Python через "{sep}"',
+        
+        # Bytecode optimization
+        'bytecode_optimization': 'Оптимизация байткода',
+        'optimize_level': 'Уровень оптимизации:',
+        'strip_docstrings': 'Удалить docstring',
+        'strip_debug': 'Удалить assert и ветки __debug__',
+        'strip_lines': 'Свернуть номера строк',
+        'prune_constants': 'Удалить неиспользуемые константы',
+        'lazy_constants': 'Ленивая загрузка больших констант',
+        'lazy_constants_tooltip': 'Выносить литеральные таблицы больше порога в сжатый блок, который распаковывается при первом обращении',
+        'traceback_map': 'Карта трассировок',
+        'traceback_map_saved': '🗺 Карта трассировок:',
+        'bytecode_size_saved': '📉 Экономия размера байткода:',
+        'loads_time_saved': '⏱ Экономия времени marshal.loads:',
         
         # Output settings
         'overwrite_existing': 'Перезаписать существующие файлы',
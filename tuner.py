@@ -0,0 +1,125 @@
+import os
+import sys
+import argparse
+import itertools
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from encoder import DEFAULT_OPTIONS, EncodeError, make_options, make_rng, open_source, encode_source, generate_decoder, output_chunks
+from stages import CIPHER_KEY_ENV, active_stages, tunable_stages
+
+# Опции перебора берутся из реестра ступеней; extra_options имеют смысл только при включённой ступени
+STAGE_KEYS = tuple(dict.fromkeys(key for stage in tunable_stages() for key in (stage.option, *stage.extra_options)))
+
+OBJECTIVES = ('size', 'startup', 'balanced')
+
+# Замер в отдельном интерпретаторе: разбор заглушки, цепочка декодирования
+# и компиляция исходника, если marshal не используется. Сама программа не запускается.
+MEASURE_SCRIPT = '''
+import sys, time
+source = open(sys.argv[1], encoding='utf-8').read()
+best = None
+for _ in range(int(sys.argv[2])):
+    start = time.perf_counter()
+    namespace = {}
+    exec(compile(source, sys.argv[1], 'exec'), namespace)
+    result = namespace['result']
+    if isinstance(result, (bytes, str)):
+        compile(result, '<string>', 'exec')
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+print(best)
+'''
+
+def candidate_options(base_options):
+    candidates = []
+    for values in itertools.product((False, True), repeat=len(STAGE_KEYS)):
+        stages = dict(zip(STAGE_KEYS, values))
+        if any(stages[key] and not stages[stage.option]
+               for stage in tunable_stages() for key in stage.extra_options):
+            continue
+        # Без ступеней файл уходит исходником в открытом виде: такой кандидат не рассматривается
+        if not any(stages[stage.option] for stage in tunable_stages()):
+            continue
+        # Цепочка та же, что и в общем рантайме, а заглушка замеряется автономно, под текущий интерпретатор
+        candidates.append({**base_options, **stages, 'shared_runtime': False, 'use_zdict': False,
+                           'prefetch': False, 'interpreters': ''})
+    return candidates
+
+def describe_stages(options):
+    names = [stage.describe(options) if stage.describe else stage.name for stage in active_stages(options)]
+    return '+'.join(names) or 'plain'
+
+def _evaluate(input_path, options, repeats):
+    with open_source(input_path) as content:
+        encoded = encode_source(content, options)
+        rng = make_rng(options, content)
+    chunks = list(output_chunks(generate_decoder(options, rng), encoded))
+    size = sum(len(chunk) for chunk in chunks)
+
+    fd, probe_path = tempfile.mkstemp(suffix='.py', prefix='se_probe_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.writelines(chunks[:-1])
+            f.write(b'\n\nresult = decode(encoded)\n')
+        env = dict(os.environ)
+        # Ключ шифра из пароля: замер расшифровывает, как и запуск с SE_PAYLOAD_KEY
+        if options['use_cipher'] and options['cipher_key']:
+            env[CIPHER_KEY_ENV] = options['cipher_key']
+        proc = subprocess.run([sys.executable, '-c', MEASURE_SCRIPT, probe_path, str(repeats)],
+                              capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            raise EncodeError("Optimize Error", proc.stderr.strip())
+        decode_time = float(proc.stdout)
+    finally:
+        os.remove(probe_path)
+
+    return {'options': options, 'stages': describe_stages(options), 'size': size, 'decode_time': decode_time}
+
+def score(results, objective, weight=0.5):
+    min_size = min(r['size'] for r in results)
+    min_time = min(r['decode_time'] for r in results) or 1e-9
+    for r in results:
+        if objective == 'size':
+            r['score'] = r['size'] / min_size
+        elif objective == 'startup':
+            r['score'] = r['decode_time'] / min_time
+        else:
+            r['score'] = weight * r['size'] / min_size + (1 - weight) * r['decode_time'] / min_time
+    return sorted(results, key=lambda r: (r['score'], r['size']))
+
+def optimize(input_path, base_options=None, objective='size', weight=0.5, workers=None, repeats=3,
+             mp_context=None):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    base_options = base_options or dict(DEFAULT_OPTIONS)
+    candidates = candidate_options(base_options)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        results = list(pool.map(_evaluate, itertools.repeat(input_path), candidates, itertools.repeat(repeats)))
+    return score(results, objective, weight)
+
+def format_report(results):
+    lines = [f"{'stages':<22} {'size':>12} {'decode':>10} {'score':>7}"]
+    for r in results:
+        lines.append(f"{r['stages']:<22} {r['size']:>12,} {r['decode_time'] * 1000:>8.2f}ms {r['score']:>7.3f}")
+    return lines
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Search encoding stage combinations for the best output')
+    parser.add_argument('input')
+    parser.add_argument('--objective', choices=OBJECTIVES, default='size')
+    parser.add_argument('--weight', type=float, default=0.5, help='Size weight for the balanced objective')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=3)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = optimize(args.input, make_options(), args.objective, args.weight, args.workers, args.repeats)
+    print('\n'.join(format_report(results)))
+    print(f"🏆 Best configuration: {results[0]['stages']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())